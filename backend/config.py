@@ -0,0 +1,195 @@
+import os
+from pathlib import Path
+
+# Настройки приложения. Любое значение можно переопределить переменной окружения.
+
+BASE = Path(__file__).resolve().parent.parent
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    if value is None or value.strip() == "":
+        return default
+    return int(value)
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value is None or value.strip() == "":
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# --- OCR ---
+MODELS_DIR = BASE / "backend" / "script" / "models"
+OCR_LANGUAGES = ['ru', 'en']
+OCR_GPU = _env_bool("OCR_GPU", True)
+# сколько экземпляров easyocr.Reader держать загруженными в одном процессе
+OCR_POOL_SIZE = _env_int("OCR_POOL_SIZE", 1)
+# --- OCR на CPU (OCR_GPU=0) ---
+# динамическая int8-квантизация распознавателя (LSTM и Linear); 0 — исходная fp32-модель
+OCR_QUANTIZE = _env_bool("OCR_QUANTIZE", True)
+# потоки torch внутри одной операции на процесс; 0 — ядра поровну между процессами WORKERS
+OCR_THREADS = _env_int("OCR_THREADS", 0)
+# потоки torch для независимых операций графа; модели easyocr последовательные, хватает одного
+OCR_INTEROP_THREADS = _env_int("OCR_INTEROP_THREADS", 1)
+# после загрузки модели прогнать её один раз на искусственной строке,
+# чтобы первый документ не ждал инициализацию
+WARMUP_INFERENCE = _env_bool("WARMUP_INFERENCE", True)
+
+# --- Рендер страниц ---
+# при ADAPTIVE_DPI — верхний предел разрешения, иначе разрешение всех страниц
+RENDER_DPI = _env_int("RENDER_DPI", 300)
+# рендер сразу в оттенки серого: в 3 раза меньше памяти, цвет для OCR не нужен
+RENDER_GRAYSCALE = _env_bool("RENDER_GRAYSCALE", True)
+# разрешение по собственному разрешению скана или высоте строк текста (render_dpi.py)
+ADAPTIVE_DPI = _env_bool("ADAPTIVE_DPI", True)
+RENDER_MIN_DPI = _env_int("RENDER_MIN_DPI", 150)
+# желаемая высота строки текста в пикселях при подборе разрешения
+OCR_TEXT_HEIGHT_PX = _env_int("OCR_TEXT_HEIGHT_PX", 32)
+# предел пикселей на страницу (0 — без предела); A4 при 300 dpi — около 8,7 млн
+MAX_PAGE_PIXELS = _env_int("MAX_PAGE_PIXELS", 9_000_000)
+# сколько отрендеренных страниц может ждать OCR в очереди (0 — без отдельного потока)
+PAGE_PREFETCH = _env_int("PAGE_PREFETCH", 2)
+# отладка: сохранять изображения страниц в PNG
+SAVE_PAGE_IMAGES = _env_bool("SAVE_PAGE_IMAGES", False)
+DEBUG_IMAGES_DIR = BASE / "files" / "images"
+
+# --- Параллельная обработка ---
+# "sequential" — документы по очереди в процессе веб-сервера,
+# "process" — пул процессов, у каждого свой загруженный Reader,
+# "distributed" — документы уходят в общую очередь, их обрабатывают воркеры
+# (python -m backend.worker) на любых машинах, веб-сервер только собирает результат
+EXECUTION_MODE = os.environ.get("EXECUTION_MODE", "sequential")
+WORKERS = _env_int("WORKERS", os.cpu_count() or 1)
+
+# --- Распределённый режим ---
+# очередь документов: sqlite:///путь/к/файлу.sqlite3 или file:///путь/к/папке;
+# веб-сервер и воркеры должны видеть одну и ту же очередь и папку TASK_SHARED_DIR
+TASK_QUEUE_URL = os.environ.get("TASK_QUEUE_URL", "sqlite" + (BASE / "files" / "task_queue.sqlite3").as_uri()[len("file"):])
+# сюда веб-сервер кладёт PDF для воркеров (общий диск)
+TASK_SHARED_DIR = Path(os.environ.get("TASK_SHARED_DIR", BASE / "files" / "shared"))
+# аренда задачи воркером; воркер продлевает её, пока работает, а если он умер —
+# по истечении аренды документ берёт другой воркер
+TASK_LEASE_SECONDS = _env_int("TASK_LEASE_SECONDS", 120)
+# сколько раз документ выдаётся воркерам, прежде чем считаться упавшим
+TASK_MAX_ATTEMPTS = _env_int("TASK_MAX_ATTEMPTS", 3)
+# как часто воркер спрашивает новую задачу, а веб-сервер — готовые результаты
+TASK_POLL_SECONDS = float(os.environ.get("TASK_POLL_SECONDS", "1.0"))
+
+# --- Очередь задач ---
+# сколько архивов обрабатывается одновременно, остальные ждут в очереди
+MAX_CONCURRENT_JOBS = _env_int("MAX_CONCURRENT_JOBS", 2)
+# "fifo" — в порядке поступления, "priority" — сначала больший приоритет
+JOB_ORDER = os.environ.get("JOB_ORDER", "fifo")
+# у каждой задачи своя рабочая папка внутри WORKSPACE_DIR
+WORKSPACE_DIR = BASE / "backend" / "script" / "temp"
+# сколько завершённых задач держать в памяти сервера; более старые доступны
+# только через хранилище задач (GET /jobs/{id})
+JOBS_KEEP_FINISHED = _env_int("JOBS_KEEP_FINISHED", 100)
+# задачи и контрольные точки документов; незавершённые задачи продолжаются после перезапуска
+JOB_STORE_PATH = BASE / "files" / "jobs.sqlite3"
+RESUME_JOBS = _env_bool("RESUME_JOBS", True)
+
+# --- События задач (SSE) ---
+# сколько последних событий задачи хранится для повтора подключившимся позже
+EVENT_HISTORY = _env_int("EVENT_HISTORY", 5000)
+# размер буфера одного подписчика; при переполнении отбрасываются самые старые события
+EVENT_BUFFER = _env_int("EVENT_BUFFER", 1000)
+# сколько каналов завершённых задач держать в памяти
+EVENT_CHANNELS_KEEP = _env_int("EVENT_CHANNELS_KEEP", 100)
+
+# --- Кэш результатов OCR ---
+OCR_CACHE = _env_bool("OCR_CACHE", True)
+OCR_CACHE_DIR = BASE / "files" / "ocr_cache"
+# при превышении размера удаляются давно не использованные записи
+OCR_CACHE_MAX_MB = _env_int("OCR_CACHE_MAX_MB", 1024)
+
+# --- Текстовый слой PDF ---
+# страницы с пригодным текстовым слоем не рендерятся и не проходят OCR
+USE_TEXT_LAYER = _env_bool("USE_TEXT_LAYER", True)
+# минимум букв на странице, чтобы считать текстовый слой пригодным
+TEXT_LAYER_MIN_CHARS = _env_int("TEXT_LAYER_MIN_CHARS", 50)
+
+# --- Сортировка страниц перед OCR ---
+# пустые страницы и страницы без строк текста (конверты, одна печать) не распознаются
+PAGE_TRIAGE = _env_bool("PAGE_TRIAGE", False)
+# доля тёмных пикселей миниатюры, ниже которой страница пустая
+TRIAGE_BLANK_INK = float(os.environ.get("TRIAGE_BLANK_INK", "0.002"))
+# меньше стольких знаков или строк на миниатюре — страница без текста
+TRIAGE_MIN_GLYPHS = _env_int("TRIAGE_MIN_GLYPHS", 20)
+TRIAGE_MIN_LINES = _env_int("TRIAGE_MIN_LINES", 3)
+
+# --- Подготовка изображения страницы ---
+# шаги через запятую: deskew (выравнивание наклона), crop (обрезка пустых полей),
+# binarize (адаптивная бинаризация); пусто — изображение идёт в OCR как есть
+PREPROCESS = [s.strip() for s in os.environ.get("PREPROCESS", "").split(",") if s.strip()]
+# наклон ищется в пределах ±DESKEW_MAX_ANGLE с шагом DESKEW_STEP, градусы;
+# меньше DESKEW_MIN_ANGLE страница не поворачивается
+DESKEW_MAX_ANGLE = float(os.environ.get("DESKEW_MAX_ANGLE", "5"))
+DESKEW_STEP = float(os.environ.get("DESKEW_STEP", "0.2"))
+DESKEW_MIN_ANGLE = float(os.environ.get("DESKEW_MIN_ANGLE", "0.2"))
+# окно (нечётное, пиксели) и сдвиг порога адаптивной бинаризации
+BINARIZE_BLOCK = _env_int("BINARIZE_BLOCK", 31)
+BINARIZE_C = _env_int("BINARIZE_C", 15)
+
+# --- Досрочная остановка OCR ---
+# после каждой страницы текст прогоняется через извлечение полей; когда все
+# EARLY_EXIT_FIELDS найдены, остальные страницы документа не читаются
+EARLY_EXIT = _env_bool("EARLY_EXIT", False)
+EARLY_EXIT_FIELDS = [
+    '№ Основного договора',
+    'ИНН',
+    'БИК',
+    '№ Гарантии',
+    'Дата подписания',
+    'Дата окончания',
+    'Сумма',
+]
+# максимум страниц на документ (0 — без ограничения)
+MAX_PAGES_PER_DOCUMENT = _env_int("MAX_PAGES_PER_DOCUMENT", 0)
+
+# --- Пакетное распознавание ---
+# сколько страниц (в том числе разных документов) собирать в один пакет; 1 — постранично
+OCR_BATCH_SIZE = _env_int("OCR_BATCH_SIZE", 1)
+# сколько ждать заполнения пакета, секунды
+OCR_BATCH_MAX_WAIT = float(os.environ.get("OCR_BATCH_MAX_WAIT", "0.05"))
+# размер пакета фрагментов строк для распознавателя
+OCR_RECOGNIZER_BATCH_SIZE = _env_int("OCR_RECOGNIZER_BATCH_SIZE", 16)
+
+# --- Двухпроходное распознавание ---
+# первый проход по уменьшенной странице, второй — только неуверенные рамки и
+# строки с ключевыми словами полей, по изображению в полном разрешении
+TWO_PASS_OCR = _env_bool("TWO_PASS_OCR", False)
+# масштаб страницы в первом проходе
+FIRST_PASS_SCALE = float(os.environ.get("FIRST_PASS_SCALE", "0.5"))
+# рамки с уверенностью ниже порога распознаются повторно
+REOCR_CONFIDENCE = float(os.environ.get("REOCR_CONFIDENCE", "0.6"))
+
+# --- Чтение ZIP-архива ---
+# PDF крупнее этого размера пропускаются
+MAX_PDF_SIZE_MB = _env_int("MAX_PDF_SIZE_MB", 200)
+# вложенные архивы крупнее этого размера пропускаются
+MAX_NESTED_ZIP_SIZE_MB = _env_int("MAX_NESTED_ZIP_SIZE_MB", 2048)
+# глубина вложенности архивов
+MAX_ZIP_DEPTH = _env_int("MAX_ZIP_DEPTH", 3)
+# вложенный архив держится в памяти до этого размера, дальше — во временном файле
+ZIP_SPOOL_MB = _env_int("ZIP_SPOOL_MB", 64)
+
+# --- Загрузка архивов ---
+MAX_UPLOAD_MB = _env_int("MAX_UPLOAD_MB", 8192)
+# размер блока при записи загружаемого файла и при докачке частями
+UPLOAD_CHUNK_MB = _env_int("UPLOAD_CHUNK_MB", 8)
+# незавершённая загрузка частями без новых данных дольше этого срока удаляется
+UPLOAD_EXPIRE_HOURS = _env_int("UPLOAD_EXPIRE_HOURS", 24)
+# суммарный объявленный размер незавершённых загрузок; новые сверх него отклоняются
+MAX_OPEN_UPLOADS_MB = _env_int("MAX_OPEN_UPLOADS_MB", 2 * MAX_UPLOAD_MB)
+
+# --- Результаты ---
+# форматы файла результата через запятую: xlsx, csv, jsonl, parquet (нужен pyarrow);
+# первый формат отдаётся кнопкой «Скачать»
+RESULT_FORMATS = [f.strip() for f in os.environ.get("RESULT_FORMATS", "xlsx").split(",") if f.strip()]
+
+# --- Метрики ---
+# интервалы этапов задачи (документ, OCR, разбор) событиями span и в /jobs/{id}/trace
+TRACE_SPANS = _env_bool("TRACE_SPANS", False)
@@ -0,0 +1,96 @@
+import os
+import shutil
+import time
+import uuid
+
+from backend import config
+from backend.metrics import DOCUMENTS, ERRORS, REGISTRY
+from backend.task_queue import open_queue
+
+# Сторона веб-сервера в режиме EXECUTION_MODE=distributed: PDF кладутся в
+# TASK_SHARED_DIR, задачи — в очередь TASK_QUEUE_URL, результаты собираются
+# по мере того, как их сдают воркеры (backend.worker). Пути в задаче даны
+# относительно TASK_SHARED_DIR: на разных машинах общий диск может быть
+# смонтирован в разные папки.
+
+
+def shared_path(relative: str) -> str:
+    return os.path.join(config.TASK_SHARED_DIR, relative)
+
+
+def map_distributed(args_iter, log_callback=print, cancel_event=None, on_done=None, queue=None):
+    """
+    То же, что parallel.map_ordered для process_pdf_safe, но документы
+    обрабатывают воркеры через общую очередь. args_iter — наборы
+    (pdf, name, text_file, image_dir); .txt воркера копируется в text_file.
+    image_dir — папка веб-сервера, воркерам не передаётся: отладочные
+    изображения страниц в этом режиме не сохраняются.
+    on_done(i, result) вызывается в порядке готовности; упавшие документы — None.
+    """
+    queue = queue or open_queue()
+    batch = uuid.uuid4().hex
+    batch_dir = shared_path(batch)
+    os.makedirs(batch_dir, exist_ok=True)
+    text_files = {}
+    results = []
+    last_poll = 0.0
+
+    def collect():
+        for finished in queue.take_finished(batch):
+            i = finished.idx
+            result = finished.result or {}
+            for msg in result.get("log", []):
+                log_callback(msg)
+            if result.get("metrics"):
+                REGISTRY.merge(result["metrics"])
+            row = result.get("row")
+            if not finished.ok:
+                # попытки воркеров исчерпаны; успешные документы считает сам воркер
+                DOCUMENTS.inc(status="error")
+                ERRORS.inc(stage="worker")
+                log_callback(f"‼ Документ №{i + 1} не обработан воркерами: {finished.error}")
+            elif row is not None:
+                shutil.copyfile(shared_path(f"{batch}/{i:06d}.txt"), text_files[i])
+            results[i] = row
+            text_files.pop(i)
+            for suffix in ("pdf", "txt"):
+                try:
+                    os.remove(shared_path(f"{batch}/{i:06d}.{suffix}"))
+                except FileNotFoundError:
+                    pass
+            if on_done is not None:
+                on_done(i, row)
+
+    try:
+        for pdf, name, text_file, _ in args_iter:
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            i = len(results)
+            results.append(None)
+            relative = f"{batch}/{i:06d}"
+            if isinstance(pdf, (bytes, bytearray)):
+                with open(shared_path(relative + ".pdf"), "wb") as f:
+                    f.write(pdf)
+            else:
+                shutil.copyfile(pdf, shared_path(relative + ".pdf"))
+            text_files[i] = text_file
+            queue.put(batch, i, {"pdf": relative + ".pdf", "text": relative + ".txt", "name": name})
+            # готовые документы забираются и во время чтения архива
+            if time.monotonic() - last_poll >= config.TASK_POLL_SECONDS:
+                last_poll = time.monotonic()
+                collect()
+
+        if results:
+            log_callback(f"Документов в общей очереди: {len(results)}, ожидание воркеров")
+        while text_files:
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            collect()
+            if text_files:
+                time.sleep(config.TASK_POLL_SECONDS)
+    finally:
+        # при отмене или ошибке задачи пакета снимаются с очереди
+        if text_files:
+            queue.cancel(batch)
+        shutil.rmtree(batch_dir, ignore_errors=True)
+    return results
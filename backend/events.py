@@ -0,0 +1,99 @@
+import asyncio
+from collections import OrderedDict, deque
+
+from backend import config
+
+
+def event(type_: str, **data) -> dict:
+    """
+    Структурированное событие обработки. Передаётся через тот же log_callback,
+    что и текстовые строки: {"type": "page", "page": 3, ...}.
+    Типы: log, stage, page, progress, row, status.
+    """
+    return {"type": type_, **data}
+
+
+def as_event(msg) -> dict:
+    """Приводит сообщение из log_callback к событию."""
+    if isinstance(msg, dict) and "type" in msg:
+        return msg
+    return event("log", message=str(msg))
+
+
+class JobChannel:
+    """
+    Канал публикации/подписки событий одной задачи.
+    publish() можно вызывать из любого потока; подписчики получают события
+    без опроса через asyncio.Queue ограниченного размера, подключившиеся позже
+    сначала получают историю канала.
+    """
+
+    def __init__(self, loop, history: int = 5000, buffer: int = 1000):
+        self._loop = loop
+        self._history = deque(maxlen=history)
+        self._buffer = buffer
+        self._subscribers = set()
+        self.closed = False
+
+    def publish(self, msg):
+        self._loop.call_soon_threadsafe(self._publish, as_event(msg))
+
+    def close(self):
+        self._loop.call_soon_threadsafe(self._close)
+
+    @staticmethod
+    def _put(q: asyncio.Queue, item):
+        if q.full():
+            # медленный подписчик теряет самые старые события, а не тормозит задачу
+            q.get_nowait()
+        q.put_nowait(item)
+
+    def _publish(self, item):
+        if self.closed:
+            return
+        self._history.append(item)
+        for q in self._subscribers:
+            self._put(q, item)
+
+    def _close(self):
+        if self.closed:
+            return
+        self.closed = True
+        for q in self._subscribers:
+            self._put(q, None)
+
+    async def subscribe(self):
+        q = asyncio.Queue(self._buffer)
+        for item in self._history:
+            self._put(q, item)
+        if self.closed:
+            self._put(q, None)
+        self._subscribers.add(q)
+        try:
+            while True:
+                item = await q.get()
+                if item is None:
+                    return
+                yield item
+        finally:
+            self._subscribers.discard(q)
+
+
+class EventBus:
+    """Каналы событий по идентификатору задачи."""
+
+    def __init__(self):
+        self._channels: OrderedDict[str, JobChannel] = OrderedDict()
+
+    def open(self, job_id: str) -> JobChannel:
+        """Создаёт канал задачи; вызывается из потока цикла событий."""
+        channel = JobChannel(asyncio.get_running_loop(), config.EVENT_HISTORY, config.EVENT_BUFFER)
+        self._channels[job_id] = channel
+        # забываем самые старые завершённые задачи
+        closed = [key for key, ch in self._channels.items() if ch.closed]
+        for key in closed[:max(0, len(closed) - config.EVENT_CHANNELS_KEEP)]:
+            del self._channels[key]
+        return channel
+
+    def get(self, job_id: str) -> JobChannel | None:
+        return self._channels.get(job_id)
@@ -0,0 +1,127 @@
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+
+# Хранилище задач на диске (SQLite). Для каждой задачи сохраняются аргументы
+# запуска recognize и статус, для каждого готового документа — контрольная
+# точка: имя, путь к .txt и разобранная строка. После перезапуска сервера
+# незавершённые задачи ставятся в очередь заново и продолжают с последней
+# контрольной точки: готовые документы не распознаются повторно.
+
+# статусы, с которыми задача продолжается после перезапуска
+RESUMABLE = ("queued", "running", "interrupted")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    error TEXT,
+    args TEXT NOT NULL,
+    created TEXT NOT NULL,
+    started TEXT,
+    finished TEXT
+);
+CREATE TABLE IF NOT EXISTS documents (
+    job_id TEXT NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+    idx INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    status TEXT NOT NULL,
+    text_file TEXT,
+    row TEXT,
+    finished TEXT NOT NULL,
+    PRIMARY KEY (job_id, idx)
+);
+"""
+
+
+def _iso(value: datetime | None) -> str | None:
+    return value.isoformat() if value else None
+
+
+class JobStore:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # одно соединение на процесс, обращения из разных потоков — под замком
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA foreign_keys=ON")
+            self._db.executescript(_SCHEMA)
+
+    def _execute(self, sql, params=()):
+        with self._lock, self._db:
+            return self._db.execute(sql, params).fetchall()
+
+    def add_job(self, job, args: dict):
+        """args — именованные аргументы, с которыми задачу можно запустить заново."""
+        # не REPLACE: удаление строки задачи каскадом стёрло бы её контрольные точки
+        self._execute(
+            "INSERT INTO jobs (id, name, priority, status, args, created) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET status = excluded.status, error = NULL, finished = NULL",
+            (job.id, job.name, job.priority, job.status, json.dumps(args, ensure_ascii=False), _iso(job.created)),
+        )
+
+    def update_job(self, job, status: str | None = None):
+        self._execute(
+            "UPDATE jobs SET status = ?, error = ?, started = ?, finished = ? WHERE id = ?",
+            (status or job.status, job.error, _iso(job.started), _iso(job.finished), job.id),
+        )
+
+    def mark_failed(self, job_id: str, error: str):
+        self._execute("UPDATE jobs SET status = 'error', error = ?, finished = ? WHERE id = ?",
+                      (error, _iso(datetime.now()), job_id))
+
+    def checkpoint(self, job_id: str, idx: int, name: str, text_file: str | None, row: dict | None):
+        """Документ №idx задачи готов; row=None — документ упал и повторно не обрабатывается."""
+        self._execute(
+            "INSERT OR REPLACE INTO documents (job_id, idx, name, status, text_file, row, finished) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (job_id, idx, name, "done" if row is not None else "error", text_file,
+             json.dumps(row, ensure_ascii=False) if row is not None else None, _iso(datetime.now())),
+        )
+
+    def documents(self, job_id: str) -> dict:
+        """Готовые документы задачи: {номер: (имя, строка или None)}."""
+        rows = self._execute("SELECT idx, name, row FROM documents WHERE job_id = ?", (job_id,))
+        return {r["idx"]: (r["name"], json.loads(r["row"]) if r["row"] is not None else None) for r in rows}
+
+    def job_documents(self, job_id: str) -> list:
+        """Документы задачи по порядку: номер, имя, путь к .txt и строка (или None)."""
+        rows = self._execute("SELECT idx, name, text_file, row FROM documents WHERE job_id = ? ORDER BY idx",
+                             (job_id,))
+        return [{**dict(r), "row": json.loads(r["row"]) if r["row"] is not None else None} for r in rows]
+
+    def jobs(self, statuses=None) -> list:
+        """Задачи (все или с перечисленными статусами) в порядке создания, с аргументами запуска."""
+        if statuses:
+            placeholders = ",".join("?" * len(statuses))
+            rows = self._execute(f"SELECT * FROM jobs WHERE status IN ({placeholders}) ORDER BY created",
+                                 tuple(statuses))
+        else:
+            rows = self._execute("SELECT * FROM jobs ORDER BY created")
+        return [{**dict(r), "args": json.loads(r["args"])} for r in rows]
+
+    def resumable(self) -> list:
+        """Задачи, прерванные перезапуском, в порядке создания."""
+        return self.jobs(RESUMABLE)
+
+    def job_info(self, job_id: str) -> dict | None:
+        rows = self._execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        if not rows:
+            return None
+        info = dict(rows[0])
+        info.pop("args")
+        done = self._execute("SELECT COUNT(*) AS n FROM documents WHERE job_id = ?", (job_id,))
+        info["documents_done"] = done[0]["n"]
+        return info
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,171 @@
+import itertools
+import queue
+import shutil
+import threading
+import uuid
+from datetime import datetime
+
+from backend import config
+from backend.metrics import ERRORS, JOB_SECONDS, QUEUE_WAIT_SECONDS
+
+
+FINISHED = ("done", "error", "cancelled")
+
+
+class JobCancelled(Exception):
+    """Задача отменена клиентом."""
+
+
+class Job:
+    def __init__(self, func, args, name: str, priority: int = 0, job_id: str | None = None):
+        self.id = job_id or uuid.uuid4().hex
+        self.name = name
+        self.priority = priority
+        self.status = "queued"  # queued / running / done / error / cancelled
+        self.error = None
+        self.created = datetime.now()
+        self.started = None
+        self.finished = None
+        # задача прервана остановкой сервера, а не клиентом — её можно продолжить
+        self.interrupted = False
+        self.workspace = config.WORKSPACE_DIR / self.id
+        self.cancel_event = threading.Event()
+        self.spans = []  # события span задачи при TRACE_SPANS=1
+        self._func = func
+        self._args = args
+
+    def check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+
+    def info(self) -> dict:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "priority": self.priority,
+            "status": self.status,
+            "error": self.error,
+            "created": self.created.isoformat(),
+            "started": self.started.isoformat() if self.started else None,
+            "finished": self.finished.isoformat() if self.finished else None,
+        }
+
+
+class JobScheduler:
+    """
+    Очередь задач с ограничением числа одновременно выполняемых.
+    Задача — функция func(job, *args), выполняется в одном из max_concurrent потоков.
+    Порядок: FIFO или по убыванию приоритета (при равном приоритете — FIFO).
+    on_finish(job) вызывается, когда задача завершилась, упала или отменена.
+    Из завершённых задач в памяти остаются keep_finished последних.
+    """
+
+    def __init__(self, max_concurrent: int = 1, order: str = "fifo", on_finish=None,
+                 keep_finished: int | None = None):
+        self.max_concurrent = max(1, max_concurrent)
+        self.order = order
+        self.on_finish = on_finish
+        self.keep_finished = config.JOBS_KEEP_FINISHED if keep_finished is None else keep_finished
+        self.jobs: dict[str, Job] = {}
+        self._queue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def start(self):
+        for _ in range(self.max_concurrent):
+            thread = threading.Thread(target=self._worker, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        for job in list(self.jobs.values()):
+            if job.status in ("queued", "running"):
+                job.interrupted = True
+            job.cancel_event.set()
+        for _ in self._threads:
+            self._queue.put((float("-inf"), next(self._seq), None))
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def submit(self, func, *args, name: str = "", priority: int = 0, before_queue=None,
+               job_id: str | None = None) -> Job:
+        """
+        before_queue(job) вызывается до постановки в очередь, например чтобы подготовить канал логов.
+        job_id — id задачи, восстановленной после перезапуска.
+        """
+        job = Job(func, args, name=name, priority=priority, job_id=job_id)
+        with self._lock:
+            self.jobs[job.id] = job
+        if before_queue is not None:
+            before_queue(job)
+        key = -priority if self.order == "priority" else 0
+        self._queue.put((key, next(self._seq), job))
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        return self.jobs.get(job_id)
+
+    def list(self) -> list:
+        """Задачи в памяти (очередь, выполняемые и последние завершённые) в порядке постановки."""
+        with self._lock:
+            return list(self.jobs.values())
+
+    def position(self, job: Job) -> int:
+        """Сколько задач в очереди стоит перед данной (0 — следующая)."""
+        with self._queue.mutex:
+            entries = sorted(e for e in self._queue.queue if e[2] is not None)
+        waiting = [e[2] for e in entries if e[2].status == "queued"]
+        return waiting.index(job) if job in waiting else 0
+
+    def cancel(self, job_id: str) -> bool:
+        job = self.jobs.get(job_id)
+        if job is None or job.status in FINISHED:
+            return False
+        job.cancel_event.set()
+        with self._lock:
+            cancelled_in_queue = job.status == "queued"
+            if cancelled_in_queue:
+                # из очереди задачу уберёт рабочий поток, когда до неё дойдёт
+                job.status = "cancelled"
+                job.finished = datetime.now()
+        if cancelled_in_queue:
+            self._finished(job)
+        return True
+
+    def _finished(self, job: Job):
+        if self.on_finish is not None:
+            self.on_finish(job)
+        # забываем самые старые завершённые задачи: их статус остаётся в хранилище задач
+        with self._lock:
+            finished = [job_id for job_id, j in self.jobs.items() if j.status in FINISHED]
+            for job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+                del self.jobs[job_id]
+
+    def _worker(self):
+        while True:
+            _, _, job = self._queue.get()
+            if job is None:
+                return
+            with self._lock:
+                if job.status != "queued":
+                    continue
+                job.status = "running"
+                job.started = datetime.now()
+            QUEUE_WAIT_SECONDS.observe((job.started - job.created).total_seconds())
+            try:
+                job.workspace.mkdir(parents=True, exist_ok=True)
+                job._func(job, *job._args)
+                job.status = "cancelled" if job.cancel_event.is_set() else "done"
+            except JobCancelled:
+                job.status = "cancelled"
+            except Exception as e:
+                job.status = "error"
+                job.error = str(e)
+                ERRORS.inc(stage="job")
+            finally:
+                job.finished = datetime.now()
+                JOB_SECONDS.observe((job.finished - job.started).total_seconds(), status=job.status)
+                shutil.rmtree(job.workspace, ignore_errors=True)
+                self._finished(job)
@@ -0,0 +1,110 @@
+import re
+
+# Словарный индекс для поиска ключевых слов (месяцы, валюты, типы юрлиц,
+# виды гарантий) за один проход по тексту. Ключевые слова хранятся в
+# префиксном дереве; позиции, с которых начинается хотя бы одно слово,
+# находит одно скомпилированное регулярное выражение с опережающей
+# проверкой, после чего от каждой такой позиции дерево проходится один раз
+# и отдаёт все слова, начинающиеся в ней (в том числе вложенные: «март» и «марта»).
+
+_FLEX_SPACE = object()  # ребро дерева «один или несколько пробельных символов»
+
+
+class _Node:
+    __slots__ = ("children", "payloads", "subtree")
+
+    def __init__(self):
+        self.children = {}
+        self.payloads = []   # (ключевое слово, таблица, значение) для слов, заканчивающихся в узле
+        self.subtree = set()  # (таблица, значение) всех слов в поддереве, включая сам узел
+
+
+class KeywordIndex:
+    """
+    Индекс ключевых слов с привязкой к таблице и значению:
+    add("марта", "month", "03"). Если flexible_spaces=True, пробел в слове
+    совпадает с любой непустой последовательностью пробельных символов (как \\s+).
+    """
+
+    def __init__(self):
+        self._root = _Node()
+        self._patterns = {}  # таблица -> регулярные выражения начала слов
+        self._starts = {}
+
+    def add(self, keyword: str, table: str, value, flexible_spaces: bool = False):
+        node = self._root
+        for ch in keyword:
+            key = _FLEX_SPACE if flexible_spaces and ch == " " else ch
+            node = node.children.setdefault(key, _Node())
+        node.payloads.append((keyword, table, value))
+
+        parts = keyword.split(" ") if flexible_spaces else [keyword]
+        pattern = r"\s+".join(map(re.escape, parts))
+        self._patterns.setdefault(table, []).append(pattern)
+        self._starts.clear()
+
+    def _start_regex(self, table):
+        regex = self._starts.get(table)
+        if regex is None:
+            if table is None:
+                patterns = [p for ps in self._patterns.values() for p in ps]
+            else:
+                patterns = self._patterns.get(table, [])
+            regex = re.compile("(?=(?:" + "|".join(patterns) + "))") if patterns else re.compile(r"(?!)")
+            self._starts[table] = regex
+            self._fill_subtree(self._root)
+        return regex
+
+    def _fill_subtree(self, node):
+        node.subtree = {(table, value) for _, table, value in node.payloads}
+        for child in node.children.values():
+            node.subtree |= self._fill_subtree(child)
+        return node.subtree
+
+    def finditer(self, text: str, start: int = 0, end: int | None = None, table: str | None = None):
+        """
+        Все вхождения ключевых слов в text[start:end] по возрастанию позиции:
+        (начало, конец, ключевое слово, значение). Вхождения могут перекрываться.
+        """
+        end = len(text) if end is None else min(end, len(text))
+        for m in self._start_regex(table).finditer(text, start, end):
+            pos = m.start()
+            # обход дерева от позиции; пробельное ребро и обычный пробел могут ветвиться
+            stack = [(self._root, pos)]
+            found = []
+            while stack:
+                node, i = stack.pop()
+                for keyword, t, value in node.payloads:
+                    if table is None or t == table:
+                        found.append((pos, i, keyword, value))
+                if i >= end:
+                    continue
+                ch = text[i]
+                child = node.children.get(ch)
+                if child is not None:
+                    stack.append((child, i + 1))
+                flex = node.children.get(_FLEX_SPACE)
+                if flex is not None and ch.isspace():
+                    j = i + 1
+                    while j < end and text[j].isspace():
+                        j += 1
+                    stack.append((flex, j))
+            found.sort(key=lambda item: item[1])
+            yield from found
+
+    def prefix_matches(self, word: str, table: str) -> set:
+        """
+        Значения слов таблицы, которые являются префиксом word, совпадают с ним
+        или начинаются с word.
+        """
+        self._start_regex(table)
+        matches = set()
+        node = self._root
+        for ch in word:
+            matches.update(value for _, t, value in node.payloads if t == table)
+            node = node.children.get(ch)
+            if node is None:
+                return matches
+        # слово прочитано целиком: подходят все слова, которые с него начинаются
+        matches.update(value for t, value in node.subtree if t == table)
+        return matches
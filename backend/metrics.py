@@ -0,0 +1,205 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from backend import config
+from backend.events import event
+
+# Метрики процесса в текстовом формате Prometheus (/metrics) и,
+# при TRACE_SPANS=1, интервалы этапов задачи как события "span".
+# В режиме EXECUTION_MODE=process каждый воркер копит свои значения и после
+# каждого документа отправляет их родителю (drain/merge в parallel.py).
+
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+PAGE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+JOB_BUCKETS = (1.0, 5.0, 15.0, 30.0, 60.0, 300.0, 900.0, 1800.0, 3600.0, 7200.0)
+
+
+def _label_key(labelnames, labels) -> tuple:
+    if set(labels) != set(labelnames):
+        raise ValueError(f"Ожидались метки {labelnames}, получены {tuple(labels)}")
+    return tuple(str(labels[name]) for name in labelnames)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames, key, extra=()) -> str:
+    pairs = list(zip(labelnames, key)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def drain(self):
+        with self._lock:
+            values, self._values = self._values, {}
+        return list(values.items())
+
+    def merge(self, values):
+        with self._lock:
+            for key, amount in values:
+                key = tuple(key)
+                self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=PAGE_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # метки -> [счётчики по корзинам..., сумма, количество]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def drain(self):
+        with self._lock:
+            values, self._values = self._values, {}
+        return list(values.items())
+
+    def merge(self, values):
+        with self._lock:
+            for key, other in values:
+                key = tuple(key)
+                state = self._values.get(key)
+                if state is None:
+                    self._values[key] = list(other)
+                else:
+                    for i, value in enumerate(other):
+                        state[i] += value
+
+    def collect(self):
+        with self._lock:
+            items = sorted((key, list(state)) for key, state in self._values.items())
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, [("le", repr(float(bound)))])
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key, [("le", "+Inf")])
+            yield f"{self.name}_bucket{labels} {state[-1]}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {state[-2]}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {state[-1]}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labelnames=()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=PAGE_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+    def drain(self) -> dict:
+        """Забирает накопленные значения (для передачи из воркера в основной процесс)."""
+        return {name: metric.drain() for name, metric in self._metrics.items()}
+
+    def merge(self, samples: dict):
+        for name, values in samples.items():
+            metric = self._metrics.get(name)
+            if metric is not None and values:
+                metric.merge(values)
+
+
+REGISTRY = Registry()
+
+RENDER_SECONDS = REGISTRY.histogram(
+    "ocr_page_render_seconds", "Время рендера одной страницы PDF", ["source"])
+OCR_SECONDS = REGISTRY.histogram(
+    "ocr_page_recognize_seconds", "Время получения текста одной страницы", ["source"])
+PARSE_SECONDS = REGISTRY.histogram(
+    "ocr_parse_field_seconds", "Время функции извлечения одного поля", ["field"], buckets=FAST_BUCKETS)
+QUEUE_WAIT_SECONDS = REGISTRY.histogram(
+    "ocr_job_queue_wait_seconds", "Время ожидания задачи в очереди", buckets=JOB_BUCKETS)
+JOB_SECONDS = REGISTRY.histogram(
+    "ocr_job_duration_seconds", "Длительность выполнения задачи", ["status"], buckets=JOB_BUCKETS)
+
+PAGES = REGISTRY.counter("ocr_pages_total", "Обработанные страницы", ["source"])
+DOCUMENTS = REGISTRY.counter("ocr_documents_total", "Обработанные документы", ["status"])
+CACHE = REGISTRY.counter("ocr_cache_lookups_total", "Обращения к кэшу OCR", ["result"])
+ERRORS = REGISTRY.counter("ocr_errors_total", "Ошибки обработки", ["stage"])
+TWO_PASS_BOXES = REGISTRY.counter(
+    "ocr_two_pass_boxes_total", "Рамки текста в двухпроходном OCR: найденные и распознанные повторно", ["stage"])
+
+
+@contextmanager
+def span(log_callback, name: str, **attrs):
+    """
+    Интервал этапа задачи: при TRACE_SPANS=1 по завершении уходит в log_callback
+    событием span (начало — unix-время, длительность в секундах).
+    """
+    if not config.TRACE_SPANS:
+        yield
+        return
+    start = time.time()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        log_callback(event("span", name=name, start=start,
+                           duration=round(time.perf_counter() - started, 6), **attrs))
@@ -0,0 +1,185 @@
+import multiprocessing as mp
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from backend import config
+from backend.events import event
+from backend.metrics import ERRORS, REGISTRY
+
+# сколько раз повторяется документ, чей процесс аварийно завершился; повтор идёт
+# в пуле без других документов: упавший пул роняет все свои задачи, и виновника
+# среди них видно только при запуске по одному
+CRASH_RETRIES = 1
+# сколько процесс пула ждёт остальных при прогреве, секунды
+WARMUP_TIMEOUT = 600
+
+_STOP = "__stop__"
+_METRICS = "__metrics__"
+
+_executor = None
+_manager = None
+_lock = threading.Lock()
+
+
+def _init_worker():
+    # у каждого процесса ровно один Reader, загруженный при старте процесса
+    config.OCR_POOL_SIZE = 1
+    from backend.script.ocr_pool import get_pool
+    get_pool().warm_up(log_callback=lambda msg: None)
+
+
+def _ready(barrier):
+    # задача начинается только после _init_worker своего процесса; барьер держит
+    # её, пока такие же задачи не придут во все WORKERS процессов, поэтому один
+    # быстрый процесс не может выполнить их все за остальных
+    barrier.wait()
+    return os.getpid()
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """Пул процессов живёт между задачами, чтобы модели оставались загруженными."""
+    global _executor, _manager
+    with _lock:
+        if _executor is None:
+            # spawn: форк процесса с загруженным torch/CUDA ненадёжен
+            ctx = mp.get_context("spawn")
+            if _manager is None:
+                _manager = ctx.Manager()
+            _executor = ProcessPoolExecutor(
+                max_workers=config.WORKERS,
+                mp_context=ctx,
+                initializer=_init_worker
+            )
+        return _executor
+
+
+def _reset_executor():
+    global _executor
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def warm_up(log_callback=print):
+    """
+    Поднимает все процессы пула и ждёт, пока каждый загрузит модель,
+    чтобы первая задача не ждала загрузку моделей.
+    """
+    executor = get_executor()
+    barrier = _manager.Barrier(config.WORKERS, timeout=WARMUP_TIMEOUT)
+    futures = [executor.submit(_ready, barrier) for _ in range(config.WORKERS)]
+    pids = {future.result() for future in futures}
+    log_callback(f"[parallel] Запущено процессов OCR: {len(pids)}")
+
+
+def shutdown():
+    global _manager
+    _reset_executor()
+    with _lock:
+        if _manager is not None:
+            _manager.shutdown()
+            _manager = None
+
+
+def _drain(log_queue, log_callback):
+    while True:
+        msg = log_queue.get()
+        if msg == _STOP:
+            return
+        if isinstance(msg, dict) and msg.get("type") == _METRICS:
+            # метрики воркера добавляются к метрикам основного процесса, в лог не идут
+            REGISTRY.merge(msg["samples"])
+            continue
+        log_callback(msg)
+
+
+def _call(fn, log_queue, args):
+    try:
+        return fn(*args, log_callback=log_queue.put)
+    finally:
+        log_queue.put(event(_METRICS, samples=REGISTRY.drain()))
+
+
+def map_ordered(fn, args_iter, log_callback=print, cancel_event=None, on_done=None, max_pending=None):
+    """
+    Выполняет fn(*args, log_callback=...) для каждого набора args в пуле процессов.
+    args_iter может быть генератором: вызовы отправляются по мере его чтения,
+    одновременно в работе не больше max_pending (по умолчанию 2 × WORKERS).
+    Логи воркеров передаются в log_callback по мере поступления.
+    Результаты возвращаются в исходном порядке; для упавших процессов — None.
+    Если процесс пула аварийно завершился, все документы этого пула
+    повторяются по одному (CRASH_RETRIES); None получает только документ,
+    который роняет процесс и в одиночку.
+    При установке cancel_event ещё не начатые вызовы снимаются с очереди.
+    on_done(i, result) вызывается по завершении каждого вызова в порядке готовности.
+    """
+    if max_pending is None:
+        max_pending = 2 * config.WORKERS
+    results = []
+    executor = get_executor()
+    log_queue = _manager.Queue()
+    drain = threading.Thread(target=_drain, args=(log_queue, log_callback), daemon=True)
+    drain.start()
+    try:
+        args_iter = iter(args_iter)
+        # future -> (номер документа, пул, args, попытка)
+        pending = {}
+        # документы упавшего пула: (номер, args, попытка), повторяются по одному
+        retry = deque()
+        exhausted = False
+        while True:
+            cancelled = cancel_event is not None and cancel_event.is_set()
+            if cancelled:
+                retry.clear()
+            elif retry or any(attempt for _, _, _, attempt in pending.values()):
+                if not pending:
+                    i, args, attempt = retry.popleft()
+                    pending[executor.submit(_call, fn, log_queue, args)] = (i, executor, args, attempt)
+            else:
+                while not exhausted and len(pending) < max_pending:
+                    try:
+                        args = next(args_iter)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    results.append(None)
+                    pending[executor.submit(_call, fn, log_queue, args)] = (len(results) - 1, executor, args, 0)
+            if cancelled:
+                for future in pending:
+                    future.cancel()
+            if not pending:
+                break
+
+            done, _ = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            broken = False
+            for future in done:
+                i, owner, args, attempt = pending.pop(future)
+                if future.cancelled():
+                    continue
+                try:
+                    results[i] = future.result()
+                except BrokenProcessPool:
+                    # пул пересоздаётся один раз, даже если упало несколько его задач
+                    broken = broken or owner is executor
+                    if attempt < CRASH_RETRIES:
+                        log_callback(f"Процесс пула аварийно завершился, документ №{i + 1} будет повторён отдельно")
+                        retry.append((i, args, attempt + 1))
+                        continue
+                    ERRORS.inc(stage="worker")
+                    log_callback(f"‼ Процесс обработки документа №{i + 1} аварийно завершился")
+                except Exception as e:
+                    log_callback(f"‼ Ошибка при обработке документа №{i + 1}: {e}")
+                if on_done is not None:
+                    on_done(i, results[i])
+            if broken:
+                # остальные документы пойдут в новый пул
+                _reset_executor()
+                executor = get_executor()
+    finally:
+        log_queue.put(_STOP)
+        drain.join()
+    return results
@@ -1,15 +1,78 @@
 import os
-import zipfile
 import datetime
 import shutil
-import glob
-import pandas as pd
-from backend.script.pdf2images import pdf_to_images
+from backend import config
+from backend.script.pdf2images import render_pages, save_pages
 from backend.script.images2text import images_to_text
-from backend.text_handler import parse_bank_guarantee
+from backend.script.pipeline import prefetch
+from backend.script.triage import triage_pages
+from backend.script.preprocess import preprocess_pages
+from backend.script.zip_ingest import iter_zip_pdfs, count_zip_pdfs
+from backend.text_handler import parse_bank_guarantee, missing_fields
+from backend.parallel import map_ordered
+from backend.distributed import map_distributed
+from backend.jobs import JobCancelled
+from backend.events import event
+from backend.results import ResultSink, COLUMNS
+from backend.metrics import DOCUMENTS, ERRORS, span
 from pathlib import Path
 
-def recognize(zip_path: str, result_path: str, filename_without_zip_with_time: str, time: str, log_callback=print):
+
+# номера страниц, которые реально были прочитаны (при досрочной остановке OCR)
+PAGES_COLUMN = 'Прочитанные страницы'
+
+
+def process_pdf(pdf, name: str, text_file: str, image_dir: str | None = None, log_callback=print) -> dict:
+    """Полная обработка одного PDF (путь или байты): рендер, OCR, запись .txt и разбор полей."""
+    log_callback(f"\n Обработка {name}...")
+    log_callback(event("stage", stage="ocr", document=name))
+    # страницы идут из рендера в OCR в памяти, без PNG на диске
+    pages = render_pages(pdf, dpi=config.RENDER_DPI, log_callback=log_callback)
+    if image_dir:
+        pages = save_pages(pages, image_dir, log_callback=log_callback)
+    if config.PAGE_TRIAGE:
+        # пустые и нетекстовые страницы отсеиваются ещё в потоке рендера
+        pages = triage_pages(pages, log_callback=log_callback)
+    if config.PREPROCESS:
+        pages = preprocess_pages(pages, log_callback=log_callback)
+
+    stop_when = None
+    if config.EARLY_EXIT:
+        stop_when = lambda text: not missing_fields(text, config.EARLY_EXIT_FIELDS)
+
+    with span(log_callback, "ocr", document=name):
+        pages_read = images_to_text(prefetch(pages, config.PAGE_PREFETCH), text_file, log_callback=log_callback,
+                                    stop_when=stop_when, max_pages=config.MAX_PAGES_PER_DOCUMENT)
+    log_callback(event("stage", stage="parse", document=name))
+    with span(log_callback, "parse", document=name):
+        row_cells = parse_bank_guarantee(text_file)
+    row_cells[PAGES_COLUMN] = ", ".join(map(str, pages_read))
+    log_callback(event("row", document=name, row=row_cells))
+    return row_cells
+
+
+def process_pdf_safe(pdf, name: str, text_file: str, image_dir: str | None = None, log_callback=print):
+    """То же, что process_pdf, но ошибка одного документа не прерывает остальные: возвращает None."""
+    try:
+        with span(log_callback, "document", document=name):
+            row = process_pdf(pdf, name, text_file, image_dir, log_callback=log_callback)
+        DOCUMENTS.inc(status="ok")
+        return row
+    except Exception as e:
+        DOCUMENTS.inc(status="error")
+        ERRORS.inc(stage="document")
+        log_callback(f"Ошибка при обработке {name}: {e}")
+        return None
+
+
+def recognize(zip_path: str, result_path: str, filename_without_zip_with_time: str, time: str, log_callback=print,
+              workspace=None, cancel_event=None, completed=None, on_document=None):
+    """
+    workspace — рабочая папка задачи (по умолчанию своя папка в temp для каждого архива),
+    cancel_event — threading.Event, при установке обработка прерывается между документами,
+    completed — {номер документа: (имя, строка)} уже готовых документов (продолжение после перезапуска),
+    on_document(номер, имя, text_file, строка) — контрольная точка после каждого документа.
+    """
     if not os.path.exists(zip_path):
         log_callback("ZIP-архив не найден."); return
 
@@ -17,68 +80,118 @@ def recognize(zip_path: str, result_path: str, filename_without_zip_with_time: s
 
     BASE = Path(__file__).resolve().parent.parent
 
-    temp_dir = BASE / "backend" / "script" / "temp"
+    # у каждой задачи своя папка: параллельные загрузки не удаляют файлы друг друга
+    temp_dir = Path(workspace) if workspace else BASE / "backend" / "script" / "temp" / filename_without_zip_with_time
     output_dir = BASE / "files" / "texts" / filename_without_zip_with_time
 
     # подготовка папок
-    shutil.rmtree(temp_dir, ignore_errors=True)
     os.makedirs(temp_dir, exist_ok=True)
     os.makedirs(output_dir, exist_ok=True)
 
 
-    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-        zip_ref.extractall(temp_dir)
-
-    pdf_files = glob.glob(os.path.join(temp_dir, '**', '*.pdf'), recursive=True)
-    if not pdf_files:
-        log_callback("В ZIP-архиве не обнаружено ни одного PDF."); return
-
+    # PDF читаются прямо из архива по одному: первый документ уходит в OCR,
+    # пока остальные ещё не прочитаны
+    expected = count_zip_pdfs(zip_path)
+    completed = completed or {}
     pdf_names = []
-    for pdf in pdf_files:
-        try:
-            pdf_name = os.path.basename(pdf).encode('cp437').decode('cp866')
-        except Exception:
-            pdf_name = os.path.basename(pdf)
-        pdf_names.append(pdf_name)
-
-    pdf_files_string = "\n".join(pdf_names)
-
-    log_callback(f"Найденные PDF-файлы: \n{pdf_files_string}")
-
-    records = []  # будет список dict'ов {filename: ..., text: ...}
-
-    for i, pdf_path in enumerate(pdf_files):
-        try:
-            name = os.path.splitext(os.path.basename(pdf_path).encode('cp437').decode('cp866'))[0]
-        except Exception:
-            name = os.path.splitext(os.path.basename(pdf_path))[0]
-        log_callback(f"\n Обработка {name}...")
-        try:
-            image_dir = os.path.join(temp_dir, f"images_{name}")
-            os.makedirs(image_dir, exist_ok=True)
-            pdf_to_images(pdf_path, image_dir, log_callback=log_callback)
-
+    # номер документа в архиве и его .txt для каждой отправленной в обработку задачи
+    task_docs = []
+
+    def tasks():
+        for pdf_name, data in iter_zip_pdfs(zip_path, log_callback=log_callback, spool_dir=temp_dir):
+            if cancel_event is not None and cancel_event.is_set():
+                return
+            doc_index = len(pdf_names)
+            pdf_names.append(os.path.basename(pdf_name))
+            if doc_index in completed:
+                # документ готов до перезапуска: строка берётся из контрольной точки
+                add_row(doc_index, completed[doc_index][1])
+                continue
+            log_callback(f"Найден PDF-файл: {pdf_name}")
+            name = os.path.splitext(os.path.basename(pdf_name))[0]
             # Проверяем, есть ли файл с таким названием. Если есть, добавляем временную метку для различия
             text_file = os.path.join(output_dir, f"{name}_{time}.txt")
-
-            images_to_text(image_dir, text_file, log_callback=log_callback)
-            row_cells = parse_bank_guarantee(text_file)
-            log_callback(row_cells)
-            records.append(row_cells)
-
-        except Exception as e:
-            log_callback(f"Ошибка при обработке {name}: {e}")
+            image_dir = None
+            if config.SAVE_PAGE_IMAGES:
+                image_dir = str(config.DEBUG_IMAGES_DIR / filename_without_zip_with_time / name)
+            task_docs.append((doc_index, text_file))
+            yield data, name, text_file, image_dir
+
+    # строки результата пишутся по мере готовности документов
+    columns = list(COLUMNS)
+    if config.EARLY_EXIT or config.MAX_PAGES_PER_DOCUMENT:
+        columns.append(PAGES_COLUMN)
+    sink = ResultSink(result_path, columns=columns, log_callback=log_callback)
+    if completed:
+        log_callback(f"Продолжение обработки: готово документов — {len(completed)}")
+
+    done = 0
+    processed = 0
+
+    def add_row(doc_index, row):
+        nonlocal done, processed
+        done += 1
+        processed += row is not None
+        # упавший документ остаётся в таблице пустой строкой
+        sink.add(doc_index, pdf_names[doc_index], row)
+        # вложенные архивы становятся известны по ходу чтения, поэтому итог может расти
+        total = max(expected, len(pdf_names))
+        log_callback(event("progress", done=done, total=total, percent=round(100 * done / total, 1)))
+
+    def report_progress(i, row):
+        doc_index, text_file = task_docs[i]
+        add_row(doc_index, row)
+        if on_document is not None:
+            on_document(doc_index, pdf_names[doc_index], text_file, row)
+
+    def save_partial():
+        # уже разобранные документы не теряются при падении или отмене обработки
+        if sink.written:
+            created = sink.close()
+            log_callback(f"Частичный результат ({sink.written} док.) сохранён: {', '.join(map(str, created.values()))}")
+        else:
+            sink.discard()
+
+    try:
+        if config.EXECUTION_MODE == "process":
+            # документы целиком распределяются по процессам, порядок строк сохраняется
+            log_callback(f"Параллельная обработка в {config.WORKERS} процессах")
+            map_ordered(process_pdf_safe, tasks(), log_callback=log_callback, cancel_event=cancel_event,
+                        on_done=report_progress)
+        elif config.EXECUTION_MODE == "distributed":
+            # документы обрабатывают воркеры (backend.worker), здесь только сбор строк
+            map_distributed(tasks(), log_callback=log_callback, cancel_event=cancel_event,
+                            on_done=report_progress)
+        else:
+            for i, task in enumerate(tasks()):
+                report_progress(i, process_pdf_safe(*task, log_callback=log_callback))
+    except BaseException:
+        save_partial()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
+
+    if cancel_event is not None and cancel_event.is_set():
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        save_partial()
+        log_callback("Обработка отменена.")
+        raise JobCancelled()
+
+    if not pdf_names:
+        sink.discard()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        log_callback("В ZIP-архиве не обнаружено ни одного PDF."); return
+    log_callback(event("stage", stage="documents", documents=pdf_names))
 
     # Удаляем temp
-    shutil.rmtree(temp_dir)
-    columns = ['№ Основного договора', 'Дата подписания основного договора', 'ИНН', 'БИК', 'Вид гарантии', 'Принципал', '№ Гарантии', 'ДОП / ИЗМ', 'Дата подписания', 'Дата начала', 'Дата окончания', 'Сумма', 'Валюта']
+    shutil.rmtree(temp_dir, ignore_errors=True)
 
-    # Строим DataFrame: каждая строка = файл, 2 колонки
-    df = pd.DataFrame(records, columns=columns, index=pdf_names)
-    df.to_excel(result_path, sheet_name='Main')
+    log_callback(event("stage", stage="excel"))
+    with span(log_callback, "excel"):
+        created = sink.close()
 
     end = datetime.datetime.now()
-    log_callback(f"\nОбработано файлов: {len(records)}")
+    log_callback(f"\nОбработано файлов: {processed}")
     log_callback(f"Время выполнения: {end - start}")
     log_callback(f"Текстовые файлы сохранены в папке: {output_dir}")
-    log_callback(f"Excel сохранен в: {result_path}")
\ No newline at end of file
+    for fmt, path in created.items():
+        log_callback(f"Результат ({fmt}) сохранен в: {path}")
@@ -0,0 +1,200 @@
+"""
+Повторный разбор сохранённых текстов без повторного OCR.
+
+    python -m backend.reextract --job <id задачи>
+    python -m backend.reextract --all
+    python -m backend.reextract --texts files/texts/<папка задачи>
+
+После правки регулярных выражений в text_handler .txt, сохранённые
+задачами в files/texts, заново проходят parse_bank_guarantee (параллельно,
+в WORKERS процессах). Рядом с прежним результатом в files/results
+появляется новый файл «<имя>_reparsed_<время>», а в <имя>.changes.json
+записывается, какие поля у каких документов изменились по сравнению с
+прошлым разбором. Прежние строки берутся из хранилища задач, новые
+записываются туда же: следующий повторный разбор сравнивается с этим.
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from backend import config
+from backend.job_store import RESUMABLE, JobStore
+from backend.results import COLUMNS, NAME_COLUMN, ResultSink, result_columns
+from backend.text_handler import parse_bank_guarantee
+
+RESULTS_DIR = config.BASE / "files" / "results"
+
+
+def _parse(text_file):
+    if not text_file or not os.path.exists(text_file):
+        return None
+    return parse_bank_guarantee(text_file)
+
+
+def parse_texts(text_files: list, workers: int | None = None) -> list:
+    """Строки для каждого .txt по порядку; None — файла нет."""
+    workers = min(workers or config.WORKERS, len(text_files))
+    if workers <= 1:
+        return [_parse(path) for path in text_files]
+    # spawn, как у пула OCR: форк процесса веб-сервера с потоками ненадёжен
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn")) as executor:
+        return list(executor.map(_parse, text_files, chunksize=max(1, len(text_files) // (4 * workers))))
+
+
+def reextract_documents(documents: list, new_rows: list, result_path, extra=(), log_callback=print) -> dict:
+    """
+    documents — [{name, text_file, row}] с прежними строками (row может быть None),
+    new_rows — строки parse_texts для них по порядку; extra — служебные столбцы
+    прежнего результата (например, прочитанные страницы), их значения берутся
+    из прежних строк. Пишет новый результат в result_path и возвращает отчёт.
+    """
+    extra = list(extra)
+    sink = ResultSink(result_path, columns=COLUMNS + extra, log_callback=log_callback)
+    changes = []
+    fields = Counter()
+    missing = []
+    new_documents = 0
+    for i, (doc, row) in enumerate(zip(documents, new_rows)):
+        old = doc["row"]
+        if row is None:
+            missing.append(doc["name"])
+        elif old is None:
+            # прежней строки нет (документ падал или задача старше хранилища) — сравнивать не с чем
+            new_documents += 1
+        else:
+            row.update({key: old[key] for key in extra if key in old})
+            for field in COLUMNS:
+                if old.get(field) != row.get(field):
+                    fields[field] += 1
+                    changes.append({"document": doc["name"], "field": field,
+                                    "old": old.get(field), "new": row.get(field)})
+        sink.add(i, doc["name"], row)
+    created = sink.close()
+
+    report = {
+        "documents": len(documents),
+        "changed_documents": len({change["document"] for change in changes}),
+        "new_documents": new_documents,
+        "missing_texts": missing,
+        "fields": dict(fields.most_common()),
+        "changes": changes,
+        "result": {fmt: str(path) for fmt, path in created.items()},
+    }
+    report_path = Path(result_path).with_name(Path(result_path).stem + ".changes.json")
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+    report["report"] = str(report_path)
+    log_callback(f"Повторный разбор: документов {len(documents)}, изменилось {report['changed_documents']}, "
+                 f"результат: {', '.join(report['result'].values())}")
+    return report
+
+
+def _reparsed_path(result_path) -> Path:
+    result_path = Path(result_path)
+    stamp = datetime.now().strftime('%Y-%m-%d %H-%M-%S')
+    return RESULTS_DIR / f"{result_path.stem}_reparsed_{stamp}{result_path.suffix}"
+
+
+def _job_documents(store: JobStore, job_id: str) -> tuple:
+    job = next((j for j in store.jobs() if j["id"] == job_id), None)
+    if job is None:
+        raise KeyError(f"Задача {job_id} не найдена")
+    if job["status"] in RESUMABLE:
+        raise ValueError(f"Задача {job_id} ещё не завершена")
+    documents = store.job_documents(job_id)
+    if not documents:
+        raise ValueError(f"У задачи {job_id} нет сохранённых документов")
+    return job, documents
+
+
+def _reextract_job(store: JobStore, job: dict, documents: list, new_rows: list, log_callback, update: bool) -> dict:
+    result_path = job["args"]["result_path"]
+    # служебные столбцы переносятся, только если они были в прежнем файле результата
+    extra = [column for column in result_columns(result_path) or ()
+             if column not in COLUMNS and column != NAME_COLUMN]
+    report = reextract_documents(documents, new_rows, _reparsed_path(result_path), extra, log_callback)
+    if update:
+        for doc, row in zip(documents, new_rows):
+            if row is not None:
+                store.checkpoint(job["id"], doc["idx"], doc["name"], doc["text_file"], row)
+    return {"job_id": job["id"], "name": job["name"], **report}
+
+
+def reextract_job(store: JobStore, job_id: str, log_callback=print, update: bool = True) -> dict:
+    job, documents = _job_documents(store, job_id)
+    new_rows = parse_texts([doc["text_file"] for doc in documents])
+    return _reextract_job(store, job, documents, new_rows, log_callback, update)
+
+
+def reextract_all(store: JobStore, log_callback=print, update: bool = True) -> dict:
+    """Все завершённые задачи; сводка по полям и отчёт по каждой задаче (без списка изменений)."""
+    selected = []
+    for job in store.jobs(("done",)):
+        try:
+            selected.append(_job_documents(store, job["id"]))
+        except (KeyError, ValueError) as e:
+            log_callback(f"Пропуск задачи {job['id']}: {e}")
+
+    # тексты всех задач разбираются одним пулом процессов, затем строки делятся обратно по задачам
+    new_rows = parse_texts([doc["text_file"] for _, documents in selected for doc in documents])
+    jobs = []
+    fields = Counter()
+    start = 0
+    for job, documents in selected:
+        rows = new_rows[start:start + len(documents)]
+        start += len(documents)
+        report = _reextract_job(store, job, documents, rows, log_callback, update)
+        fields.update(report["fields"])
+        jobs.append({key: value for key, value in report.items() if key != "changes"})
+    return {
+        "jobs": jobs,
+        "documents": sum(job["documents"] for job in jobs),
+        "changed_documents": sum(job["changed_documents"] for job in jobs),
+        "fields": dict(fields.most_common()),
+    }
+
+
+def reextract_texts(texts_dir, log_callback=print) -> dict:
+    """Папка .txt без записей в хранилище (задачи до появления хранилища): без сравнения."""
+    texts_dir = Path(texts_dir)
+    files = sorted(texts_dir.glob("*.txt"))
+    if not files:
+        raise ValueError(f"В {texts_dir} нет .txt")
+    documents = [{"name": path.stem, "text_file": str(path), "row": None} for path in files]
+    new_rows = parse_texts([doc["text_file"] for doc in documents])
+    return reextract_documents(documents, new_rows, _reparsed_path(f"{texts_dir.name}.{config.RESULT_FORMATS[0]}"),
+                               log_callback=log_callback)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--job", help="id задачи")
+    source.add_argument("--all", action="store_true", help="все завершённые задачи")
+    source.add_argument("--texts", help="папка с .txt задачи, которой нет в хранилище")
+    parser.add_argument("--no-update", action="store_true",
+                        help="не записывать новые строки в хранилище задач")
+    args = parser.parse_args()
+
+    if args.texts:
+        report = reextract_texts(args.texts)
+    else:
+        store = JobStore(config.JOB_STORE_PATH)
+        try:
+            if args.all:
+                report = reextract_all(store, update=not args.no_update)
+            else:
+                report = reextract_job(store, args.job, update=not args.no_update)
+        finally:
+            store.close()
+    for field, count in report["fields"].items():
+        print(f"{field:>36}: изменилось у {count} док.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+import csv
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+from backend import config
+
+# Запись результатов по мере готовности документов. Каждая строка сразу
+# дописывается в журнал <результат>.partial.jsonl (и в CSV, если он нужен),
+# поэтому при падении обработки уже разобранные документы не теряются, а
+# /download может отдать срез результата, пока задача ещё идёт.
+# Excel пишется в режиме write-only: строки не держатся в памяти целиком.
+
+COLUMNS = ['№ Основного договора', 'Дата подписания основного договора', 'ИНН', 'БИК', 'Вид гарантии', 'Принципал', '№ Гарантии', 'ДОП / ИЗМ', 'Дата подписания', 'Дата начала', 'Дата окончания', 'Сумма', 'Валюта']
+
+FORMATS = ("xlsx", "csv", "jsonl", "parquet")
+
+MEDIA_TYPES = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# первый столбец таблицы — имя PDF (как индекс DataFrame раньше)
+NAME_COLUMN = "Файл"
+
+
+def result_paths(result_path, formats=None) -> dict:
+    """Пути результата для каждого формата: тот же файл с другим расширением."""
+    result_path = Path(result_path)
+    return {fmt: result_path.with_suffix("." + fmt) for fmt in (formats or config.RESULT_FORMATS)}
+
+
+def result_columns(result_path) -> list | None:
+    """
+    Столбцы (без NAME_COLUMN) уже записанного результата по первому найденному
+    файлу csv, jsonl или xlsx с тем же именем; None — таких файлов нет.
+    """
+    paths = result_paths(result_path, ("csv", "jsonl", "xlsx"))
+    if paths["csv"].exists():
+        with open(paths["csv"], encoding="utf-8-sig", newline="") as f:
+            header = next(csv.reader(f, delimiter=";"), [])
+        return header[1:]
+    if paths["jsonl"].exists():
+        with open(paths["jsonl"], encoding="utf-8") as f:
+            line = f.readline()
+        return [key for key in json.loads(line) if key != NAME_COLUMN] if line.strip() else []
+    if paths["xlsx"].exists():
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(paths["xlsx"], read_only=True)
+        try:
+            header = next(workbook.active.iter_rows(max_row=1, values_only=True), ())
+        finally:
+            workbook.close()
+        return [column for column in header[1:] if column]
+    return None
+
+
+def _journal_path(result_path) -> Path:
+    result_path = Path(result_path)
+    return result_path.with_name(result_path.stem + ".partial.jsonl")
+
+
+def _read_journal(path):
+    """Строки журнала; недописанная последняя строка пропускается."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.endswith("\n"):
+                yield json.loads(line)
+
+
+def _write_xlsx(path, columns, records):
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Main")
+    sheet.append([""] + columns)
+    for name, row in records:
+        sheet.append([name] + [row.get(column) for column in columns])
+    workbook.save(path)
+
+
+def _write_parquet(path, columns, records):
+    import pandas as pd
+
+    names, rows = [], []
+    for name, row in records:
+        names.append(name)
+        rows.append({column: row.get(column) for column in columns})
+    df = pd.DataFrame(rows, columns=columns, index=pd.Index(names, name=NAME_COLUMN))
+    # без pyarrow/fastparquet pandas выбросит ImportError
+    df.astype("string").to_parquet(path)
+
+
+class ResultSink:
+    """
+    Приёмник строк результата. add(i, name, row) можно вызывать в любом
+    порядке готовности: строки пишутся в порядке номеров документов i,
+    опередившие ждут в буфере. close() собирает итоговые файлы всех форматов
+    из журнала.
+    """
+
+    def __init__(self, result_path, columns=None, formats=None, log_callback=print):
+        self.result_path = Path(result_path)
+        self.columns = list(columns or COLUMNS)
+        self.paths = result_paths(result_path, formats)
+        self.log_callback = log_callback
+        self.written = 0
+        self._next = 0
+        self._waiting = {}
+        self._lock = threading.Lock()
+        self._journal_path = _journal_path(result_path)
+        self._journal = open(self._journal_path, "w", encoding="utf-8")
+        self._csv_file = None
+        if "csv" in self.paths:
+            # utf-8-sig: Excel открывает такой CSV с кириллицей без настройки кодировки
+            self._csv_file = open(self.paths["csv"], "w", encoding="utf-8-sig", newline="")
+            self._csv = csv.writer(self._csv_file, delimiter=";")
+            self._csv.writerow([NAME_COLUMN] + self.columns)
+            self._csv_file.flush()
+        _register(self)
+
+    def add(self, i: int, name: str, row: dict | None):
+        """Строка документа №i; упавший документ (row=None) остаётся пустой строкой."""
+        with self._lock:
+            self._waiting[i] = (name, row or {})
+            while self._next in self._waiting:
+                self._write(*self._waiting.pop(self._next))
+                self._next += 1
+
+    def _write(self, name, row):
+        values = {column: row.get(column) for column in self.columns}
+        self._journal.write(json.dumps({"name": name, "row": values}, ensure_ascii=False) + "\n")
+        self._journal.flush()
+        if self._csv_file is not None:
+            self._csv.writerow([name] + ["" if v is None else v for v in values.values()])
+            self._csv_file.flush()
+        self.written += 1
+
+    def _records(self):
+        for record in _read_journal(self._journal_path):
+            yield record["name"], record["row"]
+
+    def snapshot(self, fmt: str = "xlsx") -> Path:
+        """
+        Срез уже записанных строк во временном файле заданного формата.
+        Файл нужно удалить после отдачи.
+        """
+        with self._lock:
+            fd, path = tempfile.mkstemp(suffix="." + fmt, dir=self.result_path.parent)
+            os.close(fd)
+            try:
+                self._export(fmt, Path(path))
+            except Exception:
+                os.remove(path)
+                raise
+        return Path(path)
+
+    def _export(self, fmt, path):
+        if fmt == "xlsx":
+            _write_xlsx(path, self.columns, self._records())
+        elif fmt == "parquet":
+            _write_parquet(path, self.columns, self._records())
+        elif fmt == "jsonl":
+            with open(path, "w", encoding="utf-8") as f:
+                for name, row in self._records():
+                    f.write(json.dumps({NAME_COLUMN: name, **row}, ensure_ascii=False) + "\n")
+        elif fmt == "csv":
+            with open(path, "w", encoding="utf-8-sig", newline="") as f:
+                writer = csv.writer(f, delimiter=";")
+                writer.writerow([NAME_COLUMN] + self.columns)
+                for name, row in self._records():
+                    writer.writerow([name] + ["" if row[c] is None else row[c] for c in self.columns])
+        else:
+            raise ValueError(f"Неизвестный формат результата: {fmt}")
+
+    def close(self) -> dict:
+        """Дописывает итоговые файлы; возвращает {формат: путь} созданных файлов."""
+        with self._lock:
+            # документы, оставшиеся в буфере (например, после отмены), дописываются по порядку
+            for i in sorted(self._waiting):
+                self._write(*self._waiting.pop(i))
+            self._journal.close()
+            if self._csv_file is not None:
+                self._csv_file.close()
+
+            created = {}
+            for fmt, path in self.paths.items():
+                if fmt == "csv":
+                    created[fmt] = path
+                    continue
+                # файл собирается рядом и подменяется целиком, чтобы не отдать недописанный
+                tmp = path.with_name(path.stem + ".tmp" + path.suffix)
+                try:
+                    self._export(fmt, tmp)
+                    os.replace(tmp, path)
+                    created[fmt] = path
+                except ImportError as e:
+                    tmp.unlink(missing_ok=True)
+                    self.log_callback(f"Формат {fmt} пропущен: {e}")
+            os.remove(self._journal_path)
+            _unregister(self)
+        return created
+
+    def discard(self):
+        """Закрывает приёмник и удаляет все его файлы (например, если в архиве не нашлось PDF)."""
+        with self._lock:
+            self._journal.close()
+            if self._csv_file is not None:
+                self._csv_file.close()
+            self._journal_path.unlink(missing_ok=True)
+            for path in self.paths.values():
+                path.unlink(missing_ok=True)
+            _unregister(self)
+
+
+# приёмники идущих задач по пути файла результата — для частичной выгрузки
+_active: dict[Path, ResultSink] = {}
+_active_lock = threading.Lock()
+
+
+def _register(sink):
+    with _active_lock:
+        for path in sink.paths.values():
+            _active[path] = sink
+
+
+def _unregister(sink):
+    with _active_lock:
+        for path in sink.paths.values():
+            if _active.get(path) is sink:
+                del _active[path]
+
+
+def active_sink(path) -> ResultSink | None:
+    """Приёмник задачи, которая сейчас пишет файл path."""
+    with _active_lock:
+        return _active.get(Path(path))
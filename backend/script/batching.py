@@ -0,0 +1,86 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from backend import config
+from backend.script.ocr_pool import get_pool
+
+
+class BatchingOCR:
+    """
+    Пакетное распознавание страниц. Вызовы submit() из любых потоков (разные
+    страницы и документы) собираются в пакеты до batch_size изображений,
+    ожидая не дольше max_wait секунд, и прогоняются через модель одним вызовом
+    readtext_batched. Результат возвращается каждому вызывающему через Future.
+    """
+
+    def __init__(self, params: dict, batch_size: int, max_wait: float, pool=None):
+        self.params = params
+        self.batch_size = max(1, batch_size)
+        self.max_wait = max_wait
+        self._pool = pool or get_pool()
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def submit(self, image) -> Future:
+        future = Future()
+        self._queue.put((image, future))
+        return future
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            # отменённые страницы (например, при досрочной остановке) не распознаются
+            batch = [(image, future) for image, future in batch if future.set_running_or_notify_cancel()]
+            # readtext_batched требует изображений одного размера — группируем по форме
+            groups = {}
+            for image, future in batch:
+                groups.setdefault(image.shape, []).append((image, future))
+            for group in groups.values():
+                self._run(group)
+
+    def _run(self, group):
+        try:
+            with self._pool.reader() as reader:
+                if len(group) == 1:
+                    results = [reader.readtext(group[0][0], **self.params)]
+                else:
+                    results = reader.readtext_batched(
+                        [image for image, _ in group],
+                        batch_size=config.OCR_RECOGNIZER_BATCH_SIZE,
+                        **self.params
+                    )
+        except Exception as e:
+            for _, future in group:
+                future.set_exception(e)
+            return
+        for (_, future), result in zip(group, results):
+            future.set_result(result)
+
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+def get_batcher(params: dict) -> BatchingOCR:
+    """Общий для процесса пакетный распознаватель (создаётся при первом обращении)."""
+    global _batcher
+    with _batcher_lock:
+        if _batcher is None:
+            _batcher = BatchingOCR(params, config.OCR_BATCH_SIZE, config.OCR_BATCH_MAX_WAIT)
+        return _batcher
@@ -1,6 +1,13 @@
-import shutil, os, easyocr
-import numpy as  np
-from PIL import Image
+import time
+from collections import deque
+from contextlib import ExitStack
+from backend import config
+from backend.events import event
+from backend.metrics import CACHE, OCR_SECONDS, PAGES
+from backend.script.batching import get_batcher
+from backend.script.ocr_cache import get_cache
+from backend.script.ocr_pool import get_pool
+from backend.script.two_pass import read_two_pass, two_pass_params
 
 custom_characters = (
     '«»№'
@@ -10,49 +17,168 @@ custom_characters = (
     '!@#$%^&*()_+-=[]{};:,./?|`~ '
 )
 
-def images_to_text(image_dir, text_file, log_callback=print):
-    log_callback(f"[images2text] Проверяю папку: {image_dir}")
-    log_callback("Файлы в ней: " + ", ".join(os.listdir(image_dir)))
+# параметры readtext; входят в ключ кэша, чтобы смена настроек не отдавала старые результаты
+OCR_PARAMS = dict(
+    detail=0,
+    allowlist=custom_characters,
+    contrast_ths=0.05,
+    text_threshold=0.4
+)
+
+
+def _cache_key(cache, image):
+    params = {**OCR_PARAMS, "languages": config.OCR_LANGUAGES}
+    # int8 и fp32 распознаватель дают немного разный текст; квантизация включается
+    # не по OCR_GPU, а по устройству (OCR_GPU=1 без CUDA — тоже CPU), поэтому в ключе всегда
+    params["quantize"] = config.OCR_QUANTIZE
+    if config.TWO_PASS_OCR:
+        params["two_pass"] = two_pass_params()
+    return cache.make_key(image, params)
+
+
+def _readtext(reader, image):
+    if config.TWO_PASS_OCR:
+        return read_two_pass(reader, image, OCR_PARAMS)
+    return reader.readtext(image, **OCR_PARAMS)
+
+
+def read_page(reader, image, cache=None):
+    """readtext с проверкой кэша по хэшу изображения страницы. Возвращает (строки, из_кэша)."""
+    if cache is None:
+        return _readtext(reader, image), False
+    key = _cache_key(cache, image)
+    result = cache.get(key)
+    if result is not None:
+        CACHE.inc(result="hit")
+        return result, True
+    CACHE.inc(result="miss")
+    result = _readtext(reader, image)
+    cache.put(key, result)
+    return result, False
+
+
+def _text_layer_lines(text):
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+
+def _recognize_sequential(pages, cache, stack, log_callback):
+    """(страница, строки, из_кэша) — по одной странице за вызов модели."""
+    reader = None
+    for page in pages:
+        if page.text is not None:
+            yield page, _text_layer_lines(page.text), False
+            continue
+        log_callback(f"Расшифровывается страница {page.number}")
+        if reader is None:
+            # Reader берётся из общего пула процесса при первой странице-скане
+            reader = stack.enter_context(get_pool().reader())
+        started = time.perf_counter()
+        result, from_cache = read_page(reader, page.image, cache)
+        OCR_SECONDS.observe(time.perf_counter() - started, source="cache" if from_cache else "ocr")
+        yield page, result, from_cache
+
+
+def _recognize_batched(pages, cache, log_callback):
+    """
+    То же, но страницы отправляются в общий пакетный распознаватель с опережением
+    на OCR_BATCH_SIZE страниц; результаты отдаются в порядке страниц.
+    """
+    batcher = get_batcher(OCR_PARAMS)
+    pending = deque()
+
+    def submit(page):
+        # (готовый результат, ключ кэша, future распознавателя); готовый результат — без future
+        if page.text is not None:
+            return (_text_layer_lines(page.text), False), None, None
+        key = _cache_key(cache, page.image) if cache is not None else None
+        result = cache.get(key) if key is not None else None
+        if key is not None:
+            CACHE.inc(result="hit" if result is not None else "miss")
+        if result is not None:
+            return (result, True), key, None
+        log_callback(f"Страница {page.number} отправлена на распознавание")
+        return None, key, batcher.submit(page.image)
+
+    def take():
+        page, ready, key, future = pending.popleft()
+        if future is None:
+            if page.image is not None:
+                OCR_SECONDS.observe(0.0, source="cache")
+            return (page, *ready)
+        # в пакетном режиме учитывается, сколько документ ждал результат страницы
+        started = time.perf_counter()
+        result = future.result()
+        OCR_SECONDS.observe(time.perf_counter() - started, source="batched")
+        if key is not None:
+            cache.put(key, result)
+        return page, result, False
+
+    try:
+        for page in pages:
+            pending.append((page, *submit(page)))
+            if len(pending) >= batcher.batch_size:
+                yield take()
+        while pending:
+            yield take()
+    finally:
+        # при досрочной остановке ещё не распознанные страницы снимаются с очереди
+        for _, _, _, future in pending:
+            if future is not None:
+                future.cancel()
+
+
+def images_to_text(pages, text_file, log_callback=print, stop_when=None, max_pages=0):
+    """
+    Распознаёт страницы (итерируемое Page из pdf2images) и пишет текст в text_file
+    в формате '--- Страница N ---'. Страницы с текстовым слоем записываются как есть.
+    stop_when(text) — проверка накопленного текста после каждой страницы: если она вернула True,
+    остальные страницы не читаются. max_pages — предел числа страниц (0 — без предела).
+    Возвращает номера прочитанных страниц.
+    """
     log_callback("Перевод изображений в текст...")
-    reader = easyocr.Reader(
-        ['ru', 'en'],
-        model_storage_directory='backend/script/models',
-        download_enabled=False,
-        gpu=True
-    )
-
-    files = sorted(os.listdir(image_dir))
-    all_lines = []
-
-    with open(text_file, 'w', encoding='utf-8') as f:
-        for idx, fname in enumerate(files, 1):
-            log_callback(f"Расшифровывается страница {idx}")
-            path = os.path.join(image_dir, fname)
-
-            if not os.path.isfile(path):
-                print("Нет такого файла")
-                continue
-
-            img = Image.open(path)
-            img = np.array(img)
-
-            result = reader.readtext(
-                img,
-                detail=0,
-                allowlist=custom_characters,
-                contrast_ths=0.05,
-                text_threshold=0.4
-            )
+    cache = get_cache()
+    cached_pages = 0
+    pages_read = []
+    text_parts = []
+
+    with ExitStack() as stack, open(text_file, 'w', encoding='utf-8') as f:
+        # двухпроходный OCR идёт постранично: второй проход зависит от результата первого
+        if config.OCR_BATCH_SIZE > 1 and not config.TWO_PASS_OCR:
+            recognized = _recognize_batched(pages, cache, log_callback)
+        else:
+            recognized = _recognize_sequential(pages, cache, stack, log_callback)
+        stack.callback(recognized.close)
+
+        for page, result, from_cache in recognized:
+            idx = page.number
+            stage = "skipped" if page.skipped else "text_layer" if page.text is not None else "ocr"
+            log_callback(event("page", stage=stage, page=idx))
+            PAGES.inc(source="cache" if from_cache else stage)
+            cached_pages += from_cache
 
             # Записываем в .txt
             log_callback(f"Запись страницы {idx} в .txt")
-            f.write(f"--- Страница {idx} ---\n")
-            for line in result:
-                f.write(line.lower() + "\n")
-            f.write("\n")
+            page_text = f"--- Страница {idx} ---\n" + "".join(line.lower() + "\n" for line in result) + "\n"
+            f.write(page_text)
+            pages_read.append(idx)
 
-            all_lines.extend(result)
+            if max_pages and len(pages_read) >= max_pages:
+                log_callback(f"Достигнут предел в {max_pages} стр., остальные страницы пропущены")
+                break
+            if stop_when is not None:
+                text_parts.append(page_text)
+                if stop_when("".join(text_parts)):
+                    log_callback(f"Все поля найдены на странице {idx}, остальные страницы пропущены")
+                    break
 
-    shutil.rmtree(image_dir)
-    log_callback(f"[✓] Расшифровка изображений сохранена в {text_file}")
+    # при досрочной остановке генератор страниц закрывается сразу, рендер прекращается
+    close = getattr(pages, "close", None)
+    if close is not None:
+        close()
 
+    if cache is not None:
+        stats = cache.stats()
+        log_callback(f"[cache] Страниц из кэша: {cached_pages}; "
+                     f"всего попаданий {stats['hits']}, промахов {stats['misses']}")
+    log_callback(f"[✓] Расшифровка изображений сохранена в {text_file}")
+    return pages_read
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from backend import config
+from backend.metrics import CACHE
+
+
+class OCRCache:
+    """
+    Дисковый кэш результатов readtext. Ключ — sha256 от пикселей страницы
+    и параметров распознавания, значение — JSON с результатом.
+    Общий размер ограничен max_bytes, лишнее удаляется по принципу LRU
+    (время последнего обращения хранится в mtime файла). Папку делят все
+    процессы (воркеры EXECUTION_MODE=process), поэтому размер и порядок
+    вытеснения каждый раз берутся с диска, а не из памяти процесса.
+    """
+
+    # доля max_bytes, которую процесс записывает до следующей проверки размера папки
+    CHECK_FRACTION = 0.05
+    # вытеснение освобождает место с запасом, чтобы не сканировать папку на каждой записи
+    EVICT_TO = 0.9
+
+    def __init__(self, directory, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # первая запись процесса сразу проверяет размер папки
+        self._written = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _entries(self) -> list:
+        """(mtime, размер, путь) всех записей папки, включая записанные другими процессами."""
+        entries = []
+        for path in self.directory.glob("*/*.json"):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    @staticmethod
+    def make_key(image: np.ndarray, params: dict) -> str:
+        h = hashlib.sha256()
+        h.update(f"{image.shape}|{image.dtype}|".encode())
+        h.update(np.ascontiguousarray(image).data)
+        h.update(json.dumps(params, sort_keys=True, ensure_ascii=False).encode())
+        return h.hexdigest()
+
+    def get(self, key: str):
+        path = self._path(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                value = json.load(f)
+            os.utime(path)
+        except (FileNotFoundError, ValueError):
+            # записи нет или её только что вытеснил другой процесс
+            return None
+        return value
+
+    def put(self, key: str, value):
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        data = json.dumps(value, ensure_ascii=False).encode('utf-8')
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+        with self._lock:
+            self._written += len(data)
+            if self._written >= self.max_bytes * self.CHECK_FRACTION:
+                self._written = 0
+                self._evict()
+
+    def _evict(self):
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes * self.EVICT_TO:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def stats(self) -> dict:
+        # обращения — из метрик: в режиме process сюда приходят и счётчики воркеров
+        hits, misses = CACHE.value(result="hit"), CACHE.value(result="miss")
+        lookups = hits + misses
+        entries = self._entries()
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> OCRCache | None:
+    """Кэш процесса или None, если он выключен настройкой OCR_CACHE."""
+    global _cache
+    if not config.OCR_CACHE:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = OCRCache(config.OCR_CACHE_DIR, config.OCR_CACHE_MAX_MB * 1024 * 1024)
+        return _cache
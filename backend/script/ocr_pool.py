@@ -0,0 +1,161 @@
+import os
+import threading
+from contextlib import contextmanager
+
+from backend import config
+
+_threads_lock = threading.Lock()
+_threads_configured = False
+
+
+def cpu_threads() -> int:
+    """Потоки torch на процесс: без OCR_THREADS ядра делятся между процессами-воркерами."""
+    if config.OCR_THREADS:
+        return config.OCR_THREADS
+    processes = config.WORKERS if config.EXECUTION_MODE == "process" else 1
+    return max(1, (os.cpu_count() or 1) // max(1, processes))
+
+
+def configure_threads():
+    """Настраивает потоки torch один раз на процесс, до первого вызова модели."""
+    global _threads_configured
+    import torch
+    with _threads_lock:
+        if _threads_configured:
+            return
+        _threads_configured = True
+        torch.set_num_threads(cpu_threads())
+        try:
+            torch.set_num_interop_threads(config.OCR_INTEROP_THREADS)
+        except RuntimeError:
+            # пул inter-op потоков уже запущен (torch использовался до нас) — остаётся как есть
+            pass
+
+
+def create_reader(quantize: bool | None = None):
+    """
+    Загружает веса детектора и распознавателя easyocr из папки с моделями.
+    На CPU распознаватель квантуется в int8 (OCR_QUANTIZE или явный quantize).
+    """
+    # easyocr тянет за собой torch: импорт только при первой загрузке модели
+    import easyocr
+    configure_threads()
+    return easyocr.Reader(
+        config.OCR_LANGUAGES,
+        model_storage_directory=str(config.MODELS_DIR),
+        download_enabled=False,
+        gpu=config.OCR_GPU,
+        # easyocr применяет torch.quantization.quantize_dynamic(qint8) только на CPU
+        quantize=config.OCR_QUANTIZE if quantize is None else quantize
+    )
+
+
+def dummy_inference(reader):
+    """
+    Один прогон детектора и распознавателя по искусственной строке: первый
+    вызов модели инициализирует ядра torch/CUDA, и без прогона эту задержку
+    заплатил бы первый документ.
+    """
+    import numpy as np
+    image = np.full((48, 320), 255, dtype=np.uint8)
+    for x in range(16, 300, 24):
+        image[14:34, x:x + 14] = 0
+    reader.readtext(image, detail=0)
+
+
+class OCRPool:
+    """
+    Пул загруженных easyocr.Reader, общий для всех задач процесса.
+    Модели загружаются один раз (при warm_up или по первому запросу),
+    затем выдаются через acquire()/release() или контекстный менеджер reader().
+    """
+
+    def __init__(self, size: int = 1, factory=create_reader):
+        self.size = max(1, size)
+        self._factory = factory
+        self._idle = []
+        self._loaded = 0
+        self._busy = 0
+        self._cond = threading.Condition()
+
+    def _load_one(self):
+        # слот зарезервирован под замком, сама загрузка идёт без него
+        try:
+            return self._factory()
+        except Exception:
+            with self._cond:
+                self._loaded -= 1
+                self._cond.notify()
+            raise
+
+    def warm_up(self, log_callback=print):
+        """Загружает все экземпляры пула заранее."""
+        while True:
+            with self._cond:
+                if self._loaded >= self.size:
+                    break
+                self._loaded += 1
+            reader = self._load_one()
+            try:
+                if config.WARMUP_INFERENCE:
+                    dummy_inference(reader)
+            finally:
+                # модель уже загружена: даже если прогрев упал, она остаётся в пуле
+                with self._cond:
+                    self._idle.append(reader)
+                    self._cond.notify()
+        log_callback(f"[ocr] Загружено моделей OCR: {self._loaded}")
+
+    def acquire(self, timeout: float | None = None):
+        """Берёт свободный Reader из пула, при необходимости дожидаясь его освобождения."""
+        with self._cond:
+            while not self._idle:
+                if self._loaded < self.size:
+                    self._loaded += 1
+                    break
+                if not self._cond.wait(timeout):
+                    raise TimeoutError("Нет свободных моделей OCR")
+            else:
+                self._busy += 1
+                return self._idle.pop()
+
+        reader = self._load_one()
+        with self._cond:
+            self._busy += 1
+        return reader
+
+    def release(self, reader):
+        with self._cond:
+            self._busy -= 1
+            self._idle.append(reader)
+            self._cond.notify()
+
+    @contextmanager
+    def reader(self, timeout: float | None = None):
+        reader = self.acquire(timeout)
+        try:
+            yield reader
+        finally:
+            self.release(reader)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "size": self.size,
+                "loaded": self._loaded,
+                "busy": self._busy,
+                "idle": len(self._idle),
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> OCRPool:
+    """Пул процесса; создаётся при первом обращении."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = OCRPool(config.OCR_POOL_SIZE)
+        return _pool
@@ -2,36 +2,93 @@ import cv2
 import numpy as np
 import fitz
 import os
+import time
+from dataclasses import dataclass
 from pathlib import Path
+from backend import config
+from backend.events import event
+from backend.metrics import RENDER_SECONDS
+from backend.script.text_layer import page_text
+from backend.script.render_dpi import choose_dpi
 
-def pdf_to_images(pdf_path, image_dir, log_callback=print):
 
-    pdf_document = fitz.open(pdf_path)
+@dataclass
+class Page:
+    """
+    Страница PDF: номер (с 1) и либо изображение в виде массива NumPy
+    (оттенки серого H×W при RENDER_GRAYSCALE, иначе RGB H×W×3),
+    либо текст из текстового слоя (тогда OCR не нужен).
+    skipped — класс страницы, которую сортировка (triage) не пустила в OCR.
+    """
+    number: int
+    image: np.ndarray | None = None
+    text: str | None = None
+    skipped: str | None = None
+
+
+def open_pdf(pdf):
+    """Открывает PDF по пути или из байтов (например, прочитанных прямо из ZIP)."""
+    if isinstance(pdf, (bytes, bytearray)):
+        return fitz.open(stream=pdf, filetype="pdf")
+    return fitz.open(pdf)
+
 
-    log_callback(f"[pdf2images] Рабочая папка: {Path.cwd()}")
-    log_callback(f"[pdf2images] Пытаюсь создать: {image_dir}")
+def render_pages(pdf_path, dpi=300, log_callback=print):
+    """
+    Генератор страниц PDF (pdf_path — путь или байты файла). Изображение собирается прямо из pix.samples,
+    без кодирования в PNG и записи на диск. Страницы с пригодным текстовым
+    слоем (например, подписанные электронно документы банка) не рендерятся.
+    При ADAPTIVE_DPI разрешение подбирается для каждой страницы, dpi — верхний предел.
+    """
+    pdf_document = open_pdf(pdf_path)
+    try:
+        total = len(pdf_document)
+        for page_number in range(total):
+            log_callback(f"Обрабатывается страница PDF {page_number + 1} из {total}")
+            log_callback(event("page", stage="render", page=page_number + 1, total=total))
+            started = time.perf_counter()
+            page = pdf_document.load_page(page_number)
+            if config.USE_TEXT_LAYER:
+                text = page_text(page)
+                if text is not None:
+                    RENDER_SECONDS.observe(time.perf_counter() - started, source="text_layer")
+                    log_callback(f"Страница {page_number + 1}: найден текстовый слой, OCR не требуется")
+                    yield Page(page_number + 1, text=text)
+                    continue
+            page_dpi = choose_dpi(page, dpi) if config.ADAPTIVE_DPI else dpi
+            if config.RENDER_GRAYSCALE:
+                pix = page.get_pixmap(dpi=page_dpi, colorspace=fitz.csGRAY, alpha=False)
+                image = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width)
+            else:
+                pix = page.get_pixmap(dpi=page_dpi, alpha=False)
+                image = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+            if page_dpi != dpi:
+                log_callback(f"Страница {page_number + 1}: рендер в {page_dpi} dpi ({pix.width}×{pix.height})")
+            RENDER_SECONDS.observe(time.perf_counter() - started, source="raster")
+            yield Page(page_number + 1, image=image)
+    finally:
+        pdf_document.close()
+
+
+def save_pages(pages, image_dir, log_callback=print):
+    """
+    Отладочный режим: сохраняет каждую страницу в PNG и передаёт её дальше без изменений.
+    """
+    log_callback(f"[pdf2images] Сохраняю изображения страниц в: {image_dir}")
     image_dir = Path(image_dir).resolve()
     os.makedirs(image_dir, exist_ok=True)
     if not os.access(image_dir, os.W_OK):
         log_callback(f"‼ Нет прав на запись в {image_dir}")
+        yield from pages
         return
 
-    if not os.path.exists(image_dir):
-        os.makedirs(image_dir)
-
-    for page_number in range(len(pdf_document)):
-        log_callback(f"Обрабатывается страница PDF {page_number + 1} из {len(pdf_document)}")
-        page = pdf_document.load_page(page_number)
-        pix = page.get_pixmap(dpi=300)
-
-        image = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
-
-        if pix.n == 4:
-            image = cv2.cvtColor(image, cv2.COLOR_RGBA2RGB)
-        else:
-            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-
-        image_path = os.path.join(image_dir, f"page_{page_number + 1}.png")
+    for page in pages:
+        if page.image is None:
+            yield page
+            continue
+        image_path = os.path.join(image_dir, f"page_{page.number}.png")
+        # cv2.imwrite ожидает BGR; серое изображение пишется как есть
+        image = page.image if page.image.ndim == 2 else cv2.cvtColor(page.image, cv2.COLOR_RGB2BGR)
 
         # Сохранение с обработкой ошибок
         try:
@@ -44,7 +101,7 @@ def pdf_to_images(pdf_path, image_dir, log_callback=print):
                 # Альтернативное сохранение для диагностики
                 try:
                     import PIL.Image
-                    PIL.Image.fromarray(image).save(image_path)
+                    PIL.Image.fromarray(page.image).save(image_path)
                     print(f"Успешно сохранено через Pillow")
                 except ImportError:
                     print("Pillow не установлен")
@@ -56,6 +113,12 @@ def pdf_to_images(pdf_path, image_dir, log_callback=print):
         except Exception as e:
             print(f"Общая ошибка: {str(e)}")
 
-    log_callback("Изображения страниц созданы")
+        yield page
 
-    pdf_document.close()
\ No newline at end of file
+
+def pdf_to_images(pdf_path, image_dir, log_callback=print):
+    """Рендерит все страницы PDF в PNG-файлы в папке image_dir."""
+    for _ in save_pages(render_pages(pdf_path, log_callback=log_callback), image_dir, log_callback):
+        pass
+
+    log_callback("Изображения страниц созданы")
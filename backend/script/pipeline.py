@@ -0,0 +1,58 @@
+import queue
+import threading
+
+_DONE = object()
+
+
+def _put(q, stop, item) -> bool:
+    # кладём в очередь, пока потребитель не отказался от данных
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def prefetch(iterable, maxsize=2):
+    """
+    Выполняет iterable в отдельном потоке и отдаёт его элементы через очередь
+    не длиннее maxsize: пока OCR разбирает одну страницу, следующая уже рендерится.
+    Исключения источника пробрасываются потребителю.
+    """
+    if maxsize <= 0:
+        yield from iterable
+        return
+
+    q = queue.Queue(maxsize)
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for item in iterable:
+                if not _put(q, stop, (item, None)):
+                    break
+            else:
+                _put(q, stop, (_DONE, None))
+        except BaseException as e:
+            _put(q, stop, (_DONE, e))
+        finally:
+            # генератор закрывается в том же потоке, в котором работал
+            close = getattr(iterable, "close", None)
+            if close is not None:
+                close()
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = q.get()
+            if error is not None:
+                raise error
+            if item is _DONE:
+                return
+            yield item
+    finally:
+        stop.set()
+        thread.join()
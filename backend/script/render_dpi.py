@@ -0,0 +1,79 @@
+import math
+
+import fitz
+import numpy as np
+
+from backend import config
+
+# Выбор разрешения рендера для каждой страницы вместо фиксированных 300 dpi:
+# - у скана берётся собственное разрешение изображения: рендер выше него
+#   только интерполирует пиксели и раздувает изображение;
+# - у страниц без подложки-скана высота строк оценивается по быстрому
+#   превью, и dpi подбирается так, чтобы строка была около OCR_TEXT_HEIGHT_PX;
+# - итог ограничен сверху RENDER_DPI и числом пикселей MAX_PAGE_PIXELS.
+
+PREVIEW_DPI = 72  # на превью 1 пиксель = 1 пункт
+
+
+def native_dpi(page) -> float | None:
+    """
+    Разрешение скана, занимающего большую часть страницы, или None,
+    если такого изображения на странице нет.
+    """
+    page_area = abs(page.rect)
+    if not page_area:
+        return None
+    best = None
+    for info in page.get_images(full=True):
+        xref, width, height = info[0], info[2], info[3]
+        for rect in page.get_image_rects(xref):
+            if rect.is_empty or abs(rect) < 0.5 * page_area:
+                continue
+            # по площади, чтобы не зависеть от поворота изображения на странице
+            dpi = math.sqrt(width * height / (abs(rect) / 72 ** 2))
+            best = dpi if best is None else max(best, dpi)
+    return best
+
+
+def text_line_height(gray: np.ndarray) -> float | None:
+    """
+    Медианная высота строки текста в пикселях по горизонтальной проекции
+    тёмных пикселей; None, если строк не видно.
+    """
+    dark = gray < 128
+    rows = dark.mean(axis=1) > 0.005
+    heights = []
+    run = 0
+    for filled in rows:
+        if filled:
+            run += 1
+        elif run:
+            heights.append(run)
+            run = 0
+    if run:
+        heights.append(run)
+    # одиночные строки пикселей — линии таблиц и шум, а не текст
+    heights = [h for h in heights if h >= 3]
+    if len(heights) < 3:
+        return None
+    return float(np.median(heights))
+
+
+def estimate_text_dpi(page) -> float | None:
+    """dpi, при котором типичная строка страницы будет высотой OCR_TEXT_HEIGHT_PX."""
+    pix = page.get_pixmap(dpi=PREVIEW_DPI, colorspace=fitz.csGRAY, alpha=False)
+    gray = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width)
+    height = text_line_height(gray)
+    if height is None:
+        return None
+    return config.OCR_TEXT_HEIGHT_PX / height * PREVIEW_DPI
+
+
+def choose_dpi(page, max_dpi: int) -> int:
+    """Разрешение рендера страницы с учётом скана, высоты текста и предела пикселей."""
+    dpi = native_dpi(page) or estimate_text_dpi(page) or max_dpi
+    dpi = max(config.RENDER_MIN_DPI, min(dpi, max_dpi))
+    if config.MAX_PAGE_PIXELS:
+        width, height = page.rect.width / 72, page.rect.height / 72
+        dpi = min(dpi, math.sqrt(config.MAX_PAGE_PIXELS / (width * height)))
+    return max(1, int(dpi))
@@ -0,0 +1,38 @@
+import re
+
+from backend import config
+
+_WORD = re.compile(r"[а-яёa-z]+")
+_TOKEN = re.compile(r"\S+")
+
+
+def is_usable_text_layer(text: str, min_chars: int | None = None) -> bool:
+    """
+    Проверяет, что текстовый слой страницы похож на настоящий текст, а не на
+    мусор от скан-подложки или битой кодировки:
+    - букв кириллицы/латиницы не меньше min_chars;
+    - они составляют большую часть непробельных символов;
+    - большинство «слов» состоят из букв и длиннее одного символа.
+    """
+    if min_chars is None:
+        min_chars = config.TEXT_LAYER_MIN_CHARS
+    lower = text.lower()
+    letters = sum(len(w) for w in _WORD.findall(lower))
+    if letters < max(1, min_chars):
+        return False
+
+    non_space = sum(1 for ch in lower if not ch.isspace())
+    if letters / non_space < 0.5:
+        return False
+
+    tokens = _TOKEN.findall(lower)
+    words = sum(1 for t in tokens if len(_WORD.findall(t)) == 1 and len(_WORD.search(t).group(0)) >= 2)
+    return words / len(tokens) >= 0.5
+
+
+def page_text(page) -> str | None:
+    """Текст страницы fitz из текстового слоя или None, если слоя нет или он непригоден."""
+    text = page.get_text("text")
+    if text and is_usable_text_layer(text):
+        return text
+    return None
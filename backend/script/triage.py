@@ -0,0 +1,95 @@
+import cv2
+import numpy as np
+
+from backend import config
+from backend.events import event
+
+# Сортировка страниц перед OCR (PAGE_TRIAGE=1): по уменьшенной копии
+# страницы дёшево считаются доля «чернил», горизонтальная проекция и число
+# компонент связности размером с букву. Страница относится к одному из классов:
+# - blank — пустая (оборот листа, разделитель);
+# - image — без строк текста (конверт, одна печать, фото);
+# - text — всё остальное; только такие страницы идут в OCR.
+# При сомнении страница считается текстовой: лишний OCR дешевле потерянного поля.
+
+BLANK = "blank"
+IMAGE = "image"
+TEXT = "text"
+
+THUMB_HEIGHT = 400  # высота миниатюры; строка 10–12 пт на A4 — около 5 пикселей
+MARGIN = 0.03  # края скана (тени, полосы сканера) не учитываются
+CONTRAST = 40  # пиксель темнее фона на столько уровней считается чернилами
+STRIPS = 8  # вертикальных полос для горизонтальной проекции
+
+_REASONS = {BLANK: "пустая страница", IMAGE: "нет строк текста"}
+
+
+def _thumbnail(image: np.ndarray) -> np.ndarray:
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+    height, width = gray.shape
+    scale = min(1.0, THUMB_HEIGHT / height)
+    if scale < 1.0:
+        gray = cv2.resize(gray, (max(1, round(width * scale)), THUMB_HEIGHT), interpolation=cv2.INTER_AREA)
+    dy, dx = int(gray.shape[0] * MARGIN), int(gray.shape[1] * MARGIN)
+    return gray[dy:gray.shape[0] - dy, dx:gray.shape[1] - dx]
+
+
+def page_stats(image: np.ndarray) -> dict:
+    """Признаки страницы по миниатюре: доля чернил, число строк и «букв»."""
+    thumb = _thumbnail(image)
+    background = float(np.median(thumb))
+    ink = thumb < background - CONTRAST
+    ink_ratio = float(ink.mean())
+
+    # строки текста — чередование заполненных и пустых рядов в горизонтальной
+    # проекции; проекция считается по узким полосам, чтобы поворот скана на
+    # пару градусов не сливал соседние строки
+    lines = 0
+    for strip in np.array_split(ink, STRIPS, axis=1):
+        profile = strip.mean(axis=1)
+        if not profile.any():
+            continue
+        rows = profile > max(0.01, 0.5 * profile[profile > 0].mean())
+        lines = max(lines, int(np.count_nonzero(rows[1:] & ~rows[:-1]) + rows[0]))
+
+    # компоненты размером с букву или слово: не точки шума и не крупные пятна
+    count, _, stats, _ = cv2.connectedComponentsWithStats(ink.view(np.uint8), connectivity=8)
+    heights = stats[1:, cv2.CC_STAT_HEIGHT]
+    widths = stats[1:, cv2.CC_STAT_WIDTH]
+    glyphs = int(np.count_nonzero((heights >= 2) & (heights <= 0.05 * thumb.shape[0])
+                                  & (widths <= 0.3 * thumb.shape[1])))
+    return {
+        "ink": round(ink_ratio, 4),
+        "lines": lines,
+        "glyphs": glyphs,
+        "components": int(count - 1),
+    }
+
+
+def classify(stats: dict) -> str:
+    if stats["ink"] < config.TRIAGE_BLANK_INK:
+        return BLANK
+    if stats["glyphs"] < config.TRIAGE_MIN_GLYPHS or stats["lines"] < config.TRIAGE_MIN_LINES:
+        return IMAGE
+    return TEXT
+
+
+def triage_pages(pages, log_callback=print):
+    """
+    Пропускает через себя страницы из render_pages; у пустых и нетекстовых
+    страниц изображение убирается, и OCR их не читает (в .txt страница пустая).
+    """
+    for page in pages:
+        if page.image is None:
+            yield page
+            continue
+        stats = page_stats(page.image)
+        kind = classify(stats)
+        if kind != TEXT:
+            log_callback(f"Страница {page.number} пропущена: {_REASONS[kind]} (чернила {stats['ink']:.2%}, "
+                         f"строк {stats['lines']}, знаков {stats['glyphs']})")
+            log_callback(event("page", stage="triage", page=page.number, kind=kind, **stats))
+            page.image = None
+            page.text = ""
+            page.skipped = kind
+        yield page
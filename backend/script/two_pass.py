@@ -0,0 +1,94 @@
+import re
+
+import cv2
+
+from backend import config
+from backend.metrics import TWO_PASS_BOXES
+from backend.text_handler import MONTH_MAP
+
+# Двухпроходное распознавание страницы (TWO_PASS_OCR=1):
+# 1) детектор и распознаватель идут по уменьшенной копии страницы
+#    (FIRST_PASS_SCALE) с detail=1 — рамки и уверенность сохраняются;
+# 2) заново, уже по исходному изображению, распознаются только рамки с
+#    уверенностью ниже REOCR_CONFIDENCE и строки, где есть ключевые слова
+#    полей text_handler (ИНН, БИК, сумма, даты...). Второй проход запускает
+#    только распознаватель по готовым рамкам, без детектора.
+
+# ключевые слова, рядом с которыми стоят извлекаемые значения
+_MONTHS = "|".join(variant for variants in MONTH_MAP.values() for variant in variants)
+_RE_KEYWORD = re.compile(
+    r"инн|бик|сумм|договор|гаранти|принципал|действует|вступает|"
+    r"\d{1,2}[.,]\d{1,2}[.,]\d{2,4}|" + _MONTHS
+)
+
+PAD = 4  # поле вокруг рамки при вырезании из исходного изображения, пиксели
+
+
+def two_pass_params() -> dict:
+    """Настройки, от которых зависит результат (для ключа кэша OCR)."""
+    return {
+        "scale": config.FIRST_PASS_SCALE,
+        "confidence": config.REOCR_CONFIDENCE,
+        "keywords": _RE_KEYWORD.pattern,
+    }
+
+
+def _bounds(box, scale, width, height):
+    xs = [point[0] / scale for point in box]
+    ys = [point[1] / scale for point in box]
+    return [
+        max(0, int(min(xs)) - PAD),
+        min(width, int(max(xs)) + PAD),
+        max(0, int(min(ys)) - PAD),
+        min(height, int(max(ys)) + PAD),
+    ]
+
+
+def _select(results, bounds) -> set:
+    """Номера рамок для второго прохода: неуверенные и строки с ключевыми словами."""
+    selected = {i for i, (_, _, confidence) in enumerate(results) if confidence < config.REOCR_CONFIDENCE}
+    for i, (_, text, _) in enumerate(results):
+        if not _RE_KEYWORD.search(text.lower()):
+            continue
+        top, bottom = bounds[i][2], bounds[i][3]
+        # значение обычно стоит отдельной рамкой на той же строке
+        for j, (_, _, y_min, y_max) in enumerate(bounds):
+            if top <= (y_min + y_max) / 2 <= bottom:
+                selected.add(j)
+    return selected
+
+
+def read_two_pass(reader, image, params: dict) -> list:
+    """
+    Строки страницы в том же виде, что readtext(detail=0): быстрый проход по
+    уменьшенному изображению и повторное распознавание выбранных рамок.
+    params — параметры readtext (allowlist, пороги).
+    """
+    scale = config.FIRST_PASS_SCALE
+    small = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    results = reader.readtext(small, **{**params, "detail": 1})
+    TWO_PASS_BOXES.inc(len(results), stage="first")
+    if not results:
+        return []
+
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+    height, width = gray.shape
+    bounds = [_bounds(box, scale, width, height) for box, _, _ in results]
+    selected = [i for i in sorted(_select(results, bounds))
+                if bounds[i][1] - bounds[i][0] > 1 and bounds[i][3] - bounds[i][2] > 1]
+    lines = [text for _, text, _ in results]
+    if not selected:
+        return lines
+
+    TWO_PASS_BOXES.inc(len(selected), stage="second")
+    # recognize режет рамки сам и может вернуть их в другом порядке —
+    # результаты сопоставляются по левому верхнему углу рамки
+    horizontal = [bounds[i] for i in selected]
+    second = reader.recognize(gray, horizontal_list=horizontal, free_list=[], detail=1,
+                              allowlist=params.get("allowlist"), contrast_ths=params.get("contrast_ths", 0.1))
+    by_corner = {(int(box[0][0]), int(box[0][1])): text for box, text, _ in second}
+    for i in selected:
+        text = by_corner.get((bounds[i][0], bounds[i][2]))
+        if text:
+            lines[i] = text
+    return lines
@@ -0,0 +1,80 @@
+import shutil
+import tempfile
+import zipfile
+
+from backend import config
+
+_MB = 1024 * 1024
+_UTF8_FLAG = 0x800
+
+
+def member_name(info: zipfile.ZipInfo) -> str:
+    """
+    Имя файла в архиве. Архивы из Windows хранят имена в cp866, а zipfile
+    читает их как cp437 — перекодируем, если в архиве не выставлен флаг UTF-8.
+    """
+    if info.flag_bits & _UTF8_FLAG:
+        return info.filename
+    try:
+        return info.filename.encode('cp437').decode('cp866')
+    except (UnicodeEncodeError, UnicodeDecodeError):
+        return info.filename
+
+
+def _read_limited(zf: zipfile.ZipFile, info: zipfile.ZipInfo, limit: int) -> bytes | None:
+    # размер в заголовке может не соответствовать данным — читаем не больше limit + 1 байта
+    with zf.open(info) as member:
+        data = member.read(limit + 1)
+    return None if len(data) > limit else data
+
+
+def iter_zip_pdfs(source, log_callback=print, spool_dir=None, _depth=0, _prefix=""):
+    """
+    Генератор (имя, байты) PDF-файлов архива по мере чтения, без распаковки на диск.
+    source — путь к архиву или открытый файловый объект.
+    Не-PDF пропускаются, слишком большие файлы пропускаются с записью в лог,
+    вложенные ZIP читаются рекурсивно (до MAX_ZIP_DEPTH уровней).
+    """
+    max_pdf = config.MAX_PDF_SIZE_MB * _MB
+    max_zip = config.MAX_NESTED_ZIP_SIZE_MB * _MB
+
+    with zipfile.ZipFile(source) as zf:
+        for info in zf.infolist():
+            if info.is_dir():
+                continue
+            name = member_name(info)
+            full_name = _prefix + name
+            lower = name.lower()
+
+            if lower.endswith(".pdf"):
+                if info.file_size > max_pdf:
+                    log_callback(f"Пропущен {full_name}: больше {config.MAX_PDF_SIZE_MB} МБ")
+                    continue
+                data = _read_limited(zf, info, max_pdf)
+                if data is None:
+                    log_callback(f"Пропущен {full_name}: больше {config.MAX_PDF_SIZE_MB} МБ")
+                    continue
+                yield full_name, data
+
+            elif lower.endswith(".zip"):
+                if _depth + 1 > config.MAX_ZIP_DEPTH:
+                    log_callback(f"Пропущен вложенный архив {full_name}: слишком глубокая вложенность")
+                    continue
+                if info.file_size > max_zip:
+                    log_callback(f"Пропущен вложенный архив {full_name}: больше {config.MAX_NESTED_ZIP_SIZE_MB} МБ")
+                    continue
+                # zipfile нужен файл с произвольным доступом: небольшие архивы в памяти, крупные — во временном файле
+                with tempfile.SpooledTemporaryFile(max_size=config.ZIP_SPOOL_MB * _MB, dir=spool_dir) as spool:
+                    with zf.open(info) as member:
+                        shutil.copyfileobj(member, spool)
+                    spool.seek(0)
+                    try:
+                        yield from iter_zip_pdfs(spool, log_callback, spool_dir, _depth + 1, full_name + "/")
+                    except zipfile.BadZipFile:
+                        log_callback(f"Пропущен повреждённый архив {full_name}")
+
+
+def count_zip_pdfs(zip_path) -> int:
+    """Число PDF в архиве верхнего уровня — по оглавлению, без распаковки."""
+    with zipfile.ZipFile(zip_path) as zf:
+        return sum(1 for info in zf.infolist() if not info.is_dir() and info.filename.lower().endswith(".pdf"))
@@ -0,0 +1,342 @@
+import json
+import os
+import sqlite3
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from urllib.parse import unquote
+
+from backend import config
+
+# Общая очередь задач «один документ» для режима EXECUTION_MODE=distributed.
+# Веб-приложение кладёт задачи и забирает результаты, воркеры (backend.worker)
+# на любых машинах берут задачи в аренду (lease). Пока воркер работает, он
+# продлевает аренду; если он умер, аренда истекает и задачу берёт другой
+# воркер. После TASK_MAX_ATTEMPTS попыток задача считается проваленной.
+#
+# Хранилище выбирается адресом TASK_QUEUE_URL:
+#   sqlite:///путь/к/queue.sqlite3 — одна база SQLite;
+#   file:///путь/к/папке — задачи JSON-файлами, аренда через атомарный rename.
+
+
+@dataclass
+class Task:
+    id: str
+    batch: str
+    idx: int
+    payload: dict
+    attempts: int = 0
+
+
+@dataclass
+class Finished:
+    idx: int
+    ok: bool
+    result: dict | None = None
+    error: str | None = None
+
+
+class TaskQueue:
+    """Интерфейс очереди; реализации ниже."""
+
+    def __init__(self, max_attempts: int | None = None):
+        self.max_attempts = max_attempts or config.TASK_MAX_ATTEMPTS
+
+    def put(self, batch: str, idx: int, payload: dict):
+        raise NotImplementedError
+
+    def lease(self, worker: str, seconds: float) -> Task | None:
+        """Берёт свободную задачу (или задачу с истёкшей арендой); None — очередь пуста."""
+        raise NotImplementedError
+
+    def heartbeat(self, task: Task, worker: str, seconds: float) -> bool:
+        """Продлевает аренду; False — задачу уже забрали (аренда истекла) или отменили."""
+        raise NotImplementedError
+
+    def complete(self, task: Task, worker: str, result: dict) -> bool:
+        """Сдаёт результат; False — аренда уже не у этого воркера (истекла или пакет отменён), результат не принят."""
+        raise NotImplementedError
+
+    def fail(self, task: Task, worker: str, error: str):
+        """Ошибка воркера: задача вернётся в очередь, пока не исчерпаны попытки."""
+        raise NotImplementedError
+
+    def take_finished(self, batch: str) -> list:
+        """Забирает завершённые задачи пакета (каждая отдаётся один раз)."""
+        raise NotImplementedError
+
+    def cancel(self, batch: str):
+        """Снимает невыполненные задачи пакета и удаляет его результаты."""
+        raise NotImplementedError
+
+
+class SQLiteTaskQueue(TaskQueue):
+    _SCHEMA = """
+    CREATE TABLE IF NOT EXISTS tasks (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        batch TEXT NOT NULL,
+        idx INTEGER NOT NULL,
+        payload TEXT NOT NULL,
+        status TEXT NOT NULL,  -- pending / leased / done / failed
+        attempts INTEGER NOT NULL DEFAULT 0,
+        worker TEXT,
+        lease_until REAL,
+        result TEXT,
+        error TEXT
+    );
+    CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, id);
+    CREATE INDEX IF NOT EXISTS tasks_batch ON tasks (batch, status);
+    """
+
+    def __init__(self, path, max_attempts: int | None = None):
+        super().__init__(max_attempts)
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(self._SCHEMA)
+
+    def _connect(self):
+        # своё соединение на каждый вызов: очередь делят потоки и процессы
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        return db
+
+    def _transaction(self, fn):
+        db = self._connect()
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(db)
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+            return result
+        finally:
+            db.close()
+
+    def put(self, batch, idx, payload):
+        self._transaction(lambda db: db.execute(
+            "INSERT INTO tasks (batch, idx, payload, status) VALUES (?, ?, ?, 'pending')",
+            (batch, idx, json.dumps(payload, ensure_ascii=False))))
+
+    def lease(self, worker, seconds):
+        def take(db):
+            now = time.time()
+            while True:
+                row = db.execute(
+                    "SELECT * FROM tasks WHERE status = 'pending' OR (status = 'leased' AND lease_until < ?) "
+                    "ORDER BY id LIMIT 1", (now,)).fetchone()
+                if row is None:
+                    return None
+                if row["attempts"] >= self.max_attempts:
+                    db.execute("UPDATE tasks SET status = 'failed', error = ? WHERE id = ?",
+                               (row["error"] or "Исчерпаны попытки (воркер не завершил задачу)", row["id"]))
+                    continue
+                db.execute("UPDATE tasks SET status = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1 "
+                           "WHERE id = ?", (worker, now + seconds, row["id"]))
+                return Task(str(row["id"]), row["batch"], row["idx"], json.loads(row["payload"]), row["attempts"] + 1)
+
+        return self._transaction(take)
+
+    def heartbeat(self, task, worker, seconds):
+        def extend(db):
+            cursor = db.execute("UPDATE tasks SET lease_until = ? WHERE id = ? AND status = 'leased' AND worker = ?",
+                                (time.time() + seconds, int(task.id), worker))
+            return cursor.rowcount == 1
+        return self._transaction(extend)
+
+    def complete(self, task, worker, result):
+        def finish(db):
+            cursor = db.execute("UPDATE tasks SET status = 'done', result = ?, lease_until = NULL "
+                                "WHERE id = ? AND status = 'leased' AND worker = ?",
+                                (json.dumps(result, ensure_ascii=False, default=str), int(task.id), worker))
+            return cursor.rowcount == 1
+        return self._transaction(finish)
+
+    def fail(self, task, worker, error):
+        status = "failed" if task.attempts >= self.max_attempts else "pending"
+        self._transaction(lambda db: db.execute(
+            "UPDATE tasks SET status = ?, error = ?, worker = NULL, lease_until = NULL WHERE id = ? AND worker = ?",
+            (status, error, int(task.id), worker)))
+
+    def take_finished(self, batch):
+        def take(db):
+            rows = db.execute("SELECT idx, status, result, error FROM tasks WHERE batch = ? "
+                              "AND status IN ('done', 'failed') ORDER BY id", (batch,)).fetchall()
+            db.execute("DELETE FROM tasks WHERE batch = ? AND status IN ('done', 'failed')", (batch,))
+            return rows
+
+        return [Finished(r["idx"], r["status"] == "done", json.loads(r["result"]) if r["result"] else None, r["error"])
+                for r in self._transaction(take)]
+
+    def cancel(self, batch):
+        self._transaction(lambda db: db.execute("DELETE FROM tasks WHERE batch = ?", (batch,)))
+
+
+# задача в leased/ без файла аренды дольше этого срока возвращается в очередь
+_ORPHAN_SECONDS = 60
+
+
+class FileTaskQueue(TaskQueue):
+    """
+    Очередь в папке (в том числе сетевой): pending/ — ждут, leased/ — в работе
+    (рядом файл .lease со сроком аренды), done/ — результаты. Задачу забирает
+    тот, чей os.rename из pending/ в leased/ прошёл первым.
+    """
+
+    def __init__(self, directory, max_attempts: int | None = None):
+        super().__init__(max_attempts)
+        self.root = Path(directory)
+        self.pending = self.root / "pending"
+        self.leased = self.root / "leased"
+        self.done = self.root / "done"
+        for d in (self.pending, self.leased, self.done):
+            d.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def _write(path: Path, data: dict):
+        tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False, default=str), encoding="utf-8")
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _read(path: Path) -> dict | None:
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def put(self, batch, idx, payload):
+        name = f"{batch}__{idx:06d}.json"
+        self._write(self.pending / name, {"batch": batch, "idx": idx, "payload": payload, "attempts": 0})
+
+    def _lease_path(self, name: str) -> Path:
+        return self.leased / (name + ".lease")
+
+    def _requeue_expired(self):
+        now = time.time()
+        for lease in self.leased.glob("*.lease"):
+            info = self._read(lease)
+            if info is None or info["until"] >= now:
+                continue
+            name = lease.name[:-len(".lease")]
+            try:
+                os.rename(self.leased / name, self.pending / name)
+            except FileNotFoundError:
+                pass
+            lease.unlink(missing_ok=True)
+        # воркер упал между переносом задачи в leased/ и записью аренды
+        for path in self.leased.glob("*.json"):
+            try:
+                orphan = not self._lease_path(path.name).exists() and now - path.stat().st_mtime > _ORPHAN_SECONDS
+                if orphan:
+                    os.rename(path, self.pending / path.name)
+            except FileNotFoundError:
+                pass
+
+    def lease(self, worker, seconds):
+        self._requeue_expired()
+        for path in sorted(self.pending.glob("*.json")):
+            try:
+                os.rename(path, self.leased / path.name)
+            except FileNotFoundError:
+                continue  # задачу взял другой воркер
+            task = self._read(self.leased / path.name)
+            if task is None:
+                continue
+            task["attempts"] += 1
+            if task["attempts"] > self.max_attempts:
+                self._finish(path.name, task, "failed", error="Исчерпаны попытки (воркер не завершил задачу)")
+                continue
+            self._write(self.leased / path.name, task)
+            self._write(self._lease_path(path.name), {"worker": worker, "until": time.time() + seconds})
+            return Task(path.name, task["batch"], task["idx"], task["payload"], task["attempts"])
+        return None
+
+    def _holds(self, task, worker) -> bool:
+        lease = self._read(self._lease_path(task.id))
+        return lease is not None and lease["worker"] == worker
+
+    def heartbeat(self, task, worker, seconds):
+        if not self._holds(task, worker):
+            return False
+        self._write(self._lease_path(task.id), {"worker": worker, "until": time.time() + seconds})
+        return True
+
+    def _finish(self, name, task, status, result=None, error=None):
+        self._write(self.done / name, {"idx": task["idx"], "status": status, "result": result, "error": error})
+        (self.leased / name).unlink(missing_ok=True)
+        self._lease_path(name).unlink(missing_ok=True)
+
+    def complete(self, task, worker, result):
+        if not self._holds(task, worker):
+            return False
+        # задача забирается из leased/ переносом: если между проверкой аренды и
+        # переносом её вернули в очередь, rename не пройдёт и done/ не появится
+        claimed = self.leased / f"{task.id}.{uuid.uuid4().hex}.done"
+        try:
+            os.rename(self.leased / task.id, claimed)
+        except FileNotFoundError:
+            return False
+        self._write(self.done / task.id, {"idx": task.idx, "status": "done", "result": result, "error": None})
+        self._lease_path(task.id).unlink(missing_ok=True)
+        try:
+            claimed.unlink()
+        except FileNotFoundError:
+            # пакет отменили, пока писался результат (cancel удаляет и перенесённую задачу)
+            (self.done / task.id).unlink(missing_ok=True)
+            return False
+        return True
+
+    def fail(self, task, worker, error):
+        if not self._holds(task, worker):
+            return
+        if task.attempts >= self.max_attempts:
+            self._finish(task.id, {"idx": task.idx}, "failed", error=error)
+            return
+        self._lease_path(task.id).unlink(missing_ok=True)
+        try:
+            os.rename(self.leased / task.id, self.pending / task.id)
+        except FileNotFoundError:
+            pass
+
+    def take_finished(self, batch):
+        finished = []
+        for path in sorted(self.done.glob(f"{batch}__*.json")):
+            data = self._read(path)
+            path.unlink(missing_ok=True)
+            if data is not None:
+                finished.append(Finished(data["idx"], data["status"] == "done", data["result"], data["error"]))
+        return finished
+
+    def cancel(self, batch):
+        for directory in (self.pending, self.leased, self.done):
+            for path in directory.glob(f"{batch}__*"):
+                path.unlink(missing_ok=True)
+
+
+# схема адреса -> класс очереди; сюда можно добавить свою реализацию
+BACKENDS = {
+    "sqlite": SQLiteTaskQueue,
+    "file": FileTaskQueue,
+}
+
+
+def _url_path(rest: str) -> str:
+    # sqlite:///srv/queue.sqlite3 -> /srv/queue.sqlite3,
+    # sqlite:///C:/queue.sqlite3 на Windows -> C:/queue.sqlite3
+    rest = unquote(rest)
+    if len(rest) > 2 and rest[0] == "/" and rest[2] == ":":
+        return rest[1:]
+    return rest
+
+
+def open_queue(url: str | None = None) -> TaskQueue:
+    url = url or config.TASK_QUEUE_URL
+    scheme, sep, rest = url.partition("://")
+    if not sep or scheme not in BACKENDS:
+        raise ValueError(f"Неизвестная очередь задач: {url}")
+    return BACKENDS[scheme](_url_path(rest))
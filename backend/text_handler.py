@@ -1,7 +1,68 @@
 import re
 import os
+import time
+from collections import Counter
+from functools import cached_property
+from backend.keyword_index import KeywordIndex
+from backend.metrics import PARSE_SECONDS
 
-def find_contract_number(text: str) -> str:
+# Все регулярные выражения компилируются один раз при импорте модуля.
+# Функции find_* принимают как строку, так и ParsedText: при разборе одного
+# документа нижний регистр, строки и общие промежуточные совпадения
+# вычисляются один раз и переиспользуются всеми полями.
+
+NOT_FOUND_TEXT = "[не найдено]"
+
+
+class ParsedText:
+    """
+    Текст документа, подготовленный для извлечения полей.
+    Всё, что нужно нескольким find_*, считается лениво и один раз.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.lower = text.lower()
+
+    @cached_property
+    def principal_idx(self) -> int:
+        # позиция слова «принципал» (нужна ИНН и названию принципала)
+        return self.lower.find("принципал")
+
+    @cached_property
+    def head_lines(self) -> list:
+        # первые 20 строк — в них ищется дата подписания гарантии
+        return self.text.splitlines()[:20]
+
+    @cached_property
+    def head_lines_lower(self) -> list:
+        return [line.lower() for line in self.head_lines]
+
+    @cached_property
+    def sum_positions(self) -> list:
+        # позиции «сумма»/«суммой» — общие для суммы и валюты
+        return [m.start() for m in _RE_SUM_WORD.finditer(self.lower)]
+
+    @cached_property
+    def signature_date(self) -> str:
+        return _find_signature_date(self)
+
+
+def _prepared(text) -> ParsedText:
+    return text if isinstance(text, ParsedText) else ParsedText(text)
+
+
+_CONTRACT_PRE = r"(?:договором|к\s+договору|по\s+договору)[\s\S]{0,100}?"
+_RE_CONTRACT_NUMBER = [
+    # 1) префикс ng или n2 + основной номер + «-...» до пробела
+    re.compile(_CONTRACT_PRE + r"(?:ng|n2)\s*([0-9]+[cс]/[0-9]+(?:-[^\s]+)?)"),
+    # 2) без ng/n2, но с C/c и возможным «-...»
+    re.compile(_CONTRACT_PRE + r"([0-9]+[cс]/[0-9]+(?:-[^\s]+)?)"),
+    # 3) просто цифры/слэш/цифры (до пробела)
+    re.compile(_CONTRACT_PRE + r"([0-9]+/[0-9]+(?:-[^\s]+)?)"),
+]
+
+def find_contract_number(text) -> str:
     """
     Ищет номер основного договора, поддерживая варианты:
     - «договором ng123C/456789-Х»
@@ -12,69 +73,49 @@ def find_contract_number(text: str) -> str:
     - «по договору 123C/456789»
     - и в обоих случаях fallback на просто цифры/слэш/цифры
     """
-    lower = text.lower()
-    pre = r"(?:договором|к\s+договору|по\s+договору)[\s\S]{0,100}?"
+    lower = _prepared(text).lower
 
-    # 1) префикс ng или n2 + основной номер + «-...» до пробела
-    m = re.search(
-        pre + r"(?:ng|n2)\s*([0-9]+[cс]/[0-9]+(?:-[^\s]+)?)",
-        lower
-    )
-    if m:
-        return m.group(1).upper()
+    for pattern in _RE_CONTRACT_NUMBER:
+        m = pattern.search(lower)
+        if m:
+            return m.group(1).upper()
 
-    # 2) без ng/n2, но с C/c и возможным «-...»
-    m = re.search(
-        pre + r"([0-9]+[cс]/[0-9]+(?:-[^\s]+)?)",
-        lower
-    )
-    if m:
-        return m.group(1).upper()
-
-    # 3) просто цифры/слэш/цифры (до пробела)
-    m = re.search(
-        pre + r"([0-9]+/[0-9]+(?:-[^\s]+)?)",
-        lower
-    )
-    if m:
-        return m.group(1).upper()
+    return NOT_FOUND_TEXT
 
-    return "[не найдено]"
 
+_RE_CONTRACT_DATE = re.compile(
+    r"договор(?:ом|а)?[\s\S]{0,100}?от\s*(\d{2})\.(\d{2})\.(\d{4})",
+    flags=re.IGNORECASE
+)
+_RE_ANY_FROM_DATE = re.compile(r"от\s*(\d{2})\.(\d{2})\.(\d{4})", flags=re.IGNORECASE)
 
-def find_contract_date(text: str) -> str:
+def find_contract_date(text) -> str:
+    text = _prepared(text).text
 
-    match = re.search(
-        r"договор(?:ом|а)?[\s\S]{0,100}?от\s*(\d{2})\.(\d{2})\.(\d{4})",
-        text,
-        flags=re.IGNORECASE
-    )
+    match = _RE_CONTRACT_DATE.search(text)
     if not match:
-        match = re.search(
-            r"от\s*(\d{2})\.(\d{2})\.(\d{4})",
-            text,
-            flags=re.IGNORECASE
-        )
+        match = _RE_ANY_FROM_DATE.search(text)
     if not match:
-        return "[не найдено]"
+        return NOT_FOUND_TEXT
     day, month, year_full = match.group(1), match.group(2), match.group(3)
     yy = year_full[-2:]
     return f"{day}/{month}/{yy}"
 
 
-def find_principal_tin(text: str) -> str:
+# Регекс ловит «ИНН» или «ИНН/КПП» и сразу захватывает 10 цифр
+_RE_TIN = re.compile(r"\bинн(?:/кпп)?[\s/:]*([0-9]{10})", flags=re.IGNORECASE)
+
+def find_principal_tin(text) -> str:
     """
     Ищет ИНН принципала:
     1) Находит все вхождения 'ИНН' или 'ИНН/КПП' с 10 цифрами.
     2) Выбирает то, которое стоит непосредственно перед словом 'принципал' (его конец < позиции 'принципал').
     3) Если таких нет, возвращает второе вхождение в тексте.
     """
-    lower = text.lower()
-    idx_princ = lower.find("принципал")
+    doc = _prepared(text)
+    idx_princ = doc.principal_idx
 
-    # Регекс ловит «ИНН» или «ИНН/КПП» и сразу захватывает 10 цифр
-    pattern = re.compile(r"\bинн(?:/кпп)?[\s/:]*([0-9]{10})", flags=re.IGNORECASE)
-    matches = list(pattern.finditer(text))
+    matches = list(_RE_TIN.finditer(doc.text))
 
     # 1) Если нашли «принципал», попробуем взять последнее INN до него
     if idx_princ != -1:
@@ -90,15 +131,17 @@ def find_principal_tin(text: str) -> str:
     return ""
 
 
-def find_guarantor_bik(text: str) -> str:
+_RE_BIK = re.compile(r"\bбик[:\s]*([0-9]{9})", flags=re.IGNORECASE)
+
+def find_guarantor_bik(text) -> str:
     """
     Ищет первое упоминание БИК в тексте и возвращает его (9 цифр).
     Поддерживает формы "БИК 044525593" и "БИК:044525593", без учёта регистра.
     """
-    pattern = re.compile(r"\bбик[:\s]*([0-9]{9})", flags=re.IGNORECASE)
-    for m in pattern.finditer(text):
+    m = _RE_BIK.search(_prepared(text).text)
+    if m:
         return m.group(1)
-    return "[не найдено]"
+    return NOT_FOUND_TEXT
 
 
 GUARANTEE_TYPES = [
@@ -108,39 +151,40 @@ GUARANTEE_TYPES = [
     "Независимая гарантия",
 ]
 
-def find_guarantee_type(text: str) -> str:
+_RE_WORD = re.compile(r"[\wа-яё]+")
+_RE_CONTRACT_EXECUTION = re.compile(r"банковская\s+гарантия[\s\S]{0,100}исполнени[ея]\s+контракт")
+_RE_GUARANTEE_HEADER = re.compile(r"банковская\s+гарантия[\s:\-,]*([\s\S]+)", flags=re.IGNORECASE)
+
+def find_guarantee_type(text) -> str:
     """Ищет один из четырёх типов банковской гарантии по заголовку."""
-    lower = text.lower()
+    doc = _prepared(text)
 
     # Спецслучай «исполнения контракта»
-    if re.search(r"банковская\s+гарантия[\s\S]{0,100}исполнени[ея]\s+контракт", lower):
+    if _RE_CONTRACT_EXECUTION.search(doc.lower):
         return "Исполнение гарантийных обязательств"
 
     # Берём всё после «банковская гарантия» (несколько строк)
-    m = re.search(r"банковская\s+гарантия[\s:\-,]*([\s\S]+)", text, flags=re.IGNORECASE)
+    m = _RE_GUARANTEE_HEADER.search(doc.text)
     if not m:
-        return "[не найдено]"
+        return NOT_FOUND_TEXT
     candidate = m.group(1).lower()
 
-    # Сплитим на слова
-    words = re.findall(r"[\wа-яё]+", candidate)
+    # Сплитим на слова; слово засчитывается виду гарантии, если совпадает с одним из его слов
+    # или одно из них начинается с другого. Каждое различное слово проверяется по индексу один раз.
+    scores = Counter()
+    for w, count in Counter(_RE_WORD.findall(candidate)).items():
+        for gtype in KEYWORDS.prefix_matches(w, "guarantee"):
+            scores[gtype] += count
 
     best_type = ""
     best_score = 0
 
     for gtype in GUARANTEE_TYPES:
-        gwords = re.findall(r"[\wа-яё]+", gtype.lower())
-        score = 0
-        for w in words:
-            for gw in gwords:
-                if w == gw or w.startswith(gw) or gw.startswith(w):
-                    score += 1
-                    break
-        if score > best_score:
-            best_score = score
+        if scores[gtype] > best_score:
+            best_score = scores[gtype]
             best_type = gtype
 
-    return best_type if best_score > 0 else "[не найдено]"
+    return best_type if best_score > 0 else NOT_FOUND_TEXT
 
 ENTITY_TYPES = {
     "АО": [
@@ -166,54 +210,65 @@ ENTITY_TYPES = {
     ],
 }
 
-def find_principal_name(text: str) -> str:
-    lower = text.lower()
-    idx = lower.find("принципал")
+def _is_word_char(ch: str) -> bool:
+    # то же, что \w в регулярных выражениях
+    return ch.isalnum() or ch == "_"
+
+_RE_NPP = re.compile(
+    r"(научно)[-–]?\s*(производственное)\s*(предприятие)\s+([кК]?[^\s(]+)",
+    flags=re.IGNORECASE
+)
+_RE_TRAILING_NON_WORD = re.compile(r"[^\w]+$")
+_RE_ORG_NAME = re.compile(r"([^;,\(\.]+)")
+
+def find_principal_name(text) -> str:
+    doc = _prepared(text)
+    text = doc.text
+    idx = doc.principal_idx
     if idx == -1:
-        return "[не найдено]"
+        return NOT_FOUND_TEXT
 
-    left = text[:idx]
-    left_lower = lower[:idx]
+    lower = doc.lower
 
     best_end = -1
+    best_order = None
     best_abbrev = None
 
-    # 1) ищем самый правый вариант типа юрлица
-    for abbrev, variants in ENTITY_TYPES.items():
-        for variant in variants:
-            parts = variant.split()
-            pattern = r"\b" + r"\s+".join(map(re.escape, parts)) + r"\b"
-            for m in re.finditer(pattern, left_lower, flags=re.IGNORECASE):
-                if m.end() > best_end:
-                    best_end = m.end()
-                    best_abbrev = abbrev
+    # 1) ищем самый правый вариант типа юрлица (целыми словами, пробелы между словами — любые);
+    #    при одинаковом конце побеждает вариант, стоящий раньше в ENTITY_TYPES
+    for start, end, _, (order, abbrev) in KEYWORDS.finditer(lower, 0, idx, table="entity"):
+        if start > 0 and _is_word_char(lower[start - 1]):
+            continue
+        if end < idx and _is_word_char(lower[end]):
+            continue
+        if end > best_end or (end == best_end and order < best_order):
+            best_end = end
+            best_order = order
+            best_abbrev = abbrev
 
     if not best_abbrev:
-        return "[не найдено]"
+        return NOT_FOUND_TEXT
 
     # 2) вырезаем фрагмент между вариантом и 'принципал'
     fragment = text[best_end:idx].lstrip()
 
     # === Специальный случай для «научно‑производственное предприятие» ===
-    special = re.search(
-        r"(научно)[-–]?\s*(производственное)\s*(предприятие)\s+([кК]?[^\s(]+)",
-        fragment, flags=re.IGNORECASE
-    )
+    special = _RE_NPP.search(fragment)
     if special:
         phrase_part = f"{special.group(1)}-{special.group(2)} {special.group(3)}".upper()
         next_word = special.group(4)
         if next_word.lower().startswith("к"):
             next_word = next_word[1:]
-        next_word = re.sub(r"[^\w]+$", "", next_word).upper()
+        next_word = _RE_TRAILING_NON_WORD.sub("", next_word).upper()
         return f'{best_abbrev} "{phrase_part} "{next_word}"'
 
     # === Общая ветка: сначала заменяем переводы строк на пробелы ===
     clean = fragment.replace("\n", " ").strip()
 
     # Захватываем всё до первого разделителя ; , ( .
-    name_match = re.match(r"([^;,\(\.]+)", clean)
+    name_match = _RE_ORG_NAME.match(clean)
     if not name_match:
-        return "[не найдено]"
+        return NOT_FOUND_TEXT
 
     org_name = name_match.group(1).strip()
     # Обрезаем первый/последний символ (к…х)
@@ -222,7 +277,14 @@ def find_principal_name(text: str) -> str:
     return f'{best_abbrev} "{core}"'.upper()
 
 
-def find_guarantee_number(text: str) -> str:
+_RE_GUARANTEE_NUMBER_HEADER = re.compile(r"банковская гарантия[\s\S]{0,200}")
+_RE_NUMBER_PREFIX = re.compile(r"\bn([g2])")
+_RE_NUMBER_PREFIX_ALT = re.compile(r"\bл:")
+_RE_NUMBER_BODY = re.compile(r"([a-zа-я0-9/\-]+)", flags=re.IGNORECASE)
+_RE_OCR_ONE = re.compile(r"[il]", flags=re.IGNORECASE)
+_RE_OCR_ZERO = re.compile(r"[oо]", flags=re.IGNORECASE)
+
+def find_guarantee_number(text) -> str:
     """
     Ищет номер гарантии в нижнем регистре.
     Захватывает до 200 символов после 'банковская гарантия',
@@ -230,17 +292,17 @@ def find_guarantee_number(text: str) -> str:
     Исправляет OCR-ошибки: 'э'->'9', 'i'/'l'->'1', 'o'/'о'->'0'.
     """
     # 1) Берём фрагмент до 200 символов после 'банковская гарантия'
-    header_match = re.search(r"банковская гарантия[\s\S]{0,200}", text)
+    header_match = _RE_GUARANTEE_NUMBER_HEADER.search(_prepared(text).text)
     if not header_match:
-        return "[не найдено]"
+        return NOT_FOUND_TEXT
     header = header_match.group(0)
 
     # 2) Ищем 'n' + ('g' или '2')
-    m = re.search(r"\bn([g2])", header)
+    m = _RE_NUMBER_PREFIX.search(header)
     if not m:
-        m = re.search(r"\bл:", header)
+        m = _RE_NUMBER_PREFIX_ALT.search(header)
         if not m:
-            return "[не найдено]"
+            return NOT_FOUND_TEXT
     # 3) Начинаем чтение сразу после найденного префикса
     pos = m.end()
 
@@ -249,23 +311,25 @@ def find_guarantee_number(text: str) -> str:
         pos += 1
 
     # 5) Захватываем подряд идущие буквы (лат и кирилл), цифры, slash и dash
-    num_match = re.match(r"([a-zа-я0-9/\-]+)", header[pos:], flags=re.IGNORECASE)
+    num_match = _RE_NUMBER_BODY.match(header, pos)
     if not num_match:
-        return "[не найдено]"
+        return NOT_FOUND_TEXT
     num = num_match.group(1)
 
     # 6) OCR‑исправления
     num = num.replace("э", "9")
-    num = re.sub(r"[il]", "1", num, flags=re.IGNORECASE)
+    num = _RE_OCR_ONE.sub("1", num)
     # Заменяем все латинские 'o' и кириллические 'о' на '0'
-    num = re.sub(r"[oо]", "0", num, flags=re.IGNORECASE)
+    num = _RE_OCR_ZERO.sub("0", num)
 
     return num.upper()
 
 
-def find_has_changes(text: str) -> str:
+_RE_CHANGES = re.compile(r"изменени|пролонгац", flags=re.IGNORECASE)
+
+def find_has_changes(text) -> str:
     """Проверяет наличие слов об изменениях"""
-    return "[найдено]" if re.search(r"изменени|пролонгац", text, re.IGNORECASE) else ""
+    return "[найдено]" if _RE_CHANGES.search(_prepared(text).text) else ""
 
 
 MONTH_MAP = {
@@ -283,6 +347,8 @@ MONTH_MAP = {
     "12": ["декабрь", "декабря"],
 }
 
+_RE_YEAR = re.compile(r"(\d{4})")
+
 
 # Функция для извлечения дня из заданного куска текста
 def extract_day(chunk: str):
@@ -301,16 +367,18 @@ def extract_day(chunk: str):
         day = '0' + day
     return day
 
-def find_signature_date(text: str) -> str:
-    """
-    Ищет дату подписания гарантии в первых 20 строках с учётом переноса дня на отдельную строку.
-    """
-    lines = text.splitlines()[:20]
-    for i, line in enumerate(lines):
-        lower = line.lower()
+def _find_signature_date(doc: ParsedText) -> str:
+    lines = doc.head_lines
+    for i, lower in enumerate(doc.head_lines_lower):
+        # первое вхождение каждого названия месяца в строке — за один проход
+        first = {}
+        for start, _, variant, _ in KEYWORDS.finditer(lower, table="month"):
+            first.setdefault(variant, start)
+        if not first:
+            continue
         for month_num, variants in MONTH_MAP.items():
             for variant in variants:
-                idx = lower.find(variant)
+                idx = first.get(variant, -1)
                 if idx == -1:
                     continue
 
@@ -331,16 +399,24 @@ def find_signature_date(text: str) -> str:
                     continue
 
                 # год — как было
-                right = lower[idx + len(variant):]
-                year_match = re.search(r"(\d{4})", right)
+                year_match = _RE_YEAR.search(lower, idx + len(variant))
                 if not year_match:
                     continue
                 yy = year_match.group(1)[-2:]
                 return f"{day}/{month_num}/{yy}"
-    return "[не найдено]"
+    return NOT_FOUND_TEXT
+
+def find_signature_date(text) -> str:
+    """
+    Ищет дату подписания гарантии в первых 20 строках с учётом переноса дня на отдельную строку.
+    """
+    return _prepared(text).signature_date
+
 
+_RE_START_DATE = re.compile(r"вступает в силу\s*(?:со\s*дня\s*)?(\d{2}\.\d{2}\.\d{4})", flags=re.IGNORECASE)
+_RE_START_FROM_DAY = re.compile(r"вступает в силу\s*со\s*дня", flags=re.IGNORECASE)
 
-def find_start_date(text: str) -> str:
+def find_start_date(text) -> str:
     """
     Ищет дату начала действия гарантии:
     1) пытается найти точный шаблон 'вступает в силу [со дня] DD.MM.YYYY'
@@ -350,68 +426,77 @@ def find_start_date(text: str) -> str:
          - иначе вернуть '[со дня подписания]'.
     3) если нет ни того, ни другого, вернуть дату подписания гарантии.
     """
+    doc = _prepared(text)
+
     # 1) смотрим на явный DD.MM.YYYY после 'вступает в силу'
-    full_match = re.search(
-        r"вступает в силу\s*(?:со\s*дня\s*)?(\d{2}\.\d{2}\.\d{4})",
-        text,
-        flags=re.IGNORECASE
-    )
+    full_match = _RE_START_DATE.search(doc.text)
     if full_match:
         # если нашли дату в тексте, возвращаем её
         return full_match.group(1)
 
     # 2) проверяем, есть ли фраза 'вступает в силу со дня'
-    so_day = re.search(r"вступает в силу\s*со\s*дня", text, flags=re.IGNORECASE)
+    so_day = _RE_START_FROM_DAY.search(doc.text)
     if so_day:
-        # если дата подписания гарантии есть — возвращаем её
-        signed = find_signature_date(text)
+        # если дата подписания гарантии есть — возвращаем её (уже посчитана для своего поля)
+        signed = doc.signature_date
         if signed:
             return signed
         # иначе — возвращаем пометку
         return "[со дня выдачи]"
 
     # 3) fallback — возвращаем дату подписания гарантии
-    return find_signature_date(text)
+    return doc.signature_date
+
 
+_RE_END_DATE = re.compile(r"действует по(?:о)?\s*(\d{2})\.(\d{2})\.(\d{4})", flags=re.IGNORECASE)
+_RE_END_DATE_ANY = re.compile(r"\bпо\s*(\d{2})\.(\d{2})\.(\d{4})", flags=re.IGNORECASE)
+_RE_END_SEGMENT = re.compile(r"действует по(?:о)?([\s\S]{0,100})", flags=re.IGNORECASE)
+_RE_DAY_CHARS = re.compile(r"[^0-9OobwW]")
+_RE_DIGIT = re.compile(r"\d")
 
-def find_end_date(text: str) -> str:
+def find_end_date(text) -> str:
     """
     Ищет дату окончания действия гарантии и возвращает в формате DD/MM/YY.
     Дополнительно обрабатывает случай вида:
       «действует по (2w декабря 2028 г. включительно»
     где 'w' нужно трактовать как '2'.
     """
+    text = _prepared(text).text
+
     # 1) Исходный поиск «действует по DD.MM.YYYY»
-    match = re.search(r"действует по(?:о)?\s*(\d{2})\.(\d{2})\.(\d{4})", text, flags=re.IGNORECASE)
+    match = _RE_END_DATE.search(text)
     if match:
         day, month, year_full = match.group(1), match.group(2), match.group(3)
         return f"{day}/{month}/{year_full[-2:]}"
 
     # 2) Общий поиск «по DD.MM.YYYY»
-    match = re.search(r"\bпо\s*(\d{2})\.(\d{2})\.(\d{4})", text, flags=re.IGNORECASE)
+    match = _RE_END_DATE_ANY.search(text)
     if match:
         day, month, year_full = match.group(1), match.group(2), match.group(3)
         return f"{day}/{month}/{year_full[-2:]}"
 
     # 3) Специальный вариант: «действует по» + текст + название месяца
-    m = re.search(r"действует по(?:о)?([\s\S]{0,100})", text, flags=re.IGNORECASE)
+    m = _RE_END_SEGMENT.search(text)
     if m:
         segment = m.group(1)
         lower = segment.lower()
+        first = {}
+        for start, _, variant, _ in KEYWORDS.finditer(lower, table="month"):
+            first.setdefault(variant, start)
         for month_num, variants in MONTH_MAP.items():
             for variant in variants:
-                idx = lower.find(variant)
+                idx = first.get(variant, -1)
                 if idx == -1:
                     continue
                 # 3.1) День — всё, что до названия месяца
                 day_raw = segment[:idx]
                 # Оставляем цифры и возможные OCR-символы O, o, б, w
-                day_raw = re.sub(r"[^0-9OobwW]", "", day_raw)
+                day_raw = _RE_DAY_CHARS.sub("", day_raw)
                 # Исправляем OCR:
                 day_raw = day_raw.replace("w", "2").replace("W", "2")
                 day_raw = day_raw.replace("O", "0").replace("o", "0").replace("б", "6")
                 # Берём последние две цифры
-                digits = re.findall(r"\d", day_raw)
+                digits = _RE_DIGIT.findall(day_raw)
                 if len(digits) >= 2:
                     day = digits[-2] + digits[-1]
                 elif len(digits) == 1:
@@ -419,31 +504,50 @@ def find_end_date(text: str) -> str:
                 else:
                     continue
                 # 3.2) Год — первое 4-значное число после месяца
-                after = lower[idx + len(variant):]
-                year_m = re.search(r"(\d{4})", after)
+                year_m = _RE_YEAR.search(lower, idx + len(variant))
                 if not year_m:
                     continue
                 yy = year_m.group(1)[-2:]
                 return f"{day}/{month_num}/{yy}"
 
     # Ничего не найдено
-    return "[не найдено]"
+    return NOT_FOUND_TEXT
+
+
+# «сумма»/«суммой» ищутся один раз, дальше суммы и валюты проверяют шаблоны с этих позиций
+_RE_SUM_WORD = re.compile(r"сумма|суммой")
+_RE_AMOUNT = re.compile(r"(?:сумма|суммой)[\s:\-]*([\d\s\.,зЗ]+)", flags=re.IGNORECASE)
+_RE_CURRENCY_SUM = re.compile(r"(?:сумма|суммой)[\s:\-]*([\d\s\.,]+)", flags=re.IGNORECASE)
+_RE_SPACES = re.compile(r"\s+")
 
-def find_amount(text: str) -> str:
+
+def _match_at_sum(doc: ParsedText, pattern, source: str):
+    """Первое совпадение pattern, начинающееся с одного из слов «сумма»/«суммой»."""
+    if len(source) != len(doc.lower):
+        # позиции в нижнем регистре не совпадают с исходным текстом — обычный поиск
+        return pattern.search(source)
+    for pos in doc.sum_positions:
+        m = pattern.match(source, pos)
+        if m:
+            return m
+    return None
+
+def find_amount(text) -> str:
     """
     Ищет сумму гарантии:
     - ловит после 'сумма' или 'суммой' цифры, пробелы, точки, запятые и буквы 'з'/'З';
     - заменяет 'з'/'З' на '3';
     - удаляет все пробелы.
     """
-    match = re.search(r"(?:сумма|суммой)[\s:\-]*([\d\s\.,зЗ]+)", text, flags=re.IGNORECASE)
+    doc = _prepared(text)
+    match = _match_at_sum(doc, _RE_AMOUNT, doc.text)
     if not match:
-        return "[не найдено]"
+        return NOT_FOUND_TEXT
     val = match.group(1)
     # Исправляем OCR: кириллическую 'з' и 'З' → цифра '3'
     val = val.replace('з', '3').replace('З', '3')
     # Убираем все пробельные символы
-    val = re.sub(r"\s+", "", val)
+    val = _RE_SPACES.sub("", val)
     return val
 
 CURRENCY_MAP = {
@@ -463,60 +567,107 @@ CURRENCY_MAP = {
     ],
 }
 
-def find_currency(text: str) -> str:
+def find_currency(text) -> str:
     """
     Ищет валюту в пределах 100 символов после найденной суммы.
     Использует ту же логику поиска суммы, что и find_amount.
     """
-    lower = text.lower()
+    doc = _prepared(text)
+    lower = doc.lower
 
-    # 1) Ищем сумму по тому же шаблону, что и в find_amount
-    sum_match = re.search(r"(?:сумма|суммой)[\s:\-]*([\d\s\.,]+)", lower, flags=re.IGNORECASE)
+    # 1) Ищем сумму с тех же позиций «сумма»/«суммой», что и find_amount
+    sum_match = _match_at_sum(doc, _RE_CURRENCY_SUM, lower)
     if not sum_match:
-        return "[не найдено]"
+        return NOT_FOUND_TEXT
 
     # 2) Определяем границы окна в 100 символов после конца найденной суммы
     start = sum_match.end(1)
-    window = lower[start:start + 100]
+    found = {variant for _, _, variant, _ in KEYWORDS.finditer(lower, start, start + 100, table="currency")}
 
     # 3) Ищем валюту в этом окне
     for code, variants in CURRENCY_MAP.items():
         for variant in variants:
-            if variant in window:
+            if variant in found:
                 return code
 
-    return "[не найдено]"
-
-def parse_bank_guarantee(file_path: str):
-
-    with open(file_path, encoding='utf-8') as f:
-        text = f.read()
-
-    funcs = [
-        ('№ Основного договора', find_contract_number),
-        ('Дата подписания основного договора', find_contract_date),
-        ('ИНН', find_principal_tin),
-        ('БИК', find_guarantor_bik),
-        ('Вид гарантии', find_guarantee_type),
-        ('Принципал', find_principal_name),
-        ('№ Гарантии', find_guarantee_number),
-        ('ДОП / ИЗМ', find_has_changes),
-        ('Дата подписания', find_signature_date),
-        ('Дата начала', find_start_date),
-        ('Дата окончания', find_end_date),
-        ('Сумма', find_amount),
-        ('Валюта', find_currency),
-    ]
+    return NOT_FOUND_TEXT
+
+def _build_keyword_index() -> KeywordIndex:
+    """Общий словарный индекс по таблицам MONTH_MAP, CURRENCY_MAP, ENTITY_TYPES и GUARANTEE_TYPES."""
+    index = KeywordIndex()
+    for month_num, variants in MONTH_MAP.items():
+        for variant in variants:
+            index.add(variant, "month", month_num)
+    for code, variants in CURRENCY_MAP.items():
+        for variant in variants:
+            index.add(variant, "currency", code)
+    order = 0
+    for abbrev, variants in ENTITY_TYPES.items():
+        for variant in variants:
+            index.add(" ".join(variant.split()), "entity", (order, abbrev), flexible_spaces=True)
+            order += 1
+    for gtype in GUARANTEE_TYPES:
+        for gw in _RE_WORD.findall(gtype.lower()):
+            index.add(gw, "guarantee", gtype)
+    return index
+
+
+KEYWORDS = _build_keyword_index()
+
+
+FIELDS = [
+    ('№ Основного договора', find_contract_number),
+    ('Дата подписания основного договора', find_contract_date),
+    ('ИНН', find_principal_tin),
+    ('БИК', find_guarantor_bik),
+    ('Вид гарантии', find_guarantee_type),
+    ('Принципал', find_principal_name),
+    ('№ Гарантии', find_guarantee_number),
+    ('ДОП / ИЗМ', find_has_changes),
+    ('Дата подписания', find_signature_date),
+    ('Дата начала', find_start_date),
+    ('Дата окончания', find_end_date),
+    ('Сумма', find_amount),
+    ('Валюта', find_currency),
+]
+
+NOT_FOUND = ("", NOT_FOUND_TEXT)
+
+
+def extract_fields(text, fields=None) -> dict:
+    """
+    Извлекает поля (все или только перечисленные в fields) из текста в памяти.
+    Текст подготавливается один раз и общий для всех полей.
+    """
+    doc = _prepared(text)
     result = {}
-    for name, func in funcs:
+    for name, func in FIELDS:
+        if fields is not None and name not in fields:
+            continue
+        started = time.perf_counter()
         try:
-            val = func(text)
+            val = func(doc)
         except Exception:
             val = ''
+        PARSE_SECONDS.observe(time.perf_counter() - started, field=name)
         result[name] = val
-
     return result
 
+
+def missing_fields(text, fields) -> list:
+    """Возвращает те поля из fields, которые в тексте пока не найдены."""
+    found = extract_fields(text, fields)
+    return [name for name in fields if found.get(name, '') in NOT_FOUND]
+
+
+def parse_bank_guarantee(file_path: str = None, text: str = None):
+    """Разбирает текст гарантии из файла file_path или переданный строкой text."""
+    if text is None:
+        with open(file_path, encoding='utf-8') as f:
+            text = f.read()
+
+    return extract_fields(text)
+
 # os.chdir('../')
 # result = parse_bank_guarantee("texts/20241106 Альфабанк 0T9H4X.txt")
-# print(result)
\ No newline at end of file
+# print(result)
@@ -0,0 +1,197 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+
+
+class UploadError(Exception):
+    """Ошибка загрузки; status — HTTP-код ответа."""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+class HashingWriter:
+    """Пишет файл блоками и одновременно считает sha256 и размер."""
+
+    def __init__(self, path, max_bytes: int, mode: str = "wb", hasher=None, written: int = 0):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.hasher = hasher or hashlib.sha256()
+        self.written = written
+        self._file = open(self.path, mode)
+
+    def write(self, chunk: bytes):
+        if self.written + len(chunk) > self.max_bytes:
+            raise UploadError(f"Файл больше допустимых {self.max_bytes // (1024 * 1024)} МБ", status=413)
+        self._file.write(chunk)
+        self.hasher.update(chunk)
+        self.written += len(chunk)
+
+    def close(self):
+        self._file.close()
+
+    def hexdigest(self) -> str:
+        return self.hasher.hexdigest()
+
+
+def _hash_file(path) -> "hashlib._Hash":
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            hasher.update(block)
+    return hasher
+
+
+class UploadSession:
+    def __init__(self, upload_id: str, filename: str, size: int, directory: Path):
+        self.id = upload_id
+        self.filename = filename
+        self.size = size
+        self.part_path = directory / f"{upload_id}.part"
+        self.meta_path = directory / f"{upload_id}.json"
+        self.hasher = hashlib.sha256()
+        self.received = 0
+        self.lock = threading.Lock()
+
+    def info(self) -> dict:
+        return {"upload_id": self.id, "filename": self.filename, "size": self.size, "received": self.received}
+
+
+class UploadStore:
+    """
+    Загрузка больших архивов частями с докачкой. Части дописываются в
+    <id>.part строго по порядку (offset должен совпадать с уже принятым
+    объёмом), sha256 считается по ходу записи. Описание загрузки лежит
+    рядом в <id>.json, поэтому после перезапуска сервера её можно продолжить.
+    Брошенные загрузки (без новых данных дольше max_age секунд) удаляются
+    при старте и при создании новой; суммарный объявленный размер
+    незавершённых загрузок не больше max_open_bytes.
+    """
+
+    def __init__(self, directory, max_bytes: int, max_age: float, max_open_bytes: int):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.max_open_bytes = max_open_bytes
+        self._sessions: dict[str, UploadSession] = {}
+        self._lock = threading.Lock()
+        with self._lock:
+            self._expire()
+
+    def _expire(self) -> int:
+        """Удаляет брошенные загрузки (вызывается под замком); возвращает объявленный размер оставшихся."""
+        now = time.time()
+        open_bytes = 0
+        for meta_path in self.directory.glob("*.json"):
+            upload_id = meta_path.stem
+            part_path = self.directory / f"{upload_id}.part"
+            try:
+                # последняя активность — последняя принятая часть
+                active = max(path.stat().st_mtime for path in (meta_path, part_path) if path.exists())
+                size = json.loads(meta_path.read_text(encoding="utf-8"))["size"]
+            except (FileNotFoundError, ValueError, KeyError):
+                continue
+            session = self._sessions.get(upload_id)
+            if now - active <= self.max_age or (session is not None and session.lock.locked()):
+                open_bytes += size
+                continue
+            part_path.unlink(missing_ok=True)
+            meta_path.unlink(missing_ok=True)
+            self._sessions.pop(upload_id, None)
+        return open_bytes
+
+    def create(self, filename: str, size: int) -> UploadSession:
+        if size <= 0:
+            raise UploadError("Пустой файл")
+        if size > self.max_bytes:
+            raise UploadError(f"Файл больше допустимых {self.max_bytes // (1024 * 1024)} МБ", status=413)
+        session = UploadSession(uuid.uuid4().hex, os.path.basename(filename), size, self.directory)
+        with self._lock:
+            if self._expire() + size > self.max_open_bytes:
+                raise UploadError("Слишком много незавершённых загрузок, повторите позже", status=429)
+            session.part_path.touch()
+            session.meta_path.write_text(json.dumps({"filename": session.filename, "size": size}),
+                                         encoding="utf-8")
+            self._sessions[session.id] = session
+        return session
+
+    def get(self, upload_id: str) -> UploadSession:
+        with self._lock:
+            session = self._sessions.get(upload_id)
+            if session is not None:
+                return session
+            # загрузка, начатая до перезапуска сервера
+            if not upload_id.isalnum():
+                raise UploadError("Загрузка не найдена", status=404)
+            meta_path = self.directory / f"{upload_id}.json"
+            if not meta_path.exists():
+                raise UploadError("Загрузка не найдена", status=404)
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            session = UploadSession(upload_id, meta["filename"], meta["size"], self.directory)
+            session.hasher = _hash_file(session.part_path)
+            session.received = session.part_path.stat().st_size
+            self._sessions[upload_id] = session
+            return session
+
+    def writer(self, session: UploadSession, offset: int) -> HashingWriter:
+        """
+        Писатель для очередной части, начинающейся с offset. Запись блокирующая —
+        из асинхронного кода вызывается через пул потоков по одному блоку.
+        После записи обязательно вызвать finish_write().
+        """
+        # под общим замком: _expire не удалит загрузку, которая начинает принимать часть
+        with self._lock:
+            if not session.lock.acquire(blocking=False):
+                raise UploadError("Эта загрузка уже принимает данные", status=409)
+            if not session.meta_path.exists():
+                session.lock.release()
+                raise UploadError("Загрузка не найдена", status=404)
+        if offset != session.received:
+            session.lock.release()
+            raise UploadError(f"Ожидался блок с позиции {session.received}", status=409)
+        return HashingWriter(session.part_path, session.size, mode="ab",
+                             hasher=session.hasher, written=session.received)
+
+    def finish_write(self, session: UploadSession, writer: HashingWriter):
+        writer.close()
+        session.received = writer.written
+        session.lock.release()
+
+    def complete(self, session: UploadSession, target: Path) -> str:
+        """Переносит собранный файл в target, возвращает sha256."""
+        if session.received != session.size:
+            raise UploadError(f"Получено {session.received} из {session.size} байт", status=409)
+        os.replace(session.part_path, target)
+        session.meta_path.unlink(missing_ok=True)
+        with self._lock:
+            self._sessions.pop(session.id, None)
+        return session.hasher.hexdigest()
+
+
+class ArchiveIndex:
+    """Хэши уже загруженных архивов: sha256 -> имя сохранённого файла."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        try:
+            self._data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            self._data = {}
+
+    def find(self, digest: str) -> str | None:
+        with self._lock:
+            return self._data.get(digest)
+
+    def add(self, digest: str, filename: str):
+        with self._lock:
+            self._data[digest] = filename
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(self._data, ensure_ascii=False, indent=1), encoding="utf-8")
+            os.replace(tmp, self.path)
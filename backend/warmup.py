@@ -0,0 +1,67 @@
+import threading
+import time
+
+from backend import config
+
+# Прогрев после старта: HTTP-приложение отвечает сразу, а тяжёлые модули
+# (recognizer -> easyocr/torch, cv2, fitz) и модели OCR загружаются в фоне.
+# /readyz отвечает 200 только после прогрева, чтобы балансировщик при
+# поэтапном перезапуске не слал задачи в холодный экземпляр.
+
+STARTING = "starting"
+WARMING = "warming"
+READY = "ready"
+FAILED = "failed"
+STOPPING = "stopping"
+
+
+class Warmup:
+    def __init__(self):
+        self.phase = STARTING
+        self.error = None
+        self.started = time.time()
+        self.seconds = None
+        self._thread = None
+
+    @property
+    def ready(self) -> bool:
+        return self.phase == READY
+
+    def start(self, log_callback=print):
+        self._thread = threading.Thread(target=self._run, args=(log_callback,), name="warmup", daemon=True)
+        self._thread.start()
+
+    def _run(self, log_callback):
+        self.phase = WARMING
+        start = time.perf_counter()
+        try:
+            # импорт конвейера целиком, чтобы первая задача не платила за него
+            import backend.recognizer  # noqa: F401
+            if config.EXECUTION_MODE == "process":
+                from backend import parallel
+                parallel.warm_up(log_callback=log_callback)
+            elif config.EXECUTION_MODE != "distributed":
+                # в распределённом режиме модели загружают воркеры
+                from backend.script.ocr_pool import get_pool
+                get_pool().warm_up(log_callback=log_callback)
+        except Exception as e:
+            self.error = str(e)
+            self.phase = FAILED
+            log_callback(f"[warmup] Ошибка прогрева: {e}")
+            return
+        self.seconds = round(time.perf_counter() - start, 2)
+        if self.phase == WARMING:
+            self.phase = READY
+        log_callback(f"[warmup] Готов к задачам через {self.seconds} c")
+
+    def stop(self):
+        self.phase = STOPPING
+
+    def info(self) -> dict:
+        return {
+            "phase": self.phase,
+            "ready": self.ready,
+            "error": self.error,
+            "uptime_seconds": round(time.time() - self.started, 1),
+            "warmup_seconds": self.seconds,
+        }
@@ -0,0 +1,111 @@
+"""
+Воркер распределённого режима (EXECUTION_MODE=distributed).
+
+    python -m backend.worker
+    python -m backend.worker --queue file:///mnt/shared/queue --id node2-1
+
+Берёт из общей очереди TASK_QUEUE_URL задачи «один документ», обрабатывает
+их тем же process_pdf, что и веб-сервер, и сдаёт строку результата,
+логи и метрики обратно в очередь. Пока документ обрабатывается, аренда
+продлевается; если воркер упал, документ по истечении аренды достанется
+другому воркеру, а при ошибке обработки документ возвращается в очередь,
+пока не исчерпаны TASK_MAX_ATTEMPTS попыток. Воркеров можно запускать
+сколько угодно на любых машинах, которые видят очередь и папку TASK_SHARED_DIR. Один процесс обрабатывает
+один документ за раз; для загрузки нескольких ядер запускают несколько процессов.
+"""
+import argparse
+import os
+import signal
+import socket
+import threading
+import time
+
+from backend import config
+from backend.distributed import shared_path
+from backend.metrics import DOCUMENTS, REGISTRY, span
+from backend.recognizer import process_pdf
+from backend.script.ocr_pool import get_pool
+from backend.task_queue import open_queue
+
+# сколько сообщений лога документа передаётся веб-серверу
+MAX_LOG_MESSAGES = 1000
+
+
+def _keep_lease(queue, task, worker_id, stop, lost):
+    # продление аренды втрое чаще её срока, чтобы пережить задержку одного продления
+    while not stop.wait(config.TASK_LEASE_SECONDS / 3):
+        try:
+            if not queue.heartbeat(task, worker_id, config.TASK_LEASE_SECONDS):
+                lost.set()
+                return
+        except Exception as e:
+            print(f"[worker] Не удалось продлить аренду задачи {task.id}: {e}")
+
+
+def run_task(queue, task, worker_id):
+    log = []
+
+    def log_callback(msg):
+        if len(log) < MAX_LOG_MESSAGES:
+            log.append(msg)
+
+    stop, lost = threading.Event(), threading.Event()
+    keeper = threading.Thread(target=_keep_lease, args=(queue, task, worker_id, stop, lost), daemon=True)
+    keeper.start()
+    try:
+        payload = task.payload
+        text_file = shared_path(payload["text"])
+        # ошибка уходит в serve -> queue.fail: документ повторит этот или другой воркер;
+        # изображения страниц (image_dir) — отладка веб-сервера, воркер их не сохраняет
+        with span(log_callback, "document", document=payload["name"]):
+            row = process_pdf(shared_path(payload["pdf"]), payload["name"], text_file, log_callback=log_callback)
+    finally:
+        stop.set()
+        keeper.join()
+    if lost.is_set():
+        # аренда истекла или пакет отменён: документ уже у другого воркера или не нужен
+        print(f"[worker] Аренда задачи {task.id} потеряна, результат не сдаётся")
+        return
+    DOCUMENTS.inc(status="ok")
+    if not queue.complete(task, worker_id, {"row": row, "log": log, "metrics": REGISTRY.drain()}):
+        print(f"[worker] Аренда задачи {task.id} потеряна, результат не принят")
+
+
+def serve(queue, worker_id, stop):
+    get_pool().warm_up(log_callback=print)
+    print(f"[worker] {worker_id}: ожидание задач из {config.TASK_QUEUE_URL}")
+    while not stop.is_set():
+        task = queue.lease(worker_id, config.TASK_LEASE_SECONDS)
+        if task is None:
+            stop.wait(config.TASK_POLL_SECONDS)
+            continue
+        print(f"[worker] Документ {task.payload['name']} (попытка {task.attempts})")
+        start = time.perf_counter()
+        try:
+            run_task(queue, task, worker_id)
+        except Exception as e:
+            # документ вернётся в очередь и достанется следующему воркеру
+            print(f"[worker] Ошибка задачи {task.id}: {e}")
+            queue.fail(task, worker_id, str(e))
+            continue
+        print(f"[worker] Готово за {time.perf_counter() - start:.1f} c")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queue", help="адрес очереди (по умолчанию TASK_QUEUE_URL)")
+    parser.add_argument("--id", help="имя воркера (по умолчанию хост-pid)")
+    args = parser.parse_args()
+    if args.queue:
+        config.TASK_QUEUE_URL = args.queue
+
+    worker_id = args.id or f"{socket.gethostname()}-{os.getpid()}"
+    stop = threading.Event()
+    # текущий документ дорабатывается, новые не берутся
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+    serve(open_queue(), worker_id, stop)
+
+
+if __name__ == "__main__":
+    main()
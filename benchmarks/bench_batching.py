@@ -0,0 +1,84 @@
+"""
+Сравнение постраничного OCR с пакетным.
+
+    python -m benchmarks.bench_batching файл1.pdf [файл2.pdf ...] --batch-sizes 2 4 8 --output batching.json
+
+Страницы всех PDF рендерятся заранее, затем распознаются:
+- постранично (reader.readtext, как в images_to_text при OCR_BATCH_SIZE=1);
+- через BatchingOCR с каждым из указанных размеров пакета, со всех документов сразу.
+Кэш OCR не используется.
+"""
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from backend import config
+from backend.script.batching import BatchingOCR
+from backend.script.images2text import OCR_PARAMS
+from backend.script.ocr_pool import get_pool
+from backend.script.pdf2images import render_pages
+
+
+def load_pages(pdf_paths):
+    images = []
+    for path in pdf_paths:
+        for page in render_pages(path, dpi=config.RENDER_DPI, log_callback=lambda msg: None):
+            if page.image is not None:
+                images.append(page.image)
+    return images
+
+
+def bench_sequential(images):
+    start = time.perf_counter()
+    with get_pool().reader() as reader:
+        for image in images:
+            reader.readtext(image, **OCR_PARAMS)
+    return time.perf_counter() - start
+
+
+def bench_batched(images, batch_size, max_wait):
+    batcher = BatchingOCR(OCR_PARAMS, batch_size, max_wait)
+    start = time.perf_counter()
+    # страницы подаются конкурентно, как из нескольких документов одновременно
+    with ThreadPoolExecutor(max_workers=batch_size) as executor:
+        futures = list(executor.map(batcher.submit, images))
+        for future in futures:
+            future.result()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdfs", nargs="+")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[2, 4, 8])
+    parser.add_argument("--max-wait", type=float, default=config.OCR_BATCH_MAX_WAIT)
+    parser.add_argument("--output", help="куда записать результаты в JSON")
+    args = parser.parse_args()
+
+    images = load_pages(args.pdfs)
+    if not images:
+        raise SystemExit("Нет страниц для распознавания")
+    get_pool().warm_up()
+
+    results = []
+    elapsed = bench_sequential(images)
+    results.append({"mode": "per_page", "batch_size": 1, "pages": len(images),
+                    "seconds": round(elapsed, 3), "pages_per_sec": round(len(images) / elapsed, 3)})
+    for batch_size in args.batch_sizes:
+        elapsed = bench_batched(images, batch_size, args.max_wait)
+        results.append({"mode": "batched", "batch_size": batch_size, "pages": len(images),
+                        "seconds": round(elapsed, 3), "pages_per_sec": round(len(images) / elapsed, 3)})
+
+    base = results[0]["seconds"]
+    for row in results:
+        row["speedup"] = round(base / row["seconds"], 2)
+        print(f"{row['mode']:>9} batch={row['batch_size']:<3} {row['pages_per_sec']:8.2f} стр/с  x{row['speedup']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"gpu": config.OCR_GPU, "results": results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
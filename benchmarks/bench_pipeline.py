@@ -0,0 +1,205 @@
+"""
+Пропускная способность конвейера по этапам.
+
+    python -m benchmarks.bench_pipeline --documents 20 --output pipeline.json
+    python -m benchmarks.bench_pipeline архив.zip --output pipeline.json --compare прошлый.json
+
+Без архива генерирует синтетический (benchmarks.synthetic). Документы
+обрабатываются последовательно в этом процессе, время каждого этапа
+суммируется отдельно:
+- zip_ingest — чтение PDF из архива (iter_zip_pdfs);
+- pdf_to_images — рендер страниц (render_pages);
+- images_to_text — OCR и запись текста;
+- parse_bank_guarantee — извлечение полей;
+- excel — запись результата (ResultSink).
+Кэш OCR выключен, если не указан --cache. В JSON попадают страницы/с,
+документы/с, пиковый RSS процесса и настройки, с которыми шёл замер;
+--compare печатает изменение относительно прошлого результата.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+
+from backend import config
+from backend.results import ResultSink, COLUMNS
+from backend.script.images2text import images_to_text
+from backend.script.ocr_pool import cpu_threads, get_pool
+from backend.script.pdf2images import render_pages
+from backend.script.zip_ingest import iter_zip_pdfs
+from backend.text_handler import parse_bank_guarantee
+from benchmarks.synthetic import make_zip
+
+STAGES = ["zip_ingest", "pdf_to_images", "images_to_text", "parse_bank_guarantee", "excel"]
+
+
+def quiet(msg):
+    pass
+
+
+def peak_rss_mb():
+    """Пиковый RSS текущего процесса в МБ (None, если узнать нечем)."""
+    try:
+        import resource
+    except ImportError:
+        # Windows: пиковый рабочий набор через psutil, если он установлен
+        try:
+            import psutil
+        except ImportError:
+            return None
+        info = psutil.Process().memory_info()
+        return round(getattr(info, "peak_wset", info.rss) / 2 ** 20, 1)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдаёт килобайты, macOS — байты
+    return round(peak / (2 ** 20 if sys.platform == "darwin" else 1024), 1)
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class StageTimer:
+    def __init__(self):
+        self.seconds = defaultdict(float)
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] += time.perf_counter() - start
+
+    def timed(self, name, iterable):
+        """Итерирует iterable, засчитывая время получения каждого элемента этапу name."""
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+
+def run(zip_path, workdir):
+    timer = StageTimer()
+    texts_dir = Path(workdir) / "texts"
+    texts_dir.mkdir(parents=True, exist_ok=True)
+    sink = ResultSink(Path(workdir) / "result.xlsx", columns=COLUMNS, formats=["xlsx"], log_callback=quiet)
+    documents = pages = ocr_pages = 0
+
+    for name, data in timer.timed("zip_ingest", iter_zip_pdfs(zip_path, log_callback=quiet, spool_dir=workdir)):
+        # страницы рендерятся заранее, чтобы время рендера и OCR не смешивалось
+        rendered = list(timer.timed("pdf_to_images", render_pages(data, dpi=config.RENDER_DPI, log_callback=quiet)))
+        pages += len(rendered)
+        ocr_pages += sum(page.image is not None for page in rendered)
+
+        text_file = texts_dir / f"{documents}.txt"
+        with timer.stage("images_to_text"):
+            images_to_text(rendered, str(text_file), log_callback=quiet)
+        del rendered
+        with timer.stage("parse_bank_guarantee"):
+            row = parse_bank_guarantee(str(text_file))
+        with timer.stage("excel"):
+            sink.add(documents, os.path.basename(name), row)
+        documents += 1
+
+    with timer.stage("excel"):
+        sink.close()
+    return timer.seconds, documents, pages, ocr_pages
+
+
+def compare(current, previous):
+    print(f"\nСравнение с {previous.get('revision') or 'прошлым замером'}:")
+    for stage in STAGES + ["total"]:
+        now = current["stages"].get(stage) if stage != "total" else current["total_seconds"]
+        before = previous["stages"].get(stage) if stage != "total" else previous["total_seconds"]
+        if now is None or not before:
+            continue
+        print(f"{stage:>22} {before:9.3f} -> {now:9.3f} c  ({100 * (now - before) / before:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("zip", nargs="?", help="архив с PDF; без него генерируется синтетический")
+    parser.add_argument("--documents", type=int, default=20, help="документов в синтетическом архиве")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--font", help="TTF-шрифт для синтетических документов")
+    parser.add_argument("--text-fraction", type=float, default=0.0,
+                        help="доля синтетических документов с текстовым слоем")
+    parser.add_argument("--cache", action="store_true", help="не выключать кэш OCR")
+    parser.add_argument("--output", help="куда записать результаты в JSON")
+    parser.add_argument("--compare", help="JSON прошлого замера для сравнения")
+    args = parser.parse_args()
+
+    if not args.cache:
+        config.OCR_CACHE = False
+
+    with tempfile.TemporaryDirectory() as workdir:
+        zip_path = args.zip
+        if zip_path is None:
+            zip_path = os.path.join(workdir, "synthetic.zip")
+            print("Генерация синтетического архива...")
+            make_zip(zip_path, args.documents, seed=args.seed, font=args.font, text_fraction=args.text_fraction)
+
+        # загрузка моделей не входит в замер
+        get_pool().warm_up(log_callback=quiet)
+        start = time.perf_counter()
+        stages, documents, pages, ocr_pages = run(zip_path, workdir)
+        total = time.perf_counter() - start
+
+    result = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "synthetic": args.zip is None,
+        "config": {
+            "gpu": config.OCR_GPU,
+            "ocr_quantize": config.OCR_QUANTIZE,
+            "ocr_threads": cpu_threads(),
+            "render_dpi": config.RENDER_DPI,
+            "render_grayscale": config.RENDER_GRAYSCALE,
+            "adaptive_dpi": config.ADAPTIVE_DPI,
+            "max_page_pixels": config.MAX_PAGE_PIXELS,
+            "use_text_layer": config.USE_TEXT_LAYER,
+            "ocr_batch_size": config.OCR_BATCH_SIZE,
+            "ocr_cache": config.OCR_CACHE,
+        },
+        "documents": documents,
+        "pages": pages,
+        "ocr_pages": ocr_pages,
+        "stages": {stage: round(stages.get(stage, 0.0), 3) for stage in STAGES},
+        "total_seconds": round(total, 3),
+        "pages_per_sec": round(pages / total, 3) if total else None,
+        "docs_per_sec": round(documents / total, 3) if total else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+    for stage in STAGES:
+        share = 100 * result["stages"][stage] / total if total else 0
+        print(f"{stage:>22} {result['stages'][stage]:9.3f} c  {share:5.1f}%")
+    print(f"Документов {documents}, страниц {pages} (OCR: {ocr_pages}) за {total:.1f} c: "
+          f"{result['pages_per_sec']} стр/с, {result['docs_per_sec']} док/с, пиковый RSS {result['peak_rss_mb']} МБ")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(result, json.load(f))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Влияние подготовки изображения (deskew, crop, binarize) на OCR.
+
+    python -m benchmarks.bench_preprocess --documents 10 --max-rotation 3 --output preprocess.json
+    python -m benchmarks.bench_preprocess архив.zip --variants none deskew,crop deskew,crop,binarize
+
+Страницы рендерятся один раз, затем для каждого набора шагов (variant)
+проходят подготовку и OCR тем же Reader. Для каждого варианта выводится
+время подготовки и OCR на страницу, среднее число рамок текста на странице
+и доля найденных полей parse_bank_guarantee. Без архива генерируется
+синтетический (benchmarks.synthetic); --max-rotation задаёт наклон сканов.
+Кэш OCR не используется.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from backend import config
+from backend.script.images2text import read_page
+from backend.script.ocr_pool import get_pool
+from backend.script.pdf2images import render_pages
+from backend.script.preprocess import STEPS, preprocess_image
+from backend.script.zip_ingest import iter_zip_pdfs
+from backend.text_handler import NOT_FOUND, parse_bank_guarantee
+from benchmarks.synthetic import make_zip
+
+DEFAULT_VARIANTS = ["none", "deskew", "crop", "deskew,crop", "deskew,crop,binarize"]
+
+
+def quiet(msg):
+    pass
+
+
+def load_documents(zip_path, workdir):
+    documents = []
+    for pdf_name, data in iter_zip_pdfs(zip_path, log_callback=quiet, spool_dir=workdir):
+        pages = list(render_pages(data, dpi=config.RENDER_DPI, log_callback=quiet))
+        documents.append((os.path.basename(pdf_name), pages))
+    return documents
+
+
+def run_variant(reader, documents, steps):
+    prep_seconds = ocr_seconds = 0.0
+    pages = boxes = 0
+    found = total = 0
+    per_field = {}
+    for _, doc_pages in documents:
+        parts = []
+        for page in doc_pages:
+            if page.image is None:
+                lines = [line.strip() for line in page.text.splitlines() if line.strip()]
+            else:
+                started = time.perf_counter()
+                image, _ = preprocess_image(page.image, steps)
+                prep_seconds += time.perf_counter() - started
+                started = time.perf_counter()
+                lines, _ = read_page(reader, image)
+                ocr_seconds += time.perf_counter() - started
+                pages += 1
+                boxes += len(lines)
+            parts.append(f"--- Страница {page.number} ---\n" + "".join(line.lower() + "\n" for line in lines) + "\n")
+        fields = parse_bank_guarantee(text="".join(parts))
+        for name, value in fields.items():
+            hit = value not in NOT_FOUND
+            found += hit
+            total += 1
+            per_field[name] = per_field.get(name, 0) + hit
+    return {
+        "ocr_pages": pages,
+        "preprocess_sec_per_page": round(prep_seconds / pages, 3) if pages else None,
+        "ocr_sec_per_page": round(ocr_seconds / pages, 3) if pages else None,
+        "boxes_per_page": round(boxes / pages, 1) if pages else None,
+        "field_hit_rate": round(found / total, 4) if total else None,
+        "field_hits": per_field,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("zip", nargs="?", help="архив с PDF; без него генерируется синтетический")
+    parser.add_argument("--documents", type=int, default=10, help="документов в синтетическом архиве")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-rotation", type=float, default=3.0, help="наклон синтетических сканов, градусы")
+    parser.add_argument("--variants", nargs="+", default=DEFAULT_VARIANTS,
+                        help="наборы шагов через запятую; none — без подготовки")
+    parser.add_argument("--output", help="куда записать результаты в JSON")
+    args = parser.parse_args()
+
+    config.OCR_CACHE = False
+    variants = {}
+    for variant in args.variants:
+        steps = [] if variant == "none" else variant.split(",")
+        unknown = set(steps) - set(STEPS)
+        if unknown:
+            parser.error(f"неизвестные шаги: {', '.join(sorted(unknown))}")
+        variants[variant] = steps
+
+    with tempfile.TemporaryDirectory() as workdir:
+        zip_path = args.zip
+        if zip_path is None:
+            zip_path = os.path.join(workdir, "synthetic.zip")
+            print("Генерация синтетического архива...")
+            make_zip(zip_path, args.documents, seed=args.seed, max_rotation=args.max_rotation)
+        documents = load_documents(zip_path, workdir)
+
+    pool = get_pool()
+    pool.warm_up(log_callback=quiet)
+    results = {}
+    with pool.reader() as reader:
+        for variant, steps in variants.items():
+            results[variant] = run_variant(reader, documents, steps)
+            r = results[variant]
+            print(f"{variant:>22}: подготовка {r['preprocess_sec_per_page']} c/стр, OCR {r['ocr_sec_per_page']} c/стр, "
+                  f"рамок {r['boxes_per_page']}/стр, найдено полей {r['field_hit_rate']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "documents": len(documents),
+                "synthetic": args.zip is None,
+                "max_rotation": args.max_rotation if args.zip is None else None,
+                "render_dpi": config.RENDER_DPI,
+                "variants": results,
+            }, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
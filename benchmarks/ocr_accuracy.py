@@ -0,0 +1,153 @@
+"""
+Точность и скорость int8-распознавателя на CPU относительно fp32.
+
+    python -m benchmarks.ocr_accuracy архив.zip --output accuracy.json
+    python -m benchmarks.ocr_accuracy архив.zip --reference files/texts/<задача> --threads 4
+
+Страницы каждого PDF распознаются моделью с квантованным распознавателем
+(OCR_QUANTIZE=1) и сравниваются с эталоном:
+- с --reference — с сохранёнными .txt прошлой обработки (<имя PDF>_<время>.txt,
+  берётся последний), полученными fp32-моделью;
+- без него — с текстом, который тут же даёт fp32-модель (OCR_QUANTIZE=0).
+Считаются доля ошибок по словам (WER), совпадение извлечённых полей
+parse_bank_guarantee и время OCR на страницу. Без архива генерируется
+синтетический (benchmarks.synthetic). Замер идёт на CPU, кэш OCR не используется.
+"""
+import argparse
+import glob
+import json
+import os
+import tempfile
+import time
+
+from backend import config
+from backend.script.images2text import read_page
+from backend.script.ocr_pool import cpu_threads, create_reader
+from backend.script.pdf2images import render_pages
+from backend.script.zip_ingest import iter_zip_pdfs
+from backend.text_handler import parse_bank_guarantee
+from benchmarks.synthetic import make_zip
+
+
+def quiet(msg):
+    pass
+
+
+def word_errors(reference: list, hypothesis: list) -> int:
+    """Расстояние Левенштейна по словам."""
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hypothesis, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1,
+                               previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1]
+
+
+def ocr_document(reader, pages) -> tuple:
+    """Текст документа в формате images_to_text и суммарное время OCR."""
+    parts = []
+    seconds = 0.0
+    for page in pages:
+        if page.text is not None:
+            lines = [line.strip() for line in page.text.splitlines() if line.strip()]
+        else:
+            started = time.perf_counter()
+            lines, _ = read_page(reader, page.image)
+            seconds += time.perf_counter() - started
+        parts.append(f"--- Страница {page.number} ---\n" + "".join(line.lower() + "\n" for line in lines) + "\n")
+    return "".join(parts), seconds
+
+
+def stored_text(reference_dir, name) -> str | None:
+    candidates = sorted(glob.glob(os.path.join(glob.escape(reference_dir), glob.escape(name) + "_*.txt")))
+    if not candidates:
+        return None
+    with open(candidates[-1], encoding="utf-8") as f:
+        return f.read()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("zip", nargs="?", help="архив с PDF; без него генерируется синтетический")
+    parser.add_argument("--reference", help="папка с .txt прошлой fp32-обработки этих же PDF")
+    parser.add_argument("--documents", type=int, default=10, help="документов в синтетическом архиве")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--threads", type=int, help="потоки torch (по умолчанию OCR_THREADS)")
+    parser.add_argument("--output", help="куда записать результаты в JSON")
+    args = parser.parse_args()
+
+    config.OCR_GPU = False
+    config.OCR_CACHE = False
+    if args.threads:
+        config.OCR_THREADS = args.threads
+
+    int8 = create_reader(quantize=True)
+    fp32 = None if args.reference else create_reader(quantize=False)
+
+    documents = []
+    with tempfile.TemporaryDirectory() as workdir:
+        zip_path = args.zip
+        if zip_path is None:
+            zip_path = os.path.join(workdir, "synthetic.zip")
+            make_zip(zip_path, args.documents, seed=args.seed)
+
+        for pdf_name, data in iter_zip_pdfs(zip_path, log_callback=quiet, spool_dir=workdir):
+            name = os.path.splitext(os.path.basename(pdf_name))[0]
+            pages = list(render_pages(data, dpi=config.RENDER_DPI, log_callback=quiet))
+            ocr_pages = sum(page.image is not None for page in pages)
+            if args.reference:
+                reference, fp32_seconds = stored_text(args.reference, name), None
+                if reference is None:
+                    print(f"{name}: нет сохранённого текста, пропущен")
+                    continue
+            else:
+                reference, fp32_seconds = ocr_document(fp32, pages)
+            text, int8_seconds = ocr_document(int8, pages)
+
+            ref_words, words = reference.split(), text.split()
+            ref_fields = parse_bank_guarantee(text=reference)
+            fields = parse_bank_guarantee(text=text)
+            changed = sorted(field for field in ref_fields if ref_fields[field] != fields.get(field))
+            documents.append({
+                "name": name,
+                "ocr_pages": ocr_pages,
+                "words": len(ref_words),
+                "word_errors": word_errors(ref_words, words),
+                "fields_changed": changed,
+                "fp32_seconds": round(fp32_seconds, 3) if fp32_seconds is not None else None,
+                "int8_seconds": round(int8_seconds, 3),
+            })
+            print(f"{name}: WER {documents[-1]['word_errors'] / max(1, len(ref_words)):.3f}, "
+                  f"изменились поля: {', '.join(changed) or 'нет'}")
+
+    words = sum(d["words"] for d in documents)
+    pages = sum(d["ocr_pages"] for d in documents)
+    fields_total = len(documents) * len(parse_bank_guarantee(text=""))
+    fp32_total = sum(d["fp32_seconds"] or 0 for d in documents) if fp32 is not None else None
+    int8_total = sum(d["int8_seconds"] for d in documents)
+    result = {
+        "threads": cpu_threads(),
+        "interop_threads": config.OCR_INTEROP_THREADS,
+        "reference": "stored" if args.reference else "fp32",
+        "documents": len(documents),
+        "ocr_pages": pages,
+        "wer": round(sum(d["word_errors"] for d in documents) / words, 4) if words else None,
+        "field_agreement": round(1 - sum(len(d["fields_changed"]) for d in documents) / fields_total, 4)
+        if fields_total else None,
+        "fp32_sec_per_page": round(fp32_total / pages, 3) if fp32_total is not None and pages else None,
+        "int8_sec_per_page": round(int8_total / pages, 3) if pages else None,
+        "per_document": documents,
+    }
+    print(f"Документов {result['documents']}, страниц OCR {pages}: WER {result['wer']}, "
+          f"совпадение полей {result['field_agreement']}, "
+          f"с/стр fp32 {result['fp32_sec_per_page']} -> int8 {result['int8_sec_per_page']} "
+          f"(потоков {result['threads']})")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
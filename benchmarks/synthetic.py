@@ -0,0 +1,188 @@
+"""
+Генератор синтетических банковских гарантий для бенчмарков.
+
+    python -m benchmarks.synthetic synthetic.zip --documents 20 --seed 1
+
+Каждый документ — первая страница с текстом гарантии (те фразы, которые ищет
+text_handler: номер гарантии, ИНН/БИК, принципал, договор, сумма, даты) и
+несколько страниц приложений. Страницы растеризуются как скан: случайное
+разрешение, шум, небольшой поворот, JPEG-сжатие; текстового слоя у такой
+страницы нет. С --text-fraction часть документов сохраняется с текстовым слоем.
+
+Для кириллицы нужен TTF-шрифт: --font или переменная BENCH_FONT, иначе ищутся
+DejaVuSans/Arial в стандартных папках.
+"""
+import argparse
+import io
+import os
+import random
+import zipfile
+
+import fitz
+import numpy as np
+from PIL import Image
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # A4 в пунктах
+MARGIN = 56
+
+FONT_CANDIDATES = [
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/dejavu/DejaVuSans.ttf",
+    "C:/Windows/Fonts/arial.ttf",
+    "/System/Library/Fonts/Supplemental/Arial.ttf",
+    "/Library/Fonts/Arial.ttf",
+]
+
+MONTHS = ["января", "февраля", "марта", "апреля", "мая", "июня", "июля",
+          "августа", "сентября", "октября", "ноября", "декабря"]
+CITIES = ["г. Москва", "г. Санкт-Петербург", "г. Екатеринбург", "г. Новосибирск", "г. Казань"]
+BANKS = ["АО «АЛЬФА-БАНК»", "ПАО Сбербанк", "Банк ВТБ (ПАО)", "АО «Райффайзенбанк»", "ПАО «Промсвязьбанк»"]
+ENTITIES = ["Акционерное общество", "Общество с ограниченной ответственностью",
+            "Публичное акционерное общество", "Закрытое акционерное общество"]
+NAMES = ["Стройинвест", "Техносервис", "Промавтоматика", "Энергомонтаж", "Северный путь", "Гидроспецстрой"]
+GUARANTEE_PHRASES = [
+    "на возврат авансового платежа",
+    "надлежащего исполнения договора",
+    "исполнения гарантийных обязательств",
+    "независимая гарантия",
+]
+FILLER = (
+    "Настоящее приложение является неотъемлемой частью гарантии. Все споры и разногласия, "
+    "возникающие из настоящей гарантии или в связи с ней, подлежат рассмотрению в Арбитражном "
+    "суде по месту нахождения Гаранта. Требование по гарантии и прилагаемые к нему документы "
+    "должны быть представлены Гаранту в письменной форме до окончания срока действия гарантии. "
+)
+
+
+def find_font(font=None) -> str:
+    for path in [font, os.environ.get("BENCH_FONT")] + FONT_CANDIDATES:
+        if path and os.path.exists(path):
+            return path
+    raise SystemExit("Не найден TTF-шрифт с кириллицей: укажите --font или BENCH_FONT")
+
+
+def _digits(rng, n):
+    return "".join(rng.choice("0123456789") for _ in range(n))
+
+
+def _date(rng, year):
+    return rng.randint(1, 28), rng.randint(1, 12), year
+
+
+def guarantee_text(rng: random.Random) -> str:
+    """Текст первой страницы гарантии со случайными реквизитами."""
+    year = rng.randint(2021, 2026)
+    day, month, _ = _date(rng, year)
+    contract_day, contract_month, _ = _date(rng, year - 1)
+    end_day, end_month, _ = _date(rng, year + rng.randint(1, 3))
+    amount = rng.randint(10_000, 90_000_000)
+    return "\n".join([
+        f"{rng.choice(CITIES)}                                   {day:02d} {MONTHS[month - 1]} {year} г.",
+        "",
+        # «№» так, как его читает easyocr: find_guarantee_number ищет «n2»/«ng»,
+        # а не сам знак (иначе номер не находится и в документах с текстовым слоем)
+        f"БАНКОВСКАЯ ГАРАНТИЯ N2 {_digits(rng, 3)}/{_digits(rng, 6)}-{rng.randint(1, 9)}",
+        GUARANTEE_PHRASES[rng.randrange(len(GUARANTEE_PHRASES))],
+        "",
+        f"{rng.choice(BANKS)}, БИК {_digits(rng, 9)}, ИНН {_digits(rng, 10)} (далее — Гарант), "
+        f"по просьбе {rng.choice(ENTITIES)} «{rng.choice(NAMES)}», ИНН {_digits(rng, 10)} "
+        f"(далее — Принципал), предоставляет Бенефициару настоящую гарантию в обеспечение "
+        f"исполнения обязательств Принципала по договору № {_digits(rng, 3)}с/{_digits(rng, 6)} "
+        f"от {contract_day:02d}.{contract_month:02d}.{year - 1}.",
+        "",
+        "Гарант обязуется уплатить Бенефициару по его первому письменному требованию "
+        + f"денежные средства, максимальная сумма {amount:,}".replace(",", " ") + ",00 российских рублей.",
+        "",
+        f"Гарантия вступает в силу со дня ее выдачи и действует по {end_day:02d}.{end_month:02d}."
+        f"{year + 1} включительно.",
+    ])
+
+
+def appendix_text(rng: random.Random, number: int) -> str:
+    lines = [f"Приложение № {number}", ""]
+    lines += [FILLER * rng.randint(1, 3)]
+    lines += [f"{i}. Платёж от {rng.randint(1, 28):02d}.{rng.randint(1, 12):02d}.{rng.randint(2021, 2027)} "
+              f"на сумму {rng.randint(1000, 999999)} руб." for i in range(1, rng.randint(5, 15))]
+    return "\n".join(lines)
+
+
+def _text_page(doc, text, font):
+    page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+    page.insert_font(fontname="F0", fontfile=font)
+    rect = fitz.Rect(MARGIN, MARGIN, PAGE_WIDTH - MARGIN, PAGE_HEIGHT - MARGIN)
+    page.insert_textbox(rect, text, fontname="F0", fontsize=11)
+    return page
+
+
+def scan(page, rng: random.Random, dpi: int, noise: float, max_rotation: float) -> bytes:
+    """Растеризует страницу как скан: шум, поворот, JPEG. Возвращает JPEG."""
+    pix = page.get_pixmap(dpi=dpi, alpha=False)
+    image = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+    gray = image.mean(axis=2)
+    np_rng = np.random.default_rng(rng.randrange(2 ** 32))
+    gray = gray + np_rng.normal(0, noise, gray.shape)
+    # редкие тёмные точки — пыль на стекле сканера
+    speckles = np_rng.random(gray.shape) < 0.0005
+    gray[speckles] = 0
+    picture = Image.fromarray(np.clip(gray, 0, 255).astype(np.uint8))
+    angle = rng.uniform(-max_rotation, max_rotation)
+    picture = picture.rotate(angle, resample=Image.BILINEAR, fillcolor=255)
+    buffer = io.BytesIO()
+    picture.save(buffer, format="JPEG", quality=rng.randint(60, 90))
+    return buffer.getvalue()
+
+
+def make_pdf(rng: random.Random, font: str, scanned: bool = True, dpi_range=(150, 300),
+             noise: float = 12.0, max_rotation: float = 2.0, appendix_pages=(0, 3)) -> bytes:
+    """Один документ-гарантия в байтах PDF."""
+    source = fitz.open()
+    _text_page(source, guarantee_text(rng), font)
+    for number in range(1, rng.randint(*appendix_pages) + 1):
+        _text_page(source, appendix_text(rng, number), font)
+    if not scanned:
+        return source.tobytes(garbage=3, deflate=True)
+
+    # у скана одно разрешение на весь документ, как у настоящего сканера
+    dpi = rng.randint(*dpi_range)
+    output = fitz.open()
+    for page in source:
+        target = output.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        target.insert_image(target.rect, stream=scan(page, rng, dpi, noise, max_rotation))
+    return output.tobytes(garbage=3, deflate=True)
+
+
+def make_zip(path, documents: int, seed: int = 0, font: str | None = None, text_fraction: float = 0.0, **options):
+    """Архив с documents синтетическими гарантиями; возвращает число страниц."""
+    rng = random.Random(seed)
+    font = find_font(font)
+    pages = 0
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_STORED) as archive:
+        for i in range(documents):
+            data = make_pdf(rng, font, scanned=rng.random() >= text_fraction, **options)
+            pages += fitz.open(stream=data, filetype="pdf").page_count
+            archive.writestr(f"guarantee_{i + 1:04d}.pdf", data)
+    return pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("output", help="путь к создаваемому zip")
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--font")
+    parser.add_argument("--text-fraction", type=float, default=0.0,
+                        help="доля документов с текстовым слоем вместо скана")
+    parser.add_argument("--dpi", type=int, nargs=2, default=[150, 300], metavar=("MIN", "MAX"))
+    parser.add_argument("--noise", type=float, default=12.0, help="СКО гауссова шума, уровни яркости")
+    parser.add_argument("--max-rotation", type=float, default=2.0, help="градусы")
+    parser.add_argument("--appendix-pages", type=int, nargs=2, default=[0, 3], metavar=("MIN", "MAX"))
+    args = parser.parse_args()
+
+    pages = make_zip(args.output, args.documents, seed=args.seed, font=args.font, text_fraction=args.text_fraction,
+                     dpi_range=tuple(args.dpi), noise=args.noise, max_rotation=args.max_rotation,
+                     appendix_pages=tuple(args.appendix_pages))
+    print(f"{args.output}: документов {args.documents}, страниц {pages}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,11 +7,13 @@ const processBtn = document.getElementById('processBtn');
 const logOutput = document.getElementById('logOutput');
 const clearLogBtn = document.getElementById('clearLogBtn');
 const downloadBtn = document.getElementById('downloadBtn');
+const cancelBtn = document.getElementById('cancelBtn');
 const statusIndicator = document.querySelector('.status-indicator');
 
 let source;  // Для хранения EventSource
 let currentFile = null;
 let resultFilename = null; // Для хранения имени результирующего файла
+let currentJobId = null; // Идентификатор задачи в очереди сервера
 
 // Обработчики drag-and-drop
 ['dragenter', 'dragover', 'dragleave', 'drop'].forEach(eventName => {
@@ -95,80 +97,174 @@ downloadBtn.addEventListener('click', () => {
   }
 });
 
-// Запуск обработки
-processBtn.addEventListener('click', async () => {
-  if (!currentFile) return;
+// Отмена задачи
+cancelBtn.addEventListener('click', async () => {
+  if (!currentJobId) return;
+  cancelBtn.disabled = true;
+  try {
+    await fetch(`/jobs/${currentJobId}/cancel`, { method: 'POST' });
+  } catch (error) {
+    logOutput.textContent += `Ошибка при отмене: ${error.message}\n`;
+  }
+});
 
-  // Сброс состояния перед запуском
-  processBtn.disabled = true;
-  statusIndicator.classList.add('active');
-  downloadBtn.disabled = true;
-  downloadBtn.classList.remove('active');
-  logOutput.textContent = '';
-  resultFilename = null;
+// Завершение обработки (успех, ошибка или отмена)
+function finishProcessing(success) {
+  if (success) {
+    // Активируем кнопку скачивания
+    downloadBtn.disabled = false;
+    downloadBtn.classList.add('active');
+  }
+  if (source) {
+    source.close();
+  }
+  processBtn.disabled = false;
+  cancelBtn.disabled = true;
+  statusIndicator.classList.remove('active');
+}
+
+function appendLog(text) {
+  logOutput.textContent += text + '\n';
+  // Автопрокрутка
+  logOutput.scrollTop = logOutput.scrollHeight;
+}
 
+// Подписка на события задачи: сервер повторяет уже отправленные события,
+// поэтому подключаться можно и после начала обработки
+function subscribeToJob(jobId) {
   // Закрываем предыдущее соединение SSE
   if (source) {
     source.close();
   }
+  source = new EventSource(`/jobs/${jobId}/events`);
 
-  // Открываем новое соединение SSE для получения логов
-  source = new EventSource('/logs');
+  source.addEventListener('log', (e) => {
+    appendLog(`-- ${JSON.parse(e.data).message}`);
+  });
 
-  source.onmessage = (event) => {
-    logOutput.textContent += event.data + '\n';
-    // Автопрокрутка
-    logOutput.scrollTop = logOutput.scrollHeight;
+  source.addEventListener('row', (e) => {
+    const data = JSON.parse(e.data);
+    appendLog(`-- ${data.document}: ${JSON.stringify(data.row)}`);
+  });
 
-    // Проверка завершения обработки
-    if (event.data.includes('Обработка завершена')) {
-      // Активируем кнопку скачивания
-      downloadBtn.disabled = false;
-      downloadBtn.classList.add('active');
+  source.addEventListener('progress', (e) => {
+    const data = JSON.parse(e.data);
+    fileInfo.textContent = `Обработано документов: ${data.done} из ${data.total} (${data.percent}%)`;
+  });
 
-      // Закрываем соединение SSE
-      source.close();
-      processBtn.disabled = false;
-      statusIndicator.classList.remove('active');
+  source.addEventListener('status', (e) => {
+    const data = JSON.parse(e.data);
+    if (data.status === 'done') {
+      finishProcessing(true);
+    } else if (data.status === 'error' || data.status === 'cancelled') {
+      finishProcessing(false);
     }
-    else if (event.data.includes('Ошибка')) {
-      source.close();
-      processBtn.disabled = false;
-      statusIndicator.classList.remove('active');
-    }
-  };
+  });
 
   source.onerror = () => {
-    logOutput.textContent += 'Ошибка подключения к логам\n';
-    processBtn.disabled = false;
-    statusIndicator.classList.remove('active');
-    source.close();
+    appendLog('Ошибка подключения к логам');
+    finishProcessing(false);
   };
+}
+
+// Загрузка архива на сервер
+const CHUNKED_UPLOAD_THRESHOLD = 64 * 1024 * 1024;
+const CHUNK_RETRIES = 5;
 
-  // Отправка файла на сервер
+function uploadWhole(file) {
   const formData = new FormData();
-  formData.append('zip_file', currentFile);
+  formData.append('zip_file', file);
+  return fetch('/process', { method: 'POST', body: formData });
+}
+
+async function uploadInChunks(file) {
+  // id незавершённой загрузки хранится в localStorage, чтобы продолжить её и после перезагрузки страницы
+  const storageKey = `upload:${file.name}:${file.size}:${file.lastModified}`;
+  let uploadId = localStorage.getItem(storageKey);
+  let offset = 0;
+  // размер части задаёт сервер (UPLOAD_CHUNK_MB) — и при создании загрузки, и при продолжении
+  let chunkSize;
+
+  if (uploadId) {
+    const status = await fetch(`/uploads/${uploadId}`);
+    if (status.ok) {
+      const info = await status.json();
+      offset = info.received;
+      chunkSize = info.chunk_size;
+      appendLog(`Продолжение загрузки с ${formatBytes(offset)}`);
+    } else {
+      uploadId = null;
+    }
+  }
+  if (!uploadId) {
+    const form = new FormData();
+    form.append('filename', file.name);
+    form.append('size', file.size);
+    const created = await fetch('/uploads', { method: 'POST', body: form });
+    const info = await created.json();
+    if (!created.ok) throw new Error(info.message);
+    uploadId = info.upload_id;
+    chunkSize = info.chunk_size;
+    localStorage.setItem(storageKey, uploadId);
+  }
+
+  let retries = 0;
+  while (offset < file.size) {
+    try {
+      const chunk = file.slice(offset, offset + chunkSize);
+      const response = await fetch(`/uploads/${uploadId}?offset=${offset}`, { method: 'PUT', body: chunk });
+      const info = await response.json();
+      if (response.status === 413) throw Object.assign(new Error(info.message), { fatal: true });
+      if (!response.ok) throw new Error(info.message);
+      offset = info.received;
+      retries = 0;
+      fileInfo.textContent = `Загрузка: ${formatBytes(offset)} из ${formatBytes(file.size)}`;
+    } catch (error) {
+      if (error.fatal || ++retries > CHUNK_RETRIES) throw error;
+      appendLog(`Сбой при загрузке части, повтор (${retries}/${CHUNK_RETRIES})`);
+      await new Promise(resolve => setTimeout(resolve, 1000 * retries));
+      // сервер сообщает, сколько байт уже принято
+      const status = await fetch(`/uploads/${uploadId}`).catch(() => null);
+      if (status && status.ok) offset = (await status.json()).received;
+    }
+  }
+
+  const response = await fetch(`/uploads/${uploadId}/complete`, { method: 'POST', body: new FormData() });
+  if (response.ok) localStorage.removeItem(storageKey);
+  return response;
+}
+
+// Запуск обработки
+processBtn.addEventListener('click', async () => {
+  if (!currentFile) return;
+
+  // Сброс состояния перед запуском
+  processBtn.disabled = true;
+  statusIndicator.classList.add('active');
+  downloadBtn.disabled = true;
+  downloadBtn.classList.remove('active');
+  logOutput.textContent = '';
+  resultFilename = null;
 
   try {
-    const response = await fetch('/process', {
-      method: 'POST',
-      body: formData
-    });
+    // Большие архивы отправляются частями с докачкой после обрыва связи
+    const response = currentFile.size > CHUNKED_UPLOAD_THRESHOLD
+      ? await uploadInChunks(currentFile)
+      : await uploadWhole(currentFile);
 
     const result = await response.json();
     if (result.status === 'success') {
-      // Сохраняем имя результирующего файла
+      // Сохраняем имя результирующего файла и задачу для отмены
       resultFilename = result.result_filename;
+      currentJobId = result.job_id;
+      cancelBtn.disabled = false;
+      subscribeToJob(currentJobId);
     } else {
-      logOutput.textContent += `Ошибка сервера: ${result.message}\n`;
-      processBtn.disabled = false;
-      statusIndicator.classList.remove('active');
-      source.close();
+      appendLog(`Ошибка сервера: ${result.message}`);
+      finishProcessing(false);
     }
   } catch (error) {
-    logOutput.textContent += `Ошибка при отправке файла: ${error.message}\n`;
-    processBtn.disabled = false;
-    statusIndicator.classList.remove('active');
-    source.close();
+    appendLog(`Ошибка при отправке файла: ${error.message}`);
+    finishProcessing(false);
   }
-});
\ No newline at end of file
+});
@@ -1,17 +1,46 @@
-import asyncio
-from fastapi import FastAPI, Request, BackgroundTasks, UploadFile, File
-from fastapi.responses import HTMLResponse, JSONResponse, FileResponse
+import json
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, UploadFile, File, Form
+from fastapi.responses import HTMLResponse, JSONResponse, FileResponse, PlainTextResponse
 from sse_starlette.sse import EventSourceResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from backend.recognizer import recognize
+from starlette.concurrency import run_in_threadpool
+from starlette.background import BackgroundTask
+from backend import config, parallel
+from backend.jobs import JobScheduler, JobCancelled
+from backend.job_store import JobStore
+from backend.events import EventBus, event
+from backend.results import MEDIA_TYPES, active_sink
+from backend.metrics import REGISTRY
+from backend.uploads import UploadStore, UploadError, HashingWriter, ArchiveIndex
+from backend.script.ocr_pool import get_pool
+from backend.warmup import Warmup
 import os
-import shutil
 from datetime import datetime
 from pathlib import Path
 
 
-app = FastAPI()
+# тяжёлые модули (recognizer -> easyocr/torch, cv2, fitz) и модели OCR
+# загружаются в фоне после старта, HTTP отвечает сразу
+warmup = Warmup()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    warmup.start()
+    scheduler.start()
+    if config.RESUME_JOBS:
+        resume_jobs()
+    yield
+    # /readyz сразу перестаёт отвечать 200, пока задачи останавливаются
+    warmup.stop()
+    scheduler.stop()
+    parallel.shutdown()
+    job_store.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 BASE = Path(__file__).resolve().parent
 # Создаем папку для загрузок, если ее нет
@@ -21,81 +50,365 @@ RESULTS_DIR = BASE / "files" / "results"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(RESULTS_DIR, exist_ok=True)
 
+MB = 1024 * 1024
+MAX_UPLOAD_BYTES = config.MAX_UPLOAD_MB * MB
+CHUNK_BYTES = config.UPLOAD_CHUNK_MB * MB
+# незавершённые загрузки частями и хэши уже загруженных архивов
+uploads = UploadStore(UPLOAD_DIR / "partial", MAX_UPLOAD_BYTES,
+                      max_age=config.UPLOAD_EXPIRE_HOURS * 3600, max_open_bytes=config.MAX_OPEN_UPLOADS_MB * MB)
+archives = ArchiveIndex(UPLOAD_DIR / "index.json")
+
 app.mount("/static", StaticFiles(directory="frontend/static"), name="static")
 templates = Jinja2Templates(directory="frontend/templates")
 
-# общий буфер логов
-logs: list[str] = []
+# события задач: у каждой задачи свой канал для /jobs/{id}/events
+events = EventBus()
+# задачи и готовые документы на диске — для продолжения после перезапуска
+job_store = JobStore(config.JOB_STORE_PATH)
+
+
+def finish_job_events(job):
+    # задача, прерванная остановкой сервера, остаётся в хранилище незавершённой
+    job_store.update_job(job, status="interrupted" if job.interrupted else None)
+    channel = events.get(job.id)
+    if channel is not None:
+        channel.publish(event("status", status=job.status, error=job.error))
+        channel.close()
+
+
+# очередь задач: не больше MAX_CONCURRENT_JOBS архивов одновременно
+scheduler = JobScheduler(config.MAX_CONCURRENT_JOBS, order=config.JOB_ORDER, on_finish=finish_job_events)
+
+def resume_jobs():
+    """Ставит в очередь задачи, прерванные остановкой или падением сервера."""
+    for stored in job_store.resumable():
+        args = stored["args"]
+        if not os.path.exists(args["zip_path"]):
+            job_store.mark_failed(stored["id"], "ZIP-архив не найден")
+            continue
 
-async def log_generator():
-    while True:
-        if logs:
-            msg = logs.pop(0)
-            yield f"-- {msg}"
-        await asyncio.sleep(0.1)
+        def before_queue(job, args=args):
+            open_job_channel(job, args["filename_without_zip"])
+            events.get(job.id).publish("Задача продолжена после перезапуска сервера")
+
+        submit_job(args, name=stored["name"], priority=stored["priority"], before_queue=before_queue,
+                   job_id=stored["id"])
+
+
+@app.get("/healthz")
+async def healthz():
+    # процесс жив и отвечает; готовность к задачам — /readyz
+    return JSONResponse(content={"status": "ok", **warmup.info()})
+
+
+@app.get("/readyz")
+async def readyz():
+    return JSONResponse(content=warmup.info(), status_code=200 if warmup.ready else 503)
+
+
+async def event_generator(channel):
+    async for item in channel.subscribe():
+        yield {"event": item["type"], "data": json.dumps(item, ensure_ascii=False, default=str)}
 
 @app.get("/", response_class=HTMLResponse)
 async def read_form(request: Request):
     return templates.TemplateResponse("form.html", {"request": request})
 
+def archive_names(original_filename: str):
+    """Имена для сохранения архива: добавляем метку времени к названию."""
+    current_datetime = datetime.now()
+    unix_time = current_datetime.timestamp()
+    unix_time_decode = datetime.utcfromtimestamp(unix_time).strftime('%Y-%m-%d %H-%M-%S')
+    split_filename = original_filename.split('.')
+    filename_without_zip = '.'.join(split_filename[:-1])
+    filename_without_zip_with_time = filename_without_zip + '_' + unix_time_decode
+    filename = filename_without_zip_with_time + '.' + split_filename[-1]
+    return filename, filename_without_zip, filename_without_zip_with_time, unix_time_decode
+
+
+def enqueue_archive(file_location: str, digest: str, filename: str, filename_without_zip: str,
+                    filename_without_zip_with_time: str, unix_time_decode: str, priority: int) -> dict:
+    """Регистрирует загруженный архив и ставит его обработку в очередь задач."""
+    duplicate_of = archives.find(digest)
+    if duplicate_of and duplicate_of != filename and os.path.exists(os.path.join(UPLOAD_DIR, duplicate_of)):
+        # такой же архив уже загружался — второй экземпляр не храним
+        os.remove(file_location)
+        file_location = os.path.join(UPLOAD_DIR, duplicate_of)
+    else:
+        duplicate_of = None
+        archives.add(digest, filename)
+
+    # Создаем имя для результирующего файла
+    result_filename = f"Результат обработки {filename_without_zip_with_time}.{config.RESULT_FORMATS[0]}"
+    result_path = os.path.join(RESULTS_DIR, result_filename)
+
+    def before_queue(job):
+        open_job_channel(job, filename_without_zip)
+        if duplicate_of:
+            events.get(job.id).publish(f"Такой архив уже загружался ранее: {duplicate_of}")
+
+    args = {"zip_path": file_location,
+            "result_path": result_path,
+            "filename_without_zip_with_time": filename_without_zip_with_time,
+            "time": unix_time_decode,
+            "filename_without_zip": filename_without_zip}
+    job = submit_job(args, name=filename_without_zip_with_time, priority=priority, before_queue=before_queue)
+    return {"status": "success",
+            "job_id": job.id,
+            "filename": filename_without_zip_with_time,
+            "result_filename": result_filename,
+            "sha256": digest,
+            "duplicate_of": duplicate_of}
+
+
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    # слишком большой запрос отклоняется по заголовку, до чтения тела
+    length = request.headers.get("content-length")
+    if request.method == "POST" and request.url.path == "/process" and not (length and length.isdigit()):
+        # тело /process Starlette разбирает целиком до обработчика: без Content-Length
+        # (chunked) размер заранее не проверить, такие запросы не принимаются
+        return JSONResponse(
+            content={"status": "error", "message": "Нужен заголовок Content-Length; большие архивы — через /uploads"},
+            status_code=411
+        )
+    if request.method in ("POST", "PUT") and length and length.isdigit() and int(length) > MAX_UPLOAD_BYTES + MB:
+        return JSONResponse(
+            content={"status": "error", "message": f"Файл больше допустимых {config.MAX_UPLOAD_MB} МБ"},
+            status_code=413
+        )
+    return await call_next(request)
+
+
 @app.post("/process", response_class=HTMLResponse)
 async def process_zip(
     # request: Request,
     # zip_path: str = Form(...),
     zip_file: UploadFile = File(...),
-    background_tasks: BackgroundTasks = None
+    priority: int = Form(0)
 ):
+    file_location = None
     try:
-        # Сохраняем файл и добавляем метку времени к названию
-        current_datetime = datetime.now()
-        unix_time = current_datetime.timestamp()
-        unix_time_decode = datetime.utcfromtimestamp(unix_time).strftime('%Y-%m-%d %H-%M-%S')
-        split_filename = zip_file.filename.split('.')
-        filename_without_zip = '.'.join(split_filename[:-1])
-        filename_without_zip_with_time = filename_without_zip + '_' + unix_time_decode
-        filename = filename_without_zip_with_time + '.' + split_filename[-1]
-
+        filename, filename_without_zip, filename_without_zip_with_time, unix_time_decode = archive_names(zip_file.filename)
         file_location = os.path.join(UPLOAD_DIR, filename)
-        # Безопасное сохранение файла
-        with open(file_location, "wb") as buffer:
-            shutil.copyfileobj(zip_file.file, buffer)
-
-        # Логируем начало обработки
-        logs.append(f"Файл {filename_without_zip}.zip успешно загружен")
-        logs.append(f"Начало обработки архива...")
-
-        # Создаем имя для результирующего файла
-        result_filename = f"Результат обработки {filename_without_zip_with_time}.xlsx"
-        result_path = os.path.join(RESULTS_DIR, result_filename)
 
+        # Multipart-тело Starlette к этому моменту уже целиком принял во временный файл
+        # (размер ограничен по Content-Length в limit_upload_size); потоковая запись
+        # с докачкой — только у /uploads. Здесь файл копируется блоками в пуле потоков,
+        # чтобы не блокировать цикл событий, sha256 считается по ходу копирования
+        writer = await run_in_threadpool(HashingWriter, file_location, MAX_UPLOAD_BYTES)
+        try:
+            while chunk := await zip_file.read(CHUNK_BYTES):
+                await run_in_threadpool(writer.write, chunk)
+        finally:
+            await run_in_threadpool(writer.close)
 
-        # кладём вызов recognize в фон
-        background_tasks.add_task(run_recognize,
-                                  file_location,
-                                  result_path,
-                                  filename_without_zip_with_time,
-                                  unix_time_decode)
+        content = enqueue_archive(file_location, writer.hexdigest(), filename, filename_without_zip,
+                                  filename_without_zip_with_time, unix_time_decode, priority)
+        return JSONResponse(content=content, status_code=200)
+    except UploadError as e:
+        if file_location and os.path.exists(file_location):
+            os.remove(file_location)
         return JSONResponse(
-            content={"status": "success",
-                     "filename": filename_without_zip_with_time,
-                     "result_filename": result_filename},
-            status_code=200
+            content={"status": "error", "message": str(e)},
+            status_code=e.status
         )
     except Exception as e:
-        logs.append(f"‼ Ошибка при загрузке файла: {str(e)}")
         return JSONResponse(
             content={"status": "error", "message": str(e)},
             status_code=500
         )
 
-@app.get("/logs")
-async def get_logs():
-    return EventSourceResponse(log_generator())
+
+# Загрузка частями с докачкой: POST /uploads -> PUT /uploads/{id}?offset=N (тело — байты части)
+# -> POST /uploads/{id}/complete. GET /uploads/{id} сообщает, сколько байт уже принято.
+@app.post("/uploads")
+async def create_upload(filename: str = Form(...), size: int = Form(...)):
+    try:
+        session = await run_in_threadpool(uploads.create, filename, size)
+    except UploadError as e:
+        return JSONResponse(content={"status": "error", "message": str(e)}, status_code=e.status)
+    return JSONResponse(content={**session.info(), "chunk_size": CHUNK_BYTES})
+
+
+@app.get("/uploads/{upload_id}")
+async def upload_status(upload_id: str):
+    try:
+        session = await run_in_threadpool(uploads.get, upload_id)
+    except UploadError as e:
+        return JSONResponse(content={"status": "error", "message": str(e)}, status_code=e.status)
+    return JSONResponse(content={**session.info(), "chunk_size": CHUNK_BYTES})
+
+
+@app.put("/uploads/{upload_id}")
+async def upload_chunk(upload_id: str, request: Request, offset: int = 0):
+    try:
+        session = await run_in_threadpool(uploads.get, upload_id)
+        writer = await run_in_threadpool(uploads.writer, session, offset)
+        try:
+            async for chunk in request.stream():
+                if chunk:
+                    await run_in_threadpool(writer.write, chunk)
+        finally:
+            await run_in_threadpool(uploads.finish_write, session, writer)
+    except UploadError as e:
+        return JSONResponse(content={"status": "error", "message": str(e)}, status_code=e.status)
+    return JSONResponse(content=session.info())
+
+
+@app.post("/uploads/{upload_id}/complete")
+async def complete_upload(upload_id: str, priority: int = Form(0)):
+    try:
+        session = await run_in_threadpool(uploads.get, upload_id)
+        filename, filename_without_zip, filename_without_zip_with_time, unix_time_decode = archive_names(session.filename)
+        file_location = os.path.join(UPLOAD_DIR, filename)
+        digest = await run_in_threadpool(uploads.complete, session, Path(file_location))
+        content = enqueue_archive(file_location, digest, filename, filename_without_zip,
+                                  filename_without_zip_with_time, unix_time_decode, priority)
+    except UploadError as e:
+        return JSONResponse(content={"status": "error", "message": str(e)}, status_code=e.status)
+    except Exception as e:
+        return JSONResponse(content={"status": "error", "message": str(e)}, status_code=500)
+    return JSONResponse(content=content)
+
+
+def submit_job(args: dict, name: str, priority: int, before_queue, job_id: str | None = None):
+    """Ставит вызов recognize в очередь задач; задача записывается в хранилище до запуска."""
+    def prepare(job):
+        job_store.add_job(job, args)
+        # канал событий открывается до запуска
+        before_queue(job)
+
+    return scheduler.submit(run_recognize,
+                            args["zip_path"],
+                            args["result_path"],
+                            args["filename_without_zip_with_time"],
+                            args["time"],
+                            name=name,
+                            priority=priority,
+                            before_queue=prepare,
+                            job_id=job_id)
+
+
+def open_job_channel(job, filename_without_zip: str):
+    channel = events.open(job.id)
+    # Логируем начало обработки
+    channel.publish(f"Файл {filename_without_zip}.zip успешно загружен")
+    channel.publish(f"Начало обработки архива...")
+    channel.publish(event("status", status=job.status))
+
+
+@app.get("/jobs/{job_id}/events")
+async def get_job_events(job_id: str):
+    channel = events.get(job_id)
+    if channel is None:
+        return JSONResponse(content={"error": "Задача не найдена"}, status_code=404)
+    return EventSourceResponse(event_generator(channel))
+
+
+@app.get("/jobs")
+async def list_jobs():
+    return JSONResponse(content=[job.info() for job in scheduler.list()])
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = scheduler.get(job_id)
+    if job is None:
+        # задача из прошлого запуска сервера
+        info = await run_in_threadpool(job_store.job_info, job_id)
+        if info is None:
+            return JSONResponse(content={"error": "Задача не найдена"}, status_code=404)
+        return JSONResponse(content=info)
+    info = job.info()
+    if job.status == "queued":
+        info["queue_position"] = scheduler.position(job)
+    return JSONResponse(content=info)
+
+
+@app.post("/reextract")
+async def reextract(job_id: str | None = None):
+    """
+    Повторный разбор сохранённых .txt без OCR: одной задачи (job_id) или всех
+    завершённых. Возвращает новые файлы результата и изменившиеся поля.
+    """
+    from backend.reextract import reextract_all, reextract_job
+    try:
+        if job_id is None:
+            report = await run_in_threadpool(reextract_all, job_store)
+        else:
+            report = await run_in_threadpool(reextract_job, job_store, job_id)
+    except KeyError as e:
+        return JSONResponse(content={"error": e.args[0]}, status_code=404)
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=409)
+    return JSONResponse(content=json.loads(json.dumps(report, ensure_ascii=False, default=str)))
+
+
+@app.get("/jobs/{job_id}/trace")
+async def get_job_trace(job_id: str):
+    # интервалы этапов задачи; документы и этапы внутри них есть только при TRACE_SPANS=1
+    job = scheduler.get(job_id)
+    if job is None:
+        return JSONResponse(content={"error": "Задача не найдена"}, status_code=404)
+    spans = []
+    if job.started:
+        spans.append(event("span", name="queue", start=job.created.timestamp(),
+                           duration=(job.started - job.created).total_seconds()))
+        finished = job.finished or datetime.now()
+        spans.append(event("span", name="job", start=job.started.timestamp(),
+                           duration=(finished - job.started).total_seconds(), status=job.status))
+    return JSONResponse(content={"id": job.id, "status": job.status, "spans": spans + list(job.spans)})
+
+
+@app.get("/metrics")
+async def metrics():
+    # текстовый формат Prometheus; в режиме process сюда же попадают метрики воркеров
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    channel = events.get(job_id)
+    if channel is not None:
+        channel.publish("Задача отменена.")
+    if not scheduler.cancel(job_id):
+        return JSONResponse(content={"error": "Задачу нельзя отменить"}, status_code=409)
+    return JSONResponse(content={"status": "cancelled"})
+
+
+@app.get("/ocr/pool")
+async def ocr_pool_stats():
+    return JSONResponse(content=get_pool().stats())
+
+
+@app.get("/ocr/cache")
+async def ocr_cache_stats():
+    from backend.script.ocr_cache import get_cache
+    cache = get_cache()
+    # размер считается по папке кэша, общей для процессов этой машины
+    return JSONResponse(content=await run_in_threadpool(cache.stats) if cache else {"enabled": False})
 
 
 @app.get("/download/{filename}")
 async def download_file(filename: str):
     file_path = os.path.join(RESULTS_DIR, filename)
+    fmt = os.path.splitext(filename)[1].lstrip(".")
+    media_type = MEDIA_TYPES.get(fmt, "application/octet-stream")
+
+    # пока задача идёт, отдаётся срез уже готовых строк
+    sink = active_sink(file_path)
+    if sink is not None:
+        try:
+            snapshot = await run_in_threadpool(sink.snapshot, fmt)
+        except (ImportError, ValueError) as e:
+            return JSONResponse(content={"error": str(e)}, status_code=400)
+        return FileResponse(
+            snapshot,
+            filename=f"Частично - {filename}",
+            media_type=media_type,
+            background=BackgroundTask(os.remove, snapshot)
+        )
 
     if not os.path.exists(file_path):
         return JSONResponse(
@@ -106,18 +419,39 @@ async def download_file(filename: str):
     return FileResponse(
         file_path,
         filename=filename,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        media_type=media_type
     )
 
 
-# обёртка, чтобы из фонового таска обновлять логи
-def run_recognize(zip_path: str, result_path: str, filename_without_zip_with_time: str, time: str):
+# обёртка, чтобы из задачи в очереди публиковать события в её канал
+def run_recognize(job, zip_path: str, result_path: str, filename_without_zip_with_time: str, time: str):
+    channel = events.get(job.id)
+
+    def publish(msg):
+        if isinstance(msg, dict) and msg.get("type") == "span":
+            job.spans.append(msg)
+        channel.publish(msg)
+
+    def checkpoint(doc_index, name, text_file, row):
+        job_store.checkpoint(job.id, doc_index, name, text_file, row)
+
+    # до прогрева импорт ждёт фоновый поток, после — модуль уже загружен
+    from backend.recognizer import recognize
+
+    publish(event("status", status="running"))
+    job_store.update_job(job)
     try:
-        # внутрь recognize передаём колбэк для логирования
-        recognize(zip_path, result_path, filename_without_zip_with_time, time, log_callback=logs.append)
-        logs.append("✔ Обработка завершена.")
+        # внутрь recognize передаём колбэк для логирования, рабочую папку, флаг отмены задачи
+        # и готовые до перезапуска документы
+        recognize(zip_path, result_path, filename_without_zip_with_time, time, log_callback=publish,
+                  workspace=job.workspace, cancel_event=job.cancel_event,
+                  completed=job_store.documents(job.id), on_document=checkpoint)
+        publish("✔ Обработка завершена.")
+    except JobCancelled:
+        raise
     except Exception as e:
-        logs.append(f"‼ Ошибка: {e}")
+        publish(f"‼ Ошибка: {e}")
+        raise
 
 
 